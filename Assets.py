@@ -0,0 +1,7 @@
+import bin.modules.Assets as Assets
+
+def main():
+    raise SystemExit(Assets.main())
+
+if __name__ == '__main__':
+    main()
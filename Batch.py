@@ -0,0 +1,7 @@
+import bin.modules.Batch as Batch
+
+def main():
+    raise SystemExit(Batch.main())
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,7 @@
+import bin.modules.Benchmark as Benchmark
+
+def main():
+    raise SystemExit(Benchmark.main())
+
+if __name__ == '__main__':
+    main()
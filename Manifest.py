@@ -0,0 +1,7 @@
+import bin.modules.Manifest as Manifest
+
+def main():
+    raise SystemExit(Manifest.main())
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,7 @@
+import bin.modules.Service as Service
+
+def main():
+    raise SystemExit(Service.main())
+
+if __name__ == '__main__':
+    main()
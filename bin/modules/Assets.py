@@ -0,0 +1,174 @@
+'''
+the app's images in one bundle file, decoded a group at a time as they're used
+
+a bundle is MAGIC, the length of a JSON index, the index, then a zlib compressed RGBA atlas for each group of images. The index has
+every group's offset and length past the index, its atlas size and the box of each of its images in the atlas. Groups are named
+like 'icons/dark' or 'textiles/10'. Atlases are raw pixels rather than PNGs since opening the first PNG imports all of PIL's plugins
+'''
+
+import PIL.Image as Img
+
+import argparse, collections.abc, json, math, os, os.path, struct, sys, threading, zlib
+
+MAGIC = b'RSRASSET'
+HEADER = struct.Struct('<I') # length of the JSON index
+
+class Bundle:
+    '''
+    only the index is read on opening, each group's atlas is decoded the first time the group is used and kept
+    '''
+    def __init__(self, path: str):
+        with open(path, 'rb') as f:
+            data = f.read()
+        if data[:len(MAGIC)] != MAGIC:
+            raise ValueError(f'{path} isn\'t an asset bundle.')
+
+        start = len(MAGIC) + HEADER.size
+        length = HEADER.unpack_from(data, len(MAGIC))[0]
+        self._index = json.loads(data[start:start + length])
+        self._data = memoryview(data)[start + length:]
+
+        self._groups = {} # group: {name: image}
+        self._lock = threading.Lock()
+
+    def groups(self) -> list[str]:
+        return list(self._index)
+
+    def names(self, prefix: str) -> list[str]:
+        '''
+        the groups under prefix without it, like ['dark', 'light'] for 'icons'
+        '''
+        return [name[len(prefix) + 1:] for name in self._index if name.startswith(prefix + '/')]
+
+    def group(self, name: str) -> dict[str, Img.Image]:
+        '''
+        raises KeyError for groups that aren't in the bundle
+        '''
+        with self._lock:
+            if name not in self._groups:
+                entry = self._index[name]
+                atlas = Img.frombytes('RGBA', tuple(entry['size']), zlib.decompress(self._data[entry['offset']:entry['offset'] + entry['length']]))
+                self._groups[name] = {key: atlas.crop((x, y, x + width, y + height)) for key, (x, y, width, height) in entry['images'].items()}
+            return self._groups[name]
+
+    def icons(self, icon_set: str) -> dict[str, Img.Image]:
+        return self.group(f'icons/{icon_set}')
+
+    def image(self, name: str) -> Img.Image:
+        '''
+        images that aren't part of a set, like the infobar's warning and error icons
+        '''
+        return self.group('images')[name]
+
+    def textiles(self) -> 'Textiles':
+        return Textiles(self)
+
+class Textiles(collections.abc.Mapping):
+    '''
+    textiles by size like {10: [images]}, each size is decoded the first time it's looked up
+    '''
+    def __init__(self, bundle: Bundle):
+        self._bundle = bundle
+        self._sizes = sorted(int(name) for name in bundle.names('textiles'))
+
+    def __getitem__(self, size: int) -> list[Img.Image]:
+        return list(self._bundle.group(f'textiles/{size}').values())
+
+    def __iter__(self):
+        return iter(self._sizes)
+
+    def __len__(self) -> int:
+        return len(self._sizes)
+
+def _atlas(images: dict[str, Img.Image]) -> tuple[Img.Image, dict[str, list[int]]]:
+    '''
+    lays images out on a grid of cells the size of the largest one
+    '''
+    cell_width = max(image.width for image in images.values())
+    cell_height = max(image.height for image in images.values())
+    columns = math.ceil(math.sqrt(len(images)))
+    rows = math.ceil(len(images) / columns)
+
+    atlas = Img.new('RGBA', (columns * cell_width, rows * cell_height), (0, 0, 0, 0))
+    boxes = {}
+    for i, (name, image) in enumerate(images.items()):
+        x, y = i % columns * cell_width, i // columns * cell_height
+        atlas.paste(image.convert('RGBA'), (x, y))
+        boxes[name] = [x, y, image.width, image.height]
+
+    return atlas, boxes
+
+def pack(groups: dict[str, dict[str, Img.Image]], path: str) -> None:
+    '''
+    writes a bundle of groups like {'icons/dark': {'folder': image}, 'textiles/10': {'0': image}}, images come back as RGBA
+    '''
+    index = {}
+    blobs = []
+    offset = 0
+
+    for name, images in groups.items():
+        atlas, boxes = _atlas(images)
+        blob = zlib.compress(atlas.tobytes(), 9)
+
+        index[name] = {'offset': offset, 'length': len(blob), 'size': atlas.size, 'images': boxes}
+        blobs.append(blob)
+        offset+= len(blob)
+
+    header = json.dumps(index, separators = (',', ':')).encode()
+    with open(path, 'wb') as f:
+        f.write(MAGIC + HEADER.pack(len(header)) + header)
+        for blob in blobs:
+            f.write(blob)
+
+def _order(name: str) -> tuple:
+    '''
+    numbered images like textiles sort by number, so '10' comes after '9'
+    '''
+    return (not name.isdigit(), int(name) if name.isdigit() else 0, name)
+
+def load(directory: str) -> dict[str, dict[str, Img.Image]]:
+    '''
+    the groups to pack from a directory of PNGs laid out like the bundle, like icons/dark/folder.png or textiles/10/0.png
+    '''
+    groups = {}
+    for root, _, files in sorted(os.walk(directory)):
+        names = sorted((os.path.splitext(file)[0] for file in files if file.lower().endswith('.png')), key = _order)
+        if names:
+            group = os.path.relpath(root, directory).replace(os.sep, '/')
+            groups[group] = {name: Img.open(os.path.join(root, name + '.png')).convert('RGBA') for name in names}
+    return groups
+
+def unpack(path: str, directory: str) -> None:
+    '''
+    saves every image in a bundle as a PNG under directory, laid out the way load reads them
+    '''
+    bundle = Bundle(path)
+    for group in bundle.groups():
+        folder = os.path.join(directory, *group.split('/'))
+        os.makedirs(folder, exist_ok = True)
+        for name, image in bundle.group(group).items():
+            image.save(os.path.join(folder, name + '.png'))
+
+def make_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description = 'Packs the app\'s images into an asset bundle, or unpacks a bundle to edit them.')
+    parser.add_argument('action', choices = ('pack', 'unpack'))
+    parser.add_argument('directory', help = 'PNGs in group folders, like icons/dark/folder.png and textiles/10/0.png')
+    parser.add_argument('-b', '--bundle', default = './bin/assets.bundle')
+    return parser
+
+def main(argv: list[str] = None) -> int:
+    args = make_parser().parse_args(argv)
+
+    if args.action == 'unpack':
+        unpack(args.bundle, args.directory)
+        print(f'Unpacked {args.bundle} to {args.directory}')
+        return 0
+
+    groups = load(args.directory)
+    if not groups:
+        print(f'No PNGs found in {args.directory}', file = sys.stderr)
+        return 1
+
+    pack(groups, args.bundle)
+    print(f'Packed {sum(len(images) for images in groups.values())} images in {len(groups)} groups to {args.bundle}')
+    return 0
@@ -0,0 +1,289 @@
+from . import Rendering, IO, Timing, DiskCache
+import PIL.Image as Img
+import PIL.ImageColor as ImgC
+
+import argparse, collections, concurrent.futures, glob, json, os, os.path, sys, threading, time
+
+SHEET_EXTENSIONS = ('.png', '.tiff', '.tif')
+FILETYPES = {'Image': 'png', 'Overview': 'png', 'Entity': 'gif', 'Animation': 'gif'}
+RUN_OPTIONS = ('sources', 'output', 'workers', 'tile_workers', 'timings', 'disk_cache', 'disk_cache_mb') # options about the run rather than a render
+
+def find_sheets(sources: list[str], mask_suffix: str = '_mask') -> list[str]:
+    '''
+    sources can be files, directories or globs. Files ending with the mask suffix are left out since they're paired with their sheet.
+    '''
+    paths = []
+
+    for source in sources:
+        if os.path.isdir(source):
+            matches = [os.path.join(source, name) for name in os.listdir(source)]
+        else:
+            matches = glob.glob(source)
+
+        for path in matches:
+            stem, extension = os.path.splitext(path)
+            if extension.lower() not in SHEET_EXTENSIONS or not os.path.isfile(path):
+                continue
+            if mask_suffix and stem.endswith(mask_suffix):
+                continue
+            paths.append(path)
+
+    return sorted(set(paths))
+
+def find_mask(path: str, mask_suffix: str) -> str:
+    '''
+    returns the path of the mask paired with a sheet, or an empty string if there is none
+    '''
+    stem, _ = os.path.splitext(path)
+
+    for extension in SHEET_EXTENSIONS:
+        mask_path = stem + mask_suffix + extension
+        if os.path.isfile(mask_path):
+            return mask_path
+
+    return ''
+
+def load_texture(value: str) -> Img.Image:
+    '''
+    value is either a path to a texture or a color, a color gives a flat 10x10 texture like the app's defaults
+    '''
+    if os.path.isfile(value):
+        return Img.open(value).convert('RGBA')
+    return Img.new('RGBA', (10, 10), value)
+
+def sprite_count(mode: str, sheet: Rendering.Sheet, index: str, length: int, width: int, height: int) -> int:
+    '''
+    how many sprites a render in the given mode goes through, used for throughput reporting
+    '''
+    if mode == 'Entity':
+        return IO.length_filter(length, index, sheet.size, width, height, offset = 7) * 5 # still, 2 walks, 2 attacks
+    if mode == 'Overview':
+        rows = IO.length_filter(0, '0', sheet.size, width, height, offset = 7)
+        return rows * IO.length_filter(length, index, sheet.size, width, height, overview_override = True)
+    return IO.length_filter(length, index, sheet.size, width, height)
+
+def render_sheet(path: str, mask_path: str, output_dir: str, mode: str, speeds: str,
+                 clothing: str, accessory: str, timings: bool = False, **kwargs) -> tuple[str, int, float, dict]:
+    '''
+    kwargs are the IO.render args other than sheet and textures
+
+    renders and saves one sheet, returns the saved path, sprite count, wall time and the Timing report if timings is set
+    '''
+    if timings:
+        Timing.enable()
+        Timing.reset()
+
+    start = time.perf_counter()
+
+    sheet = IO.load_sheet(path)[0]
+    if mask_path:
+        sheet = IO.load_mask(mask_path, sheet)[0]
+
+    output_path = default_output(path, output_dir, mode)
+    _, count = render_to(sheet, bool(mask_path), output_path, mode, speeds, clothing, accessory, **kwargs)
+
+    return output_path, count, time.perf_counter() - start, Timing.report() if timings else None
+
+def _stat(path: str) -> tuple[int, int]:
+    stat = os.stat(path)
+    return (stat.st_mtime_ns, stat.st_size)
+
+class SheetCache:
+    '''
+    decoded sheets by sheet and mask path, loaded again once either file changes. Keeps the max_sheets most recently used,
+    sheets with a mask share the pixels and tile indexes of the sheet without one
+    '''
+    def __init__(self, max_sheets: int):
+        self.max_sheets = max_sheets
+        self.hits = 0
+        self.misses = 0
+
+        self._sheets = collections.OrderedDict() # (path, mask path): (stats, Sheet)
+        self._lock = threading.Lock()
+
+    def get(self, path: str, mask_path: str = '') -> Rendering.Sheet:
+        key = (path, mask_path)
+        stats = (_stat(path), _stat(mask_path) if mask_path else None)
+
+        with self._lock:
+            entry = self._sheets.get(key)
+            if entry is not None and entry[0] == stats:
+                self._sheets.move_to_end(key)
+                self.hits+= 1
+                return entry[1]
+            self.misses+= 1
+
+        if mask_path: # loaded outside the lock, two requests might load the same sheet but others don't wait on it
+            sheet = IO.load_mask(mask_path, self.get(path))[0]
+        else:
+            sheet = IO.load_sheet(path)[0]
+
+        with self._lock:
+            self._sheets[key] = (stats, sheet)
+            self._sheets.move_to_end(key)
+            while len(self._sheets) > self.max_sheets:
+                self._sheets.popitem(last = False)
+        return sheet
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {'cached': len(self._sheets), 'hits': self.hits, 'misses': self.misses}
+
+def default_output(path: str, output_dir: str, mode: str) -> str:
+    '''
+    where a sheet's render is saved, named after the sheet
+    '''
+    name = os.path.splitext(os.path.basename(path))[0]
+    return os.path.join(output_dir, f'{name}.{FILETYPES[mode]}')
+
+def render_to(sheet: Rendering.Sheet, has_mask: bool, output_path: str, mode: str, speeds: str,
+              clothing: str, accessory: str, **kwargs) -> tuple[list[Img.Image], int]:
+    '''
+    renders an already loaded sheet and saves it to output_path, returns the rendered images and the sprite count
+    '''
+    rendered_images = IO.render(mode, sheet,
+                                clothing_texture = load_texture(clothing), accessory_texture = load_texture(accessory),
+                                has_mask = has_mask, **kwargs)
+
+    IO.save(output_path, mode, rendered_images, IO.speed_filter(speeds, len(rendered_images)), kwargs.get('has_bg', False))
+
+    return rendered_images, sprite_count(mode, sheet, kwargs['index'], kwargs['length'], kwargs['width'], kwargs['height'])
+
+def make_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description = 'Renders sheets without the UI. Masks are picked up automatically from files named like "<sheet><mask suffix>.png".')
+
+    parser.add_argument('sources', nargs = '+', help = 'sheet files, directories or globs')
+    parser.add_argument('-o', '--output', default = './Renders', help = 'directory renders are saved to')
+    parser.add_argument('-m', '--mode', default = 'Image', choices = tuple(FILETYPES))
+    parser.add_argument('-j', '--workers', type = int, default = os.cpu_count(), help = 'how many sheets are rendered at once')
+    parser.add_argument('--tile-workers', type = int, default = 1, help = 'processes the tiles of one sheet are split across')
+
+    parser.add_argument('--index', default = '0', help = 'can be hex like in the app')
+    parser.add_argument('--length', type = int, default = 0, help = '0 renders the whole sheet from the index')
+    parser.add_argument('--width', type = int, default = 8)
+    parser.add_argument('--height', type = int, default = 8)
+    parser.add_argument('--scale', type = int, default = 5)
+
+    parser.add_argument('--no-shadow', action = 'store_true')
+    parser.add_argument('--shadow-color', default = '#000000')
+    parser.add_argument('--shadow-strength', type = float, default = 0.7)
+    parser.add_argument('--no-outline', action = 'store_true')
+    parser.add_argument('--outline-color', default = '#000000')
+    parser.add_argument('--outline-thickness', type = int, default = 1, help = '0 sets the thickness to 1/5 the scale')
+    parser.add_argument('--bg', default = '', help = 'background color, no background if left out')
+
+    parser.add_argument('--mask-suffix', default = '_mask')
+    parser.add_argument('--no-mask', action = 'store_true', help = 'ignore masks next to the sheets')
+    parser.add_argument('--clothing', default = '#ff0000', help = 'texture file or color')
+    parser.add_argument('--accessory', default = '#00ff00', help = 'texture file or color')
+    parser.add_argument('--speed', default = '500', help = 'GIF frame durations in ms, comma separated')
+    parser.add_argument('--timings', default = '', help = 'JSON file per stage render timings are saved to')
+    add_disk_cache_options(parser)
+
+    return parser
+
+def add_disk_cache_options(parser: argparse.ArgumentParser) -> None:
+    parser.add_argument('--disk-cache', nargs = '?', const = DiskCache.DEFAULT_DIR, default = '',
+                        help = f'keep renders in a directory between runs, {DiskCache.DEFAULT_DIR} (shared with the app) if no directory is given')
+    parser.add_argument('--disk-cache-mb', type = int, default = DiskCache.DEFAULT_MAX_BYTES // (1024 * 1024), help = 'size the disk cache is kept under')
+
+def disk_cache_args(args: argparse.Namespace) -> tuple[str, int]:
+    '''
+    IO.use_disk_cache args from the parsed options
+    '''
+    return (args.disk_cache, args.disk_cache_mb * 1024 * 1024)
+
+def parse_options(options: dict) -> argparse.Namespace:
+    '''
+    the render options from a dict like {'mode': 'Entity', 'scale': 6}, options left out get the parser's defaults.
+    Keys can be written with - or _, raises ValueError for unknown options and values that don't fit
+    '''
+    args = make_parser().parse_args([''])
+    for key, value in options.items():
+        key = key.replace('-', '_')
+        if key in RUN_OPTIONS or not hasattr(args, key):
+            raise ValueError(f'Unknown option {key}.')
+
+        default = getattr(args, key)
+        if isinstance(default, bool) and not isinstance(value, bool):
+            raise ValueError(f'{key} should be true or false.')
+        try:
+            setattr(args, key, type(default)(value))
+        except (TypeError, ValueError):
+            raise ValueError(f'{key} can\'t be {value!r}.')
+
+    if args.mode not in FILETYPES:
+        raise ValueError(f'Unknown mode {args.mode}.')
+    for key in ('width', 'height', 'scale'):
+        if getattr(args, key) < 1:
+            raise ValueError(f'{key} should be at least 1.')
+    return args
+
+def render_kwargs(args: argparse.Namespace) -> dict:
+    '''
+    the IO.render args from the parsed render options
+    '''
+    return {
+        'index': args.index,
+        'length': args.length,
+        'width': args.width,
+        'height': args.height,
+        'upscale': args.scale,
+        'shadow': not args.no_shadow,
+        'shadow_color': ImgC.getrgb(args.shadow_color)[:3],
+        'outline': not args.no_outline,
+        'outline_color': ImgC.getrgb(args.outline_color)[:3],
+        'has_bg': bool(args.bg),
+        'bg_color': args.bg,
+        'shadow_strength': args.shadow_strength,
+        'outline_thickness': args.outline_thickness,
+        'workers': args.tile_workers
+    }
+
+def main(argv: list[str] = None) -> int:
+    args = make_parser().parse_args(argv)
+
+    paths = find_sheets(args.sources, args.mask_suffix)
+    if not paths:
+        print('No sheets found.', file = sys.stderr)
+        return 1
+
+    os.makedirs(args.output, exist_ok = True)
+
+    kwargs = render_kwargs(args)
+
+    failed = 0
+    total_sprites = 0
+    sheet_timings = {}
+    start = time.perf_counter()
+
+    with concurrent.futures.ProcessPoolExecutor(max_workers = args.workers, initializer = IO.use_disk_cache, initargs = disk_cache_args(args)) as executor:
+        futures = {}
+        for path in paths:
+            mask_path = '' if args.no_mask else find_mask(path, args.mask_suffix)
+            future = executor.submit(render_sheet, path, mask_path, args.output, args.mode, args.speed, args.clothing, args.accessory, bool(args.timings), **kwargs)
+            futures[future] = path
+
+        for future in concurrent.futures.as_completed(futures):
+            path = futures[future]
+            try:
+                output_path, count, seconds, report = future.result()
+            except Exception as e:
+                failed+= 1
+                print(f'{path}: failed, {e}', file = sys.stderr)
+                continue
+
+            total_sprites+= count
+            if report:
+                sheet_timings[path] = report
+                Timing.merge(report['totals'])
+            print(f'{path} -> {output_path}: {count} sprites in {seconds:.2f}s ({count / seconds:.1f} sprites/s)')
+
+    elapsed = time.perf_counter() - start
+    print(f'{len(paths) - failed}/{len(paths)} sheets, {total_sprites} sprites in {elapsed:.2f}s ({total_sprites / elapsed:.1f} sprites/s)')
+
+    if args.timings:
+        with open(args.timings, 'w') as f:
+            json.dump({'totals': Timing.totals(), 'sheets': sheet_timings}, f, indent = 4)
+
+    return 1 if failed else 0
@@ -0,0 +1,354 @@
+from . import Rendering, IO, Batch, Timing, Assets
+import PIL.Image as Img
+import numpy as np
+
+import argparse, itertools, json, os, os.path, platform, sys, tempfile, time, tracemalloc
+import PIL
+
+try:
+    import resource
+except ImportError: # not on windows
+    resource = None
+
+MODES = ('Image', 'Entity', 'Animation', 'Overview')
+TILE_SIZES = (8, 16, 32)
+SHEET_SIZES = (128, 512, 4096)
+UPSCALES = (1, 5, 10)
+
+PALETTE = ((255, 255, 255), (214, 214, 214), (120, 120, 120), (64, 40, 24), (170, 90, 40), (240, 200, 60), (60, 110, 200), (20, 20, 20))
+
+def make_sheet(size: int, tile: int, seed: int = 0) -> Rendering.Sheet:
+    '''
+    a size x size sheet of tile x tile sprites made from a seed, with a mask. Sprites are blobs in a few flat colors like RotMG sprites and about 1 in 5 tiles is empty
+    '''
+    rng = np.random.default_rng(seed)
+    count = size // tile
+
+    # an ellipse per tile, centers and radii in tile pixels
+    centers = rng.uniform(tile * 0.3, tile * 0.7, (count, count, 2, 1, 1))
+    radii = rng.uniform(tile * 0.2, tile * 0.45, (count, count, 2, 1, 1))
+    y, x = np.mgrid[0:tile, 0:tile] + 0.5
+    inside = ((x - centers[:, :, 0]) / radii[:, :, 0]) ** 2 + ((y - centers[:, :, 1]) / radii[:, :, 1]) ** 2 <= 1
+    inside&= rng.random((count, count, 1, 1)) > 0.2
+
+    colors = np.array(PALETTE, np.uint8)[rng.integers(0, len(PALETTE), (count, count, tile, tile))]
+    alpha = np.where(inside, 255, 0).astype(np.uint8)
+    sheet = np.concatenate((colors, alpha[..., None]), axis = -1)
+
+    mask = np.zeros(sheet.shape, np.uint8)
+    mask[..., 0] = np.where(inside & (y < tile / 2), 255, 0) # clothing on top, accessory on the bottom
+    mask[..., 1] = np.where(inside & (y >= tile / 2) & (rng.random(inside.shape) > 0.5), 255, 0)
+    mask[..., 3] = np.where(mask[..., 0] | mask[..., 1], 255, 0)
+
+    def layout(tiles: np.ndarray) -> Img.Image:
+        return Img.fromarray(tiles.swapaxes(1, 2).reshape(count * tile, count * tile, 4))
+
+    return Rendering.Sheet(layout(sheet), layout(mask))
+
+def cases(quick: bool = False) -> list[dict]:
+    '''
+    every mode over the render settings on a 512px sheet of 16px tiles, then every mode over sheet and tile sizes with the default settings
+    '''
+    found = []
+    upscales = (5,) if quick else UPSCALES
+
+    for mode, upscale, shadow, outline, has_mask, has_bg in itertools.product(MODES, upscales, (True, False), (True, False), (True, False), (True, False)):
+        found.append({'mode': mode, 'sheet_size': 512, 'tile': 16, 'upscale': upscale,
+                      'shadow': shadow, 'outline': outline, 'has_mask': has_mask, 'has_bg': has_bg})
+
+    for mode, sheet_size, tile in itertools.product(MODES, SHEET_SIZES, TILE_SIZES):
+        if (sheet_size, tile) == (512, 16):
+            continue
+        found.append({'mode': mode, 'sheet_size': sheet_size, 'tile': tile, 'upscale': 5,
+                      'shadow': True, 'outline': True, 'has_mask': False, 'has_bg': False})
+
+    return found
+
+def case_name(case: dict) -> str:
+    flags = ','.join(name for name in ('shadow', 'outline', 'has_mask', 'has_bg') if case[name]) or 'plain'
+    return f'{case["mode"]}/{case["sheet_size"]}px/{case["tile"]}px/x{case["upscale"]}/{flags}'
+
+def case_length(mode: str, sheet: Rendering.Sheet, tile: int, max_sprites: int) -> int:
+    '''
+    the render length for a mode, Image and Animation stop at max_sprites and Entity at as many rows as fit in it
+    '''
+    tiles = (sheet.size[0] // tile) * (sheet.size[1] // tile)
+    if mode == 'Entity':
+        return max(1, min(tiles // 7, max_sprites // 5))
+    if mode == 'Overview':
+        return 3
+    return min(tiles, max_sprites)
+
+def _max_rss() -> int:
+    if resource is None:
+        return None
+    usage = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return usage if sys.platform == 'darwin' else usage * 1024 # kilobytes on linux
+
+def render_kwargs(case: dict, sheet: Rendering.Sheet, length: int) -> dict:
+    return {
+        'sheet': sheet,
+        'index': '0',
+        'length': length,
+        'width': case['tile'],
+        'height': case['tile'],
+        'upscale': case['upscale'],
+        'shadow': case['shadow'],
+        'shadow_color': (0, 0, 0),
+        'outline': case['outline'],
+        'outline_color': (0, 0, 0),
+        'has_bg': case['has_bg'],
+        'bg_color': '#36393e',
+        'has_mask': case['has_mask'],
+        'clothing_texture': Img.new('RGB', (10, 10), '#ff0000'),
+        'accessory_texture': Img.new('RGB', (10, 10), '#00ff00'),
+        'shadow_strength': 0.7,
+        'outline_thickness': 1
+    }
+
+def run_case(case: dict, sheet: Rendering.Sheet, repeats: int, max_sprites: int, output_dir: str, stages: bool = False) -> dict:
+    '''
+    times IO.render for a case, then IO.alpha_filter and IO.save on its result. With stages one more render is timed per stage by Timing
+    '''
+    mode, tile = case['mode'], case['tile']
+    length = case_length(mode, sheet, tile, max_sprites)
+    sprites = Batch.sprite_count(mode, sheet, '0', length, tile, tile)
+
+    result = {'name': case_name(case), **case, 'length': length, 'sprites': sprites}
+    if sprites > max_sprites * 2: # overview renders every row of the sheet
+        result['skipped'] = f'{sprites} sprites is over the limit'
+        return result
+
+    kwargs = render_kwargs(case, sheet, length)
+
+    rendered_images = IO.render(mode, **kwargs) # warm up
+    latencies = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        rendered_images = IO.render(mode, **kwargs)
+        latencies.append(time.perf_counter() - start)
+
+    tracemalloc.start()
+    IO.render(mode, **kwargs)
+    peak_traced = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+
+    if stages:
+        Timing.enable()
+        IO.render(mode, **kwargs)
+        Timing.disable()
+        result['stages'] = Timing.last()['stages']
+
+    start = time.perf_counter()
+    IO.alpha_filter(rendered_images[0])
+    alpha_filter_time = time.perf_counter() - start
+
+    filetype = Batch.FILETYPES[mode]
+    start = time.perf_counter()
+    IO.save(os.path.join(output_dir, f'benchmark.{filetype}'), mode, rendered_images, IO.speed_filter('100', len(rendered_images)), case['has_bg'])
+    save_time = time.perf_counter() - start
+
+    median = Timing.percentile(latencies, 50)
+    result.update({
+        'latency': {'min': min(latencies), 'mean': sum(latencies) / len(latencies),
+                    'p50': median, 'p90': Timing.percentile(latencies, 90), 'p99': Timing.percentile(latencies, 99)},
+        'sprites_per_second': sprites / median if median else None,
+        'alpha_filter_seconds': alpha_filter_time,
+        'save_seconds': save_time,
+        'peak_traced_bytes': peak_traced, # python and numpy allocations, PIL image buffers aren't traced
+        'max_rss_bytes': _max_rss(), # whole process so far
+        'output_size': rendered_images[0].size,
+        'dedupe': rendered_images.stats # identical tiles drawn once and reused
+    })
+    return result
+
+def check_native(case: dict, sheet: Rendering.Sheet, max_sprites: int) -> list[str]:
+    '''
+    renders a case with Rendering.native_compositing on and off, with outline thicknesses that do and don't land on whole sprite pixels.
+    returns a line for every render that isn't pixel identical
+    '''
+    length = case_length(case['mode'], sheet, case['tile'], max_sprites)
+    if Batch.sprite_count(case['mode'], sheet, '0', length, case['tile'], case['tile']) > max_sprites * 2:
+        return []
+
+    kwargs = render_kwargs(case, sheet, length)
+    mismatches = []
+
+    for outline_thickness in sorted({0, 1, case['upscale'], case['upscale'] * 2}):
+        kwargs['outline_thickness'] = outline_thickness
+        try:
+            Rendering.native_compositing = False
+            expected = IO.render(case['mode'], **kwargs)
+            Rendering.native_compositing = True
+            rendered = IO.render(case['mode'], **kwargs)
+        finally:
+            Rendering.native_compositing = True
+
+        if len(expected) != len(rendered) or any(a.tobytes() != b.tobytes() or a.size != b.size for a, b in zip(expected, rendered)):
+            mismatches.append(f'{case_name(case)}: outline thickness {outline_thickness} differs')
+
+    return mismatches
+
+def check_mask_channels(sheet: Rendering.Sheet, tile: int, upscale: int) -> list[str]:
+    '''
+    renders every tile with the mask's alpha cleared, Mask.render still draws textures from its red and green. Rendering.render
+    and render_many are compared to pasting the mask render without checking if the mask is empty, returns a line for every tile that differs
+    '''
+    pixels = np.array(sheet.mask_image.pixels)
+    pixels[..., 3] = 0
+    sheet = sheet.with_mask(Img.fromarray(pixels))
+
+    textures = (Img.new('RGBA', (10, 10), (255, 0, 0, 255)), Img.new('RGBA', (10, 10), (0, 255, 0, 255)))
+    settings = (upscale, True, True, True, (0, 0, 0), (0, 0, 0), 0.7, 1)
+    count = (sheet.size[0] // tile) * (sheet.size[1] // tile)
+
+    pairs = [IO.load_pair(sheet, index, tile, tile, *textures) for index in range(count)]
+    drawn = Rendering.render_many([sprite for sprite, _ in pairs], [mask for _, mask in pairs], *settings)
+    mismatches = []
+
+    for index, (sprite, mask) in enumerate(pairs):
+        expected = sprite.render(upscale, True, True, (0, 0, 0), 0.7, (0, 0, 0), 1)
+        rendered_mask = mask.render(upscale)
+        expected.paste(rendered_mask, mask = rendered_mask.getchannel('A'))
+
+        for name, rendered in (('render', Rendering.render(sprite, mask, *settings)), ('render_many', drawn[index])):
+            if rendered.tobytes() != expected.tobytes():
+                mismatches.append(f'mask without alpha, {tile}px tile {index}: {name} differs')
+
+    return mismatches
+
+def time_startup(path: str, repeats: int) -> dict:
+    '''
+    median seconds for the app to open its asset bundle and decode what it shows at startup (one icon set and the infobar and
+    preview images), and to decode every group like loading all the images up front did
+    '''
+    def startup() -> None:
+        bundle = Assets.Bundle(path)
+        bundle.icons(bundle.names('icons')[0])
+        bundle.group('images')
+
+    def everything() -> None:
+        bundle = Assets.Bundle(path)
+        for name in bundle.groups():
+            bundle.group(name)
+
+    result = {}
+    for name, load in (('startup', startup), ('everything', everything)):
+        times = []
+        for _ in range(repeats + 1): # the first is a warm up
+            start = time.perf_counter()
+            load()
+            times.append(time.perf_counter() - start)
+        result[name] = Timing.percentile(times[1:], 50)
+
+    return result
+
+def compare(old: dict, new: dict) -> list[str]:
+    '''
+    lines comparing median latency of cases in both runs, ratios under 1 are faster
+    '''
+    old_results = {r['name']: r for r in old['results'] if 'latency' in r}
+    lines = []
+
+    for r in new['results']:
+        if 'latency' not in r or r['name'] not in old_results:
+            continue
+        before, after = old_results[r['name']]['latency']['p50'], r['latency']['p50']
+        lines.append(f'{r["name"]}: {before * 1000:.1f}ms -> {after * 1000:.1f}ms ({after / before:.2f}x)')
+
+    return lines
+
+def make_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description = 'Times IO.render, IO.alpha_filter and IO.save on generated sheets and saves the results as JSON.')
+
+    parser.add_argument('-o', '--output', default = './benchmark.json', help = 'JSON file results are saved to')
+    parser.add_argument('-r', '--repeats', type = int, default = 5, help = 'timed renders per case, after one warm up render')
+    parser.add_argument('--quick', action = 'store_true', help = 'only upscale 5 in the settings matrix')
+    parser.add_argument('--only', default = '', help = 'only run cases whose name contains this, like "Entity/" or "x10"')
+    parser.add_argument('--max-sprites', type = int, default = 256, help = 'most sprites a case renders')
+    parser.add_argument('--seed', type = int, default = 0)
+    parser.add_argument('--cache', action = 'store_true', help = 'keep the render and shadow caches on, repeats will mostly time cache hits')
+    parser.add_argument('--stages', action = 'store_true', help = 'add per stage timings of one more render to each case')
+    parser.add_argument('--compare', default = '', help = 'JSON from an earlier run to compare against')
+    parser.add_argument('--check-native', action = 'store_true', help = 'only check that native compositing renders the same pixels as drawing at full size '
+                                                                        'and that masks without alpha still draw, nothing is timed')
+    parser.add_argument('--startup', default = '', nargs = '?', const = './bin/assets.bundle', help = 'only time loading the app\'s asset bundle, ./bin/assets.bundle if no path is given')
+
+    return parser
+
+def main(argv: list[str] = None) -> int:
+    args = make_parser().parse_args(argv)
+
+    if not args.cache or args.check_native: # cached renders would hide differences
+        Rendering.render_cache.max_bytes = 0
+        Rendering.shadow_cache.max_bytes = 0
+
+    if args.startup:
+        times = time_startup(args.startup, args.repeats)
+        print(f'assets at startup {times["startup"] * 1000:.2f}ms, every asset {times["everything"] * 1000:.2f}ms')
+        return 0
+
+    selected = [case for case in cases(args.quick) if args.only in case_name(case)]
+    if not selected:
+        print('No cases match.', file = sys.stderr)
+        return 1
+
+    sheets = {}
+    results = []
+    start = time.perf_counter()
+
+    if args.check_native:
+        mismatches = []
+        for case in selected:
+            key = (case['sheet_size'], case['tile'])
+            if key not in sheets:
+                sheets[key] = make_sheet(*key, seed = args.seed)
+            mismatches.extend(check_native(case, sheets[key], args.max_sprites))
+        mismatches.extend(check_mask_channels(make_sheet(128, 16, seed = args.seed), 16, 5))
+
+        for line in mismatches:
+            print(line)
+        print(f'{len(selected)} cases checked in {time.perf_counter() - start:.1f}s, {len(mismatches)} mismatches')
+        return 1 if mismatches else 0
+
+    with tempfile.TemporaryDirectory() as output_dir:
+        for case in selected:
+            key = (case['sheet_size'], case['tile'])
+            if key not in sheets:
+                sheets[key] = make_sheet(*key, seed = args.seed)
+
+            result = run_case(case, sheets[key], args.repeats, args.max_sprites, output_dir, args.stages)
+            results.append(result)
+
+            if 'skipped' in result:
+                print(f'{result["name"]}: skipped, {result["skipped"]}')
+            else:
+                latency = result['latency']
+                print(f'{result["name"]}: {result["sprites_per_second"]:.1f} sprites/s, p50 {latency["p50"] * 1000:.1f}ms, p99 {latency["p99"] * 1000:.1f}ms, '
+                      f'save {result["save_seconds"] * 1000:.1f}ms, peak {result["peak_traced_bytes"] / 2 ** 20:.1f}MiB, '
+                      f'reused {result["dedupe"]["reused"]}/{result["dedupe"]["tiles"]} tiles')
+
+    run = {
+        'meta': {
+            'time': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'seconds': time.perf_counter() - start,
+            'python': platform.python_version(),
+            'pillow': PIL.__version__,
+            'numpy': np.__version__,
+            'platform': platform.platform(),
+            'cpu_count': os.cpu_count(),
+            'args': vars(args)
+        },
+        'results': results
+    }
+
+    with open(args.output, 'w') as f:
+        json.dump(run, f, indent = 4)
+    print(f'{len(results)} cases in {run["meta"]["seconds"]:.1f}s, saved to {args.output}')
+
+    if args.compare:
+        with open(args.compare, 'r') as f:
+            for line in compare(json.load(f), run):
+                print(line)
+
+    return 0
@@ -0,0 +1,235 @@
+'''
+finished renders kept on disk between runs, shared by the app and headless renders
+
+entries are named by a hash of the sheet's pixels and every render arg. They're written to a temporary file and renamed into place
+so processes sharing the directory never read half an entry. Reading an entry touches its mtime, and once the directory
+goes over max_bytes the least recently used entries are removed
+'''
+
+import PIL.Image as Img
+import PIL.ImageColor as ImgC
+import numpy as np
+
+import hashlib, json, numbers, os, os.path, struct, tempfile, threading, weakref, zlib
+try:
+    import zstandard
+except ImportError: # entries are compressed with zlib instead
+    zstandard = None
+
+VERSION = 2 # part of every key, changing it leaves older entries to be evicted
+ZSTD_LEVEL = 3
+ZLIB_LEVEL = 6
+EVICT_TO = 0.9 # fraction of max_bytes left after evicting, so the directory isn't scanned on every put
+HEADER = struct.Struct('<I') # length of the JSON header in front of the pixels
+READ_ERRORS = (OSError, ValueError, struct.error, zlib.error) + ((zstandard.ZstdError,) if zstandard else ())
+
+DEFAULT_DIR = os.path.join(os.environ.get('LOCALAPPDATA') or os.environ.get('XDG_CACHE_HOME') or os.path.join(os.path.expanduser('~'), '.cache'),
+                           'RotMG-Sprite-Renderer', 'renders')
+DEFAULT_MAX_BYTES = 1024 * 1024 * 1024
+UNUSED = {'has_bg': ('bg_color',), 'has_mask': ('clothing_texture', 'accessory_texture'), # args that don't change the render while these are off
+          'shadow': ('shadow_color', 'shadow_strength'), 'outline': ('outline_color', 'outline_thickness')}
+
+_lock = threading.Lock()
+_hashes = weakref.WeakKeyDictionary() # sheet or mask image: hash of its pixels
+
+def _pixels_hash(image) -> bytes:
+    '''
+    hashed once per image, images read in strips are hashed a strip at a time
+    '''
+    with _lock:
+        digest = _hashes.get(image)
+    if digest is not None:
+        return digest
+
+    height = image.size[1]
+    hasher = hashlib.blake2b(digest_size = 16)
+    step = getattr(image, 'strip_rows', height)
+    for top in range(0, height, step):
+        hasher.update(np.ascontiguousarray(image.rows(top, top + step)))
+    digest = hasher.digest()
+
+    with _lock:
+        _hashes[image] = digest
+    return digest
+
+def _normalize(name: str, value):
+    '''
+    the same setting written different ways comes out the same: colors as RGB(A) lists whether they're names, hex or
+    tuples, numbers as ints when they're whole, textures as their size and a hash of their pixels
+    '''
+    if isinstance(value, Img.Image): # textures
+        return [value.mode, *value.size, hashlib.blake2b(value.tobytes(), digest_size = 16).hexdigest()]
+    if name.endswith('_color') and value:
+        color = [int(v) for v in (ImgC.getrgb(value) if isinstance(value, str) else value)]
+        return color[:3] if len(color) == 4 and color[3] == 255 else color
+    if name == 'outline_thickness': # None and 0 both use the default offset
+        value = value or 0
+    if isinstance(value, (bool, np.bool_)):
+        return bool(value)
+    if isinstance(value, numbers.Real):
+        value = float(value)
+        return int(value) if value.is_integer() else value
+    return value
+
+def key(mode: str, arguments: dict) -> str:
+    '''
+    the entry name of an IO.render call, arguments are its args by name. Settings are normalized and ones that don't change
+    the render are left out before hashing, so equivalent calls from the app, Batch, Manifest and Service share entries
+    '''
+    sheet = arguments['sheet']
+    unused = {name for switch, names in UNUSED.items() if not arguments.get(switch) for name in names}
+    settings = {name: _normalize(name, value) for name, value in arguments.items() if name != 'sheet' and name not in unused}
+
+    digest = hashlib.blake2b(digest_size = 20)
+    digest.update(json.dumps([VERSION, mode, sheet.size, settings], sort_keys = True).encode())
+    digest.update(_pixels_hash(sheet.sheet_image))
+    if sheet.has_mask:
+        digest.update(_pixels_hash(sheet.mask_image))
+
+    return digest.hexdigest()
+
+def _encode(images: list[Img.Image], stats: dict) -> bytes:
+    header = json.dumps({'images': [[image.mode, *image.size] for image in images], 'stats': stats}).encode()
+    data = HEADER.pack(len(header)) + header + b''.join(image.tobytes() for image in images)
+
+    if zstandard:
+        return b'z' + zstandard.ZstdCompressor(level = ZSTD_LEVEL).compress(data)
+    return b'l' + zlib.compress(data, ZLIB_LEVEL)
+
+def _decode(data: bytes) -> tuple[list[Img.Image], dict]:
+    '''
+    raises ValueError for entries that can't be read, like ones compressed with zstandard when it isn't installed
+    '''
+    if data[:1] == b'z' and zstandard:
+        data = zstandard.ZstdDecompressor().decompress(data[1:])
+    elif data[:1] == b'l':
+        data = zlib.decompress(data[1:])
+    else:
+        raise ValueError('Unreadable render cache entry.')
+
+    length = HEADER.unpack_from(data)[0]
+    header = json.loads(data[HEADER.size:HEADER.size + length])
+
+    images = []
+    offset = HEADER.size + length
+    for mode, width, height in header['images']:
+        image = Img.frombytes(mode, (width, height), data[offset:])
+        offset+= len(image.getbands()) * width * height
+        images.append(image)
+
+    return images, header['stats']
+
+class DiskCache:
+    '''
+    LRU cache of whole renders in a directory, several processes can use the same directory at once.
+    max_bytes is the compressed size of the entries
+    '''
+    def __init__(self, directory: str, max_bytes: int):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+
+        self._bytes = None # size of the directory as of the last scan plus what was put since, scanned on the first put
+        self._lock = threading.Lock()
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, key[:2], key)
+
+    def get(self, key: str) -> tuple[list[Img.Image], dict]:
+        '''
+        returns (images, stats) of the render, None on a miss
+        '''
+        path = self._path(key)
+        try:
+            with open(path, 'rb') as f:
+                images, stats = _decode(f.read())
+            os.utime(path) # most recently used
+        except READ_ERRORS: # missing, evicted or unreadable
+            with self._lock:
+                self.misses+= 1
+            return None
+
+        with self._lock:
+            self.hits+= 1
+        return images, stats
+
+    def put(self, key: str, images: list[Img.Image], stats: dict) -> None:
+        data = _encode(images, stats)
+        if len(data) > self.max_bytes:
+            return
+
+        path = self._path(key)
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok = True)
+            descriptor, temporary = tempfile.mkstemp(dir = os.path.dirname(path), suffix = '.tmp')
+        except OSError: # a read only directory
+            return
+
+        try:
+            with os.fdopen(descriptor, 'wb') as f:
+                f.write(data)
+            os.replace(temporary, path)
+        except OSError: # on windows another process can have the entry open, it's the same render
+            try:
+                os.remove(temporary)
+            except OSError:
+                pass
+            return
+
+        with self._lock:
+            if self._bytes is not None:
+                self._bytes+= len(data)
+            scan = self._bytes is None or self._bytes > self.max_bytes
+        if scan:
+            self.evict()
+
+    def _entries(self) -> list[tuple[int, int, str]]:
+        '''
+        (mtime, size, path) of every file in the directory, temporary files of puts that didn't finish included
+        '''
+        entries = []
+        try:
+            folders = os.listdir(self.directory)
+        except OSError:
+            return entries
+
+        for folder in folders:
+            try:
+                with os.scandir(os.path.join(self.directory, folder)) as scan:
+                    for entry in scan:
+                        try:
+                            stat = entry.stat()
+                        except OSError: # removed by another process
+                            continue
+                        entries.append((stat.st_mtime_ns, stat.st_size, entry.path))
+            except OSError: # not a folder
+                continue
+
+        return entries
+
+    def evict(self) -> None:
+        '''
+        removes the least recently used entries until the directory is under EVICT_TO of max_bytes, if it's over max_bytes
+        '''
+        entries = sorted(self._entries())
+        total = sum(size for _, size, _ in entries)
+
+        if total > self.max_bytes:
+            for _, size, path in entries:
+                if total <= self.max_bytes * EVICT_TO:
+                    break
+                try:
+                    os.remove(path)
+                except FileNotFoundError: # another process evicted it first
+                    pass
+                except OSError: # open in another process on windows
+                    continue
+                total-= size
+
+        with self._lock:
+            self._bytes = total
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {'hits': self.hits, 'misses': self.misses, 'bytes': self._bytes, 'max_bytes': self.max_bytes, 'directory': self.directory}
@@ -0,0 +1,153 @@
+from . import Timing
+import PIL.Image as Img
+import PIL.GifImagePlugin as GifImg
+import numpy as np
+
+import struct
+
+TRANSPARENT = (0, 0, 1) # reserved color, it's what blank areas of renders hold and is see through in gifs without a background
+TRANSPARENT_KEY = (TRANSPARENT[0] << 16) | (TRANSPARENT[1] << 8) | TRANSPARENT[2]
+
+def _keys(image: Img.Image) -> np.ndarray:
+    '''
+    pixels as 24 bit rgb ints, pixels with 0 alpha count as the transparent color
+    '''
+    a = np.asarray(image.convert('RGBA'))
+    keys = (a[..., 0].astype(np.uint32) << 16) | (a[..., 1].astype(np.uint32) << 8) | a[..., 2]
+    keys[a[..., 3] == 0] = TRANSPARENT_KEY
+    return keys
+
+def _rgb(keys: np.ndarray) -> np.ndarray:
+    return np.stack((keys >> 16, (keys >> 8) & 255, keys & 255), axis = -1).astype(np.uint8)
+
+@Timing.timed('gif_palette')
+def build_palette(frames: list[Img.Image], transparency: bool) -> tuple[np.ndarray, np.ndarray]:
+    '''
+    one palette for every frame, returns (palette as (n, 3) rgb, frames as (n_frames, height, width) palette indices)
+
+    sprites rarely have more than a few hundred colors so the palette is usually exact, otherwise it's quantized
+    from all frames at once. With transparency index 0 is kept for the transparent color.
+    '''
+    keys = np.stack([_keys(frame) for frame in frames])
+
+    # renders have a blank border so the corner color covers most of them, only the other pixels need sorting
+    flat = keys.ravel()
+    background = flat[0]
+    others = flat != background
+    colors, other_inverse, counts = np.unique(flat[others], return_inverse = True, return_counts = True)
+
+    colors, counts = np.append(colors, background), np.append(counts, len(flat) - len(other_inverse))
+    inverse = np.full(flat.shape, len(colors) - 1)
+    inverse[others] = other_inverse
+
+    see_through = (colors == TRANSPARENT_KEY) if transparency else np.zeros(colors.shape, bool)
+    first = 1 if transparency else 0
+    opaque, opaque_counts = colors[~see_through], counts[~see_through]
+
+    lut = np.zeros(colors.shape, np.uint8) # unique color -> palette index
+    if len(opaque) <= 256 - first:
+        palette = _rgb(opaque)
+        lut[~see_through] = np.arange(len(opaque)) + first
+    else:
+        weighted = Img.fromarray(_rgb(np.repeat(opaque, opaque_counts))[None]) # every opaque pixel so common colors get more of the palette
+        quantized = weighted.quantize(256 - first, method = Img.Quantize.MEDIANCUT)
+        mapped = Img.fromarray(_rgb(opaque)[None]).quantize(palette = quantized, dither = Img.Dither.NONE)
+
+        palette = np.array(quantized.getpalette()[:(256 - first) * 3], np.uint8).reshape(-1, 3)
+        lut[~see_through] = np.asarray(mapped)[0] + first
+
+    if transparency:
+        palette = np.concatenate((np.array([TRANSPARENT], np.uint8), palette))
+
+    return palette, lut[inverse.reshape(keys.shape)]
+
+def _bbox(mask: np.ndarray) -> tuple[int, int, int, int]:
+    '''
+    (left, top, right, bottom) of the True area, None if there isn't any
+    '''
+    rows, columns = mask.any(axis = 1), mask.any(axis = 0)
+    if not rows.any():
+        return None
+    return (int(columns.argmax()), int(rows.argmax()), len(columns) - int(columns[::-1].argmax()), len(rows) - int(rows[::-1].argmax()))
+
+def _union(a: tuple[int, int, int, int], b: tuple[int, int, int, int]) -> tuple[int, int, int, int]:
+    if a is None or b is None:
+        return a or b
+    return (min(a[0], b[0]), min(a[1], b[1]), max(a[2], b[2]), max(a[3], b[3]))
+
+@Timing.timed('gif_plan')
+def plan(frames: np.ndarray, transparency: bool) -> list[tuple[tuple[int, int, int, int], int]]:
+    '''
+    (rect, disposal) for every frame. Frames after the first only redraw the rect that changed and leave the rest (disposal 1).
+    A frame is cleared afterwards (disposal 2) when pixels go transparent in the next frame, since drawing transparent over them wouldn't show,
+    its rect is grown to cover those pixels and the next frame redraws all of it. The first frame follows the last when looping.
+    '''
+    count, height, width = frames.shape
+
+    cleared = [None] * count # pixels that go transparent on the way into each frame
+    if transparency and count > 1:
+        for k in range(count):
+            cleared[k] = _bbox((frames[k] == 0) & (frames[k - 1] != 0))
+
+    steps = []
+    for k in range(count):
+        if k == 0:
+            rect = (0, 0, width, height)
+        else:
+            rect = _bbox(frames[k] != frames[k - 1])
+            if steps[-1][1] == 2:
+                rect = _union(rect, steps[-1][0])
+
+        after = cleared[(k + 1) % count]
+        rect = _union(rect, after) or (0, 0, 1, 1) # a frame needs at least one pixel
+        steps.append((rect, 2 if after else 1))
+
+    return steps
+
+def _merge(frames: np.ndarray, durations: list[int]) -> tuple[np.ndarray, list[int]]:
+    '''
+    drops frames that are the same as the one before them and adds their durations to it
+    '''
+    keep, merged = [0], [durations[0]]
+    for k in range(1, len(frames)):
+        if np.array_equal(frames[k], frames[keep[-1]]):
+            merged[-1]+= durations[k]
+        else:
+            keep.append(k)
+            merged.append(durations[k])
+
+    return frames[keep], merged
+
+def header(size: tuple[int, int], palette: np.ndarray, loop: int = 0) -> bytes:
+    bits = max(int(len(palette) - 1).bit_length(), 1) # the color table holds 2 ** bits colors
+    table = np.zeros((1 << bits, 3), np.uint8)
+    table[:len(palette)] = palette
+
+    return (b'GIF89a' + struct.pack('<HHBBB', size[0], size[1], 0x80 | (bits - 1), 0, 0) + table.tobytes()
+            + b'!\xff\x0bNETSCAPE2.0\x03\x01' + struct.pack('<H', loop) + b'\x00')
+
+def save(path: str, frames: list[Img.Image], durations: list[int], has_bg: bool) -> None:
+    '''
+    saves frames as a looping gif with one shared palette, frames are written one at a time as only the part that changed.
+    Without a background the transparent color (0, 0, 1) and 0 alpha pixels are see through.
+    '''
+    transparency = not has_bg
+    palette, indices = build_palette(frames, transparency)
+    indices, durations = _merge(indices, durations[:len(frames)])
+
+    with open(path, 'wb') as f:
+        f.write(header(frames[0].size, palette))
+
+        disposal_before = None
+        for k, ((left, top, right, bottom), disposal) in enumerate(plan(indices, transparency)):
+            area = indices[k, top:bottom, left:right]
+            if transparency and disposal_before == 1: # unchanged pixels are left see through, it compresses better
+                area = np.where(area == indices[k - 1, top:bottom, left:right], 0, area).astype(np.uint8)
+
+            for data in GifImg.getdata(Img.fromarray(area), (left, top), duration = durations[k], disposal = disposal,
+                                       transparency = 0 if transparency else None):
+                f.write(data)
+
+            disposal_before = disposal
+
+        f.write(b';')
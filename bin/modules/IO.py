@@ -1,6 +1,13 @@
-from . import Rendering
+from . import Rendering, GIF, Timing, Strips, Parallel, DiskCache
 import PIL.Image as Img
-import io, json, win32clipboard
+import numpy as np
+
+import inspect, io, json, threading, time
+
+try:
+    import win32clipboard
+except ImportError: # headless/non-windows builds have no clipboard
+    win32clipboard = None
 
 class SheetVar: # var with get/set like tkinter vars
     def __init__(self, sheet: Rendering.Sheet):
@@ -91,9 +98,269 @@ class InfobarAlert:
     def __bool__(self):
         return bool(self.text)
 
-PNG = win32clipboard.RegisterClipboardFormat('PNG')
-TIF = win32clipboard.RegisterClipboardFormat('TIF')
-TIFF = win32clipboard.RegisterClipboardFormat('TIFF')
+class RenderCancelled(Exception):
+    pass
+
+class Rendered(list):
+    '''
+    the images from render, with stats on how many tiles were drawn once and reused:
+    {'tiles': tiles in the render, 'unique': tiles that were drawn or came from the cache, 'reused': tiles that shared another's render}
+    '''
+    def __init__(self, images: list[Img.Image], tiles: int, unique: int):
+        super().__init__(images)
+        self.stats = {'tiles': tiles, 'unique': unique, 'reused': tiles - unique}
+
+class RenderWorker:
+    '''
+    renders on a background thread so the UI stays responsive. Only the newest request matters,
+    a request waiting to start is replaced by newer ones and results of superseded requests are dropped.
+    Renders that report progress (Image mode) are cancelled as soon as they're superseded.
+    '''
+    partial_interval = 0.1 # seconds between partial images
+
+    def __init__(self):
+        self._condition = threading.Condition()
+        self._generation = 0 # number of the newest request
+        self._request = None # (generation, mode, kwargs) waiting to start
+        self._result = None # (generation, images, exception) waiting to be taken
+        self._partial = None # (generation, image) of the newest partly done render
+        self._running = False
+        self._closed = False
+
+        self._thread = threading.Thread(target = self._run, daemon = True)
+        self._thread.start()
+
+    def submit(self, mode: str, **kwargs) -> int:
+        '''
+        kwargs are the same as for render, returns the request's generation
+        '''
+        with self._condition:
+            self._generation+= 1
+            self._request = (self._generation, mode, kwargs)
+            self._condition.notify()
+            return self._generation
+
+    def is_stale(self, generation: int) -> bool:
+        return generation != self._generation
+
+    @property
+    def busy(self) -> bool:
+        '''
+        if there is a request or result that hasn't been taken yet
+        '''
+        return self._running or self._request is not None or self._result is not None
+
+    def wait(self) -> None:
+        '''
+        blocks until the newest request is done rendering
+        '''
+        with self._condition:
+            while (self._running or self._request is not None) and not self._closed:
+                self._condition.wait()
+
+    def take_partial(self) -> Img.Image:
+        '''
+        returns a copy of the newest request's image as it's being rendered, None if there isn't a new one
+        '''
+        with self._condition:
+            partial, self._partial = self._partial, None
+
+        if partial is None or self.is_stale(partial[0]):
+            return None
+        return partial[1]
+
+    def take(self) -> tuple[list[Img.Image], Exception]:
+        '''
+        returns (images, exception) of the newest request once it's done, None otherwise
+        '''
+        with self._condition:
+            result, self._result = self._result, None
+
+        if result is None or self.is_stale(result[0]):
+            return None
+        return result[1:]
+
+    def close(self) -> None:
+        with self._condition:
+            self._closed = True
+            self._condition.notify()
+
+    def _run(self) -> None:
+        while True:
+            with self._condition:
+                while self._request is None and not self._closed:
+                    self._condition.wait()
+                if self._closed:
+                    return
+
+                generation, mode, kwargs = self._request
+                self._request = None
+                self._running = True
+
+            try:
+                images, exception = render(mode, progress = self._make_progress(generation), **kwargs), None
+            except RenderCancelled:
+                images, exception = None, None
+            except Exception as e: # handed to the UI thread to show
+                images, exception = None, e
+
+            with self._condition:
+                self._running = False
+                self._partial = None
+                if not self.is_stale(generation):
+                    self._result = (generation, images, exception)
+                self._condition.notify_all() # for wait
+
+    def _make_progress(self, generation: int) -> callable:
+        last_partial = float('-inf') # the first partial shows straight away, later ones wait partial_interval
+
+        def progress(image: Img.Image) -> None:
+            nonlocal last_partial
+            if self.is_stale(generation):
+                raise RenderCancelled
+
+            now = time.perf_counter()
+            if now - last_partial >= self.partial_interval:
+                last_partial = now
+                partial = image.copy() # the render keeps drawing on image
+                with self._condition:
+                    self._partial = (generation, partial)
+
+        return progress
+
+def preview_image(sheet: Rendering.Sheet, index: int, width: int, height: int, size: int, padding: int, outline: Img.Image, mask: bool = False) -> Img.Image:
+    '''
+    the area around a tile, scaled to size x size with the outline template over the tile and ready for tk
+    '''
+    image = sheet.get_sprite(index, width, height, padding = padding)[mask]
+
+    if size < 5: # for startup
+        image = image.resize((5, 5), resample = Img.BOX)
+    else:
+        image = image.resize((size, size), resample = Img.BOX)
+        scale_factor = size // (2 * padding + 1)
+        outline = outline.resize((scale_factor,) * 2, resample = Img.BOX)
+        image.alpha_composite(outline, (size // 2 - scale_factor // 2,) * 2) # basing off of factor and padding inconsistent since sprite sizes inconsistent, this works better
+
+    return alpha_filter(image)
+
+class PreviewAtlas:
+    '''
+    preview_images of a sheet's tiles at one tile and preview size, built on a background thread outward from the tile being looked at
+    so moving around the sheet only looks them up. Changing the sheet, tile size or preview size starts a new atlas.
+    At most max_bytes of previews are kept, the ones furthest from the current tile are dropped first
+    '''
+    max_bytes = 64 * 1024 * 1024
+
+    def __init__(self, padding: int, outline: Img.Image, mask: bool = False):
+        self._padding = padding
+        self._outline = outline
+        self._mask = mask
+
+        self._condition = threading.Condition()
+        self._key = None # (sheet, width, height, size)
+        self._previews = {} # index: preview
+        self._center = None # tile the previews are built around, None once they all are
+        self._closed = False
+
+        self._thread = threading.Thread(target = self._run, daemon = True)
+        self._thread.start()
+
+    def get(self, sheet: Rendering.Sheet, index: int, width: int, height: int, size: int) -> Img.Image:
+        '''
+        the preview of a tile, made here if it isn't built yet. The atlas is then built around that tile
+        '''
+        key = (sheet, width, height, size)
+
+        with self._condition:
+            if key != self._key: # sheets only equal themselves
+                self._key = key
+                self._previews = {}
+            preview = self._previews.get(index)
+
+        if preview is None:
+            preview = preview_image(sheet, index, width, height, size, self._padding, self._outline, self._mask)
+
+        with self._condition:
+            if self._key == key:
+                self._previews[index] = preview
+                self._center = index
+                self._condition.notify()
+
+        return preview
+
+    def close(self) -> None:
+        with self._condition:
+            self._closed = True
+            self._condition.notify()
+
+    def _order(self, key: tuple, center: int) -> list[int]:
+        '''
+        tiles to keep previews of, nearest to center first. Rows count as far as columns so holding any arrow key stays in the atlas.
+        Tiles up to a distance are a square around center, so only the smallest square holding count tiles is sorted instead of the sheet
+        '''
+        sheet, width, height, size = key
+        column_count, row_count = max(sheet.size[0] // width, 1), max(sheet.size[1] // height, 1)
+        count = max(self.max_bytes // (max(size, 5) ** 2 * 4), 1)
+        center_row, center_column = divmod(center, column_count)
+
+        radius = max(int(count ** 0.5) // 2, 1)
+        while True:
+            top, bottom = min(max(center_row - radius, 0), row_count), min(max(center_row + radius + 1, 0), row_count)
+            left, right = max(center_column - radius, 0), min(center_column + radius + 1, column_count)
+            if (bottom - top) * (right - left) >= count or (top, bottom, left, right) == (0, row_count, 0, column_count):
+                break
+            radius*= 2
+
+        rows, columns = np.arange(top, bottom)[:, None], np.arange(left, right)
+        distance = np.maximum(abs(rows - center_row), abs(columns - center_column)).ravel()
+        indexes = (rows * column_count + columns).ravel()
+        return indexes[np.argsort(distance, kind = 'stable')[:count]].tolist()
+
+    def _run(self) -> None:
+        while True:
+            with self._condition:
+                while self._center is None and not self._closed:
+                    self._condition.wait()
+                if self._closed:
+                    return
+
+                key, center = self._key, self._center
+                self._center = None
+
+            try:
+                order = self._order(key, center)
+            except ZeroDivisionError: # tile size wider than the sheet, nothing to build
+                continue
+
+            with self._condition:
+                if self._key != key:
+                    continue
+                wanted = set(order)
+                self._previews = {index: preview for index, preview in self._previews.items() if index in wanted or index == center}
+
+            for index in order:
+                with self._condition:
+                    if self._key != key or self._center is not None or self._closed: # moved on, start again from the new tile
+                        break
+                    if index in self._previews:
+                        continue
+
+                try:
+                    preview = preview_image(key[0], index, key[1], key[2], key[3], self._padding, self._outline, self._mask)
+                except Exception: # shown by get when the tile is looked at
+                    continue
+
+                with self._condition:
+                    if self._key == key:
+                        self._previews[index] = preview
+
+if win32clipboard:
+    PNG = win32clipboard.RegisterClipboardFormat('PNG')
+    TIF = win32clipboard.RegisterClipboardFormat('TIF')
+    TIFF = win32clipboard.RegisterClipboardFormat('TIFF')
+
+PROGRESS_SPRITES = 32 # about how many sprites Image mode renders between progress updates
 
 def index_filter(index: str) -> int:
     if not index or index.endswith('0x'):
@@ -118,15 +385,92 @@ def speed_filter(speeds_string: str, length: int) -> list[int]:
     speeds = speeds * (length // len(speeds) + 1) # this has some undefined behavior but it still works
     return speeds[:length]
 
+def open_image(path: str) -> Img.Image:
+    '''
+    large pngs are read in strips as they're used, everything else is loaded whole
+    '''
+    if Strips.large_png(path):
+        try:
+            return Strips.StripImage(path)
+        except ValueError: # a png that can't be read in strips
+            pass
+    return Img.open(path)
+
 def load_sheet(path: str) -> tuple[Rendering.Sheet, str]:
-    sheet = Rendering.Sheet(Rendering.Img.open(path))
+    sheet = Rendering.Sheet(open_image(path))
     return (sheet, path)
     
 def load_mask(path: str, sheet: Rendering.Sheet) -> tuple[Rendering.Sheet, str]:
-    sheet = Rendering.Sheet(sheet.sheet_image, Img.open(path))
+    sheet = sheet.with_mask(open_image(path))
     return (sheet, path)
 
-def render(mode: str, *args, **kwargs) -> list[Img.Image]:
+def load_pair(sheet: Rendering.Sheet, index: int, width: int, height: int, clothing_texture: Img.Image, accessory_texture: Img.Image) -> tuple[Rendering.Sprite, Rendering.Mask]:
+    '''
+    the sprite and mask at index, with their bounding boxes from the sheet's tile index
+    '''
+    sprite, mask = sheet.tile(index, width, height)
+    return (Rendering.Sprite(sprite, sheet.tile_index(width, height).bbox(index)),
+            Rendering.Mask(mask, clothing_texture, accessory_texture, sheet.tile_index(width, height, mask = True).bbox(index)))
+
+def load_pairs(sheet: Rendering.Sheet, indexes: list[int], width: int, height: int, clothing_texture: Img.Image, accessory_texture: Img.Image) -> tuple[list[Rendering.Sprite], list[Rendering.Mask]]:
+    '''
+    load_pair for many indexes. Whole tiles are views into the sheet's grid instead of being cropped one at a time,
+    tiles the grid leaves out (a partial last row, tiles past the end) and sheets read in strips are cropped like load_pair
+    '''
+    sprite_grid, mask_grid = sheet.grid(width, height), sheet.grid(width, height, mask = True)
+    if sprite_grid is None or mask_grid is None:
+        pairs = [load_pair(sheet, index, width, height, clothing_texture, accessory_texture) for index in indexes]
+        return [sprite for sprite, _ in pairs], [mask for _, mask in pairs]
+
+    sprite_index, mask_index = sheet.tile_index(width, height), sheet.tile_index(width, height, mask = True)
+    column_count = sheet.size[0] // width
+    sprites, masks = [], []
+
+    with Timing.stage('crop'):
+        for index in indexes:
+            row, column = divmod(index, column_count)
+            if row < sprite_grid.shape[0]:
+                sprite, mask = sprite_grid[row, column], mask_grid[row, column]
+            else:
+                sprite, mask = sheet.tile(index, width, height)
+
+            sprites.append(Rendering.Sprite(sprite, sprite_index.bbox(index)))
+            masks.append(Rendering.Mask(mask, clothing_texture, accessory_texture, mask_index.bbox(index)))
+
+    return sprites, masks
+
+def _settings(upscale: int, shadow: bool, outline: bool, has_mask: bool, shadow_color: tuple[int, int, int], outline_color: tuple[int, int, int],
+              shadow_strength: float, outline_thickness: int) -> dict:
+    '''
+    the render_many settings handed to Parallel.render_tiles
+    '''
+    return {'upscale': upscale, 'shadow': shadow, 'outline': outline, 'has_mask': has_mask, 'shadow_color': shadow_color, 'outline_color': outline_color,
+            'shadow_strength': shadow_strength, 'outline_thickness': outline_thickness}
+
+def background(image: Img.Image, bg_color: str) -> Img.Image:
+    with Timing.stage('background'):
+        return Img.alpha_composite(Img.new('RGBA', image.size, bg_color), image)
+
+disk_cache = None # DiskCache.DiskCache renders are kept in between runs, render doesn't look on disk while it's None
+
+def use_disk_cache(directory: str = DiskCache.DEFAULT_DIR, max_bytes: int = DiskCache.DEFAULT_MAX_BYTES) -> None:
+    '''
+    keeps finished renders in directory, an empty directory turns the disk cache off. Also a process pool initializer
+    '''
+    global disk_cache
+    disk_cache = DiskCache.DiskCache(directory, max_bytes) if directory else None
+
+def _arguments(args: tuple, kwargs: dict) -> dict:
+    '''
+    render args by name with defaults filled in and the index as a number, every mode takes the same args as r_image
+    '''
+    bound = inspect.signature(r_image).bind(*args, **kwargs)
+    bound.apply_defaults()
+    arguments = {name: value for name, value in bound.arguments.items() if name not in ('progress', 'workers')}
+    arguments['index'] = index_filter(arguments['index'])
+    return arguments
+
+def render(mode: str, *args, progress: callable = None, workers: int = 1, **kwargs) -> list[Img.Image]:
     '''
     modes: Image, Entity, Animation, Overview
 
@@ -134,16 +478,38 @@ def render(mode: str, *args, **kwargs) -> list[Img.Image]:
           has_bg, bg_color, has_mask, clothing_texture, accessory_texture,
           shadow_strength, shadow_color, outline_thickness, outline_color
 
-    a function that maps modes to render functions for i/o
+    progress is called with the partly done image as Image mode fills it in, other modes don't report progress.
+    returns a Rendered list, identical tiles are drawn once per call and its stats say how many were reused.
+    Image, Animation and Overview renders of enough tiles are split across workers processes by Parallel.
+    With a disk_cache, renders done before (in any process using the same directory) are read back instead and progress isn't called
+
+    a function that maps modes to render functions for i/o, each call is recorded by Timing while it's enabled
     '''
-    if mode == 'Image':
-        return r_image(*args, **kwargs)
-    if mode == 'Entity':
-        return r_entity(*args, **kwargs)
-    if mode == 'Animation':
-        return r_animation(*args, **kwargs)
-    if mode == 'Overview':
-        return r_overview(*args, **kwargs)
+    with Timing.record(mode):
+        cache = disk_cache
+        if cache:
+            with Timing.stage('disk_cache'):
+                key = DiskCache.key(mode, _arguments(args, kwargs))
+                cached = cache.get(key)
+            if cached:
+                images, stats = cached
+                return Rendered(images, stats['tiles'], stats['unique'])
+
+        if mode == 'Image':
+            rendered = r_image(*args, progress = progress, workers = workers, **kwargs)
+        elif mode == 'Entity':
+            rendered = r_entity(*args, **kwargs)
+        elif mode == 'Animation':
+            rendered = r_animation(*args, workers = workers, **kwargs)
+        elif mode == 'Overview':
+            rendered = r_overview(*args, workers = workers, **kwargs)
+        else:
+            return None
+
+        if cache:
+            with Timing.stage('disk_cache'):
+                cache.put(key, rendered, rendered.stats)
+        return rendered
 
 def r_image(sheet: Rendering.Sheet, index: str, # str in case hex conversion needed
            length: int, # length in image mode is how many consecutive images to render
@@ -153,26 +519,44 @@ def r_image(sheet: Rendering.Sheet, index: str, # str in case hex conversion nee
            shadow_color: tuple[int, int, int], outline_color: tuple[int, int, int],
            has_bg: bool = False, bg_color: str = '',
            has_mask: bool = False, clothing_texture: Img.Image = None, accessory_texture: Img.Image = None, 
-           shadow_strength: float = 1.0, outline_thickness: int = None) -> list[Img.Image]:
+           shadow_strength: float = 1.0, outline_thickness: int = None,
+           progress: callable = None, workers: int = 1) -> list[Img.Image]:
     
     f_index = index_filter(index) # filtered index
     f_length = length_filter(length, index, sheet.size, width, height) # filtered length, if 0, length set to entire sheet
-    rendered_images = []
-
-    for i in range(f_length):
-        sprite, mask = sheet.get_sprite(f_index + i, width, height)
-        sprite, mask = Rendering.Sprite(sprite), Rendering.Mask(mask, clothing_texture, accessory_texture)
-        rendered_images.append(Rendering.render(sprite, mask, upscale, shadow, outline, has_mask, shadow_color, outline_color, shadow_strength, outline_thickness))
+    if f_length < 1:
+        raise IndexError('Index is past the end of the sheet.')
 
     column_count = sheet.size[0] // width
-    stitch_width = (column_count if len(rendered_images) > column_count else len(rendered_images))
-
-    final = Rendering.stitch(stitch_width, rendered_images)
-    if has_bg:
-        bg = Img.new('RGBA', final.size, bg_color)
-        final = Img.alpha_composite(bg, final)
-
-    return [final,]
+    stitch_width = (column_count if f_length > column_count else f_length)
+    row_count = (f_length - 1) // stitch_width + 1
+    tile_size = ((width + 2) * upscale, (height + 2) * upscale)
+
+    if Parallel.splits(workers, f_length):
+        shown = (lambda image: progress(background(image, bg_color) if has_bg else image)) if progress else None
+        images, unique = Parallel.render_tiles(sheet, [f_index + i for i in range(f_length)], stitch_width, width, height, workers, clothing_texture, accessory_texture,
+                                               progress = shown, **_settings(upscale, shadow, outline, has_mask, shadow_color, outline_color, shadow_strength, outline_thickness))
+        return Rendered([background(images[0], bg_color) if has_bg else images[0],], f_length, unique)
+
+    # the final image is made up front and filled in a few rows at a time so progress can show it
+    final = Img.new('RGBA', (stitch_width * tile_size[0], row_count * tile_size[1]), bg_color if has_bg else (0, 0, 1, 0))
+    step = max(1, PROGRESS_SPRITES // stitch_width) * stitch_width
+    seen = {} # renders by tile_key, shared between steps so repeats anywhere in the sheet are only drawn once
+
+    for start in range(0, f_length, step):
+        sprites, masks = load_pairs(sheet, range(f_index + start, f_index + min(start + step, f_length)), width, height, clothing_texture, accessory_texture)
+        rows = Rendering.stitch(stitch_width, Rendering.render_many(sprites, masks, upscale, shadow, outline, has_mask, shadow_color, outline_color, shadow_strength, outline_thickness, seen))
+        position = (0, start // stitch_width * tile_size[1])
+        with Timing.stage('background' if has_bg else 'paste'):
+            if has_bg:
+                final.alpha_composite(rows, position) # same as compositing the whole image over the background at the end
+            else:
+                final.paste(rows, position)
+
+        if progress:
+            progress(final)
+
+    return Rendered([final,], f_length, len(seen))
 
 def r_entity(sheet: Rendering.Sheet, index: str, # str in case hex conversion needed
              length: int, # length in entity mode corresponds to the number of rows rendered
@@ -187,61 +571,49 @@ def r_entity(sheet: Rendering.Sheet, index: str, # str in case hex conversion ne
     f_index = index_filter(index) # filtered index
     f_length = length_filter(length, index, sheet.size, width, height, offset = 7) # filtered length, if 0, length set to entire sheet, divided by 7 for entity mode if full sheet
     frame0, frame1 = [], []
+    sprites, masks = [], []
+    second_walks = []
+    tiles = sheet.tile_index(width, height)
 
     for i in range(f_length):
-        row0, row1 = [], []
-        second_walk = False
-        
-        # still
-        sprite0, mask0 = sheet.get_sprite(f_index + i * 7, width, height)
-        sprite0, mask0 = Rendering.Sprite(sprite0), Rendering.Mask(mask0, clothing_texture, accessory_texture)
-        
-        still = Rendering.render(sprite0, mask0, upscale, shadow, outline, has_mask, shadow_color, outline_color, shadow_strength, outline_thickness)
-        row0.append(still)
-        row1.append(still)
-
-        # walk 1
-        sprite1, mask1 = sheet.get_sprite(f_index + 1 + i * 7, width, height)
-        sprite1, mask1 = Rendering.Sprite(sprite1), Rendering.Mask(mask1, clothing_texture, accessory_texture)
-        row0.append(Rendering.render(sprite1, mask1, upscale, shadow, outline, has_mask, shadow_color, outline_color, shadow_strength, outline_thickness))
-
-        # walk 2
-        sprite2, mask2 = sheet.get_sprite(f_index + 2 + i * 7, width, height)
-        for value in sprite2.getdata(): # some sprite sheets omit the walk 2, implying that it's the same as walk 1
-            if value[3] != 0:
-                second_walk = True
-                break
-        if second_walk:
-            sprite2, mask2 = Rendering.Sprite(sprite2), Rendering.Mask(mask2, clothing_texture, accessory_texture)
-            row1.append(Rendering.render(sprite2, mask2, upscale, shadow, outline, has_mask, shadow_color, outline_color, shadow_strength, outline_thickness))
-        else:
-            row1.append(row0[1])
+        for offset in (0, 1, 2, 4): # still, walk 1, walk 2, attack 1
+            if offset == 2:
+                second_walk = not tiles.is_empty(f_index + offset + i * 7) # some sprite sheets omit the walk 2, implying that it's the same as walk 1
+                second_walks.append(second_walk)
+                if not second_walk:
+                    continue
 
-        # attack 1
-        sprite3, mask3 = sheet.get_sprite(f_index + 4 + i * 7, width, height)
-        sprite3, mask3 = Rendering.Sprite(sprite3), Rendering.Mask(mask3, clothing_texture, accessory_texture)
-        row0.append(Rendering.render(sprite3, mask3, upscale, shadow, outline, has_mask, shadow_color, outline_color, shadow_strength, outline_thickness))
+            sprite, mask = load_pair(sheet, f_index + offset + i * 7, width, height, clothing_texture, accessory_texture)
+            sprites.append(sprite)
+            masks.append(mask)
 
         # attack 2
         sprite4_0, mask4_0 = sheet.get_sprite(f_index + 5 + i * 7, width, height)
         sprite4_1, mask4_1 = sheet.get_sprite(f_index + 6 + i * 7, width, height)
-        sprite4, mask4 = Rendering.Sprite(Rendering.stitch(2, [sprite4_0, sprite4_1])), Rendering.Mask(Rendering.stitch(2, [mask4_0, mask4_1]), clothing_texture, accessory_texture)
-        
-        rendered_image = Rendering.render(sprite4, mask4, upscale, shadow, outline, has_mask, shadow_color, outline_color, shadow_strength, outline_thickness)
-        row1.append(rendered_image)
+        sprites.append(Rendering.Sprite(Rendering.stitch(2, [sprite4_0, sprite4_1])))
+        masks.append(Rendering.Mask(Rendering.stitch(2, [mask4_0, mask4_1]), clothing_texture, accessory_texture))
+
+    seen = {}
+    renders = iter(Rendering.render_many(sprites, masks, upscale, shadow, outline, has_mask, shadow_color, outline_color, shadow_strength, outline_thickness, seen))
 
-        frame0.append(Rendering.stitch(4, row0))
-        frame1.append(Rendering.stitch(4, row1))
+    for second_walk in second_walks:
+        still, walk1 = next(renders), next(renders)
+        walk2 = next(renders) if second_walk else walk1
+        attack1, attack2 = next(renders), next(renders)
+
+        frame0.append(Rendering.stitch(4, [still, walk1, attack1]))
+        frame1.append(Rendering.stitch(4, [still, walk2, attack2]))
 
     frame0 = Rendering.stitch(1, frame0)
     frame1 = Rendering.stitch(1, frame1)
 
     if has_bg:
         bg = Img.new('RGBA', frame0.size, bg_color)
-        frame0 = Img.alpha_composite(bg, frame0)
-        frame1 = Img.alpha_composite(bg, frame1)
+        with Timing.stage('background'):
+            frame0 = Img.alpha_composite(bg, frame0)
+            frame1 = Img.alpha_composite(bg, frame1)
 
-    return [frame0, frame1]
+    return Rendered([frame0, frame1], len(sprites), len(seen))
 
 def r_animation(sheet: Rendering.Sheet, index: str, # str in case hex conversion needed
                 length: int, # length in animation mode corresponds to how many frames are animated
@@ -251,27 +623,31 @@ def r_animation(sheet: Rendering.Sheet, index: str, # str in case hex conversion
                 shadow_color: tuple[int, int, int], outline_color: tuple[int, int, int],
                 has_bg: bool = False, bg_color: str = '',
                 has_mask: bool = False, clothing_texture: Img.Image = None, accessory_texture: Img.Image = None, 
-                shadow_strength: float = 1.0, outline_thickness: int = None) -> list[Img.Image]:
+                shadow_strength: float = 1.0, outline_thickness: int = None, workers: int = 1) -> list[Img.Image]:
     
     f_index = index_filter(index) # filtered index
     f_length = length_filter(length, index, sheet.size, width, height) # filtered length, if 0, length set to entire sheet
+    if Parallel.splits(workers, f_length):
+        images, unique = Parallel.render_tiles(sheet, [f_index + i for i in range(f_length)], 1, width, height, workers, clothing_texture, accessory_texture, frames = True,
+                                               **_settings(upscale, shadow, outline, has_mask, shadow_color, outline_color, shadow_strength, outline_thickness))
+        return Rendered([background(image, bg_color) for image in images] if has_bg else images, f_length, unique)
+
     rendered_images = []
+    sprites, masks = load_pairs(sheet, range(f_index, f_index + f_length), width, height, clothing_texture, accessory_texture)
 
     bg = False
 
-    for i in range(f_length):
-        sprite, mask = sheet.get_sprite(f_index + i, width, height)
-        sprite, mask = Rendering.Sprite(sprite), Rendering.Mask(mask, clothing_texture, accessory_texture)
-        render = Rendering.render(sprite, mask, upscale, shadow, outline, has_mask, shadow_color, outline_color, shadow_strength, outline_thickness)
-        
+    seen = {}
+    for render in Rendering.render_many(sprites, masks, upscale, shadow, outline, has_mask, shadow_color, outline_color, shadow_strength, outline_thickness, seen):
         if has_bg:
             if not bg:
                 bg = Img.new('RGBA', render.size, bg_color)
-            render = Img.alpha_composite(bg, render)
+            with Timing.stage('background'):
+                render = Img.alpha_composite(bg, render)
 
         rendered_images.append(render)
 
-    return rendered_images
+    return Rendered(rendered_images, len(sprites), len(seen))
 
 def r_overview(sheet: Rendering.Sheet, index: str, # str in case hex conversion needed
                 length: int, # length in overview mode corresponds to how many frames are captured (front, side, back). for sheets of enemies use length 3
@@ -281,31 +657,43 @@ def r_overview(sheet: Rendering.Sheet, index: str, # str in case hex conversion
                 shadow_color: tuple[int, int, int], outline_color: tuple[int, int, int],
                 has_bg: bool = False, bg_color: str = '',
                 has_mask: bool = False, clothing_texture: Img.Image = None, accessory_texture: Img.Image = None, 
-                shadow_strength: float = 1.0, outline_thickness: int = None) -> list[Img.Image]:
+                shadow_strength: float = 1.0, outline_thickness: int = None, workers: int = 1) -> list[Img.Image]:
     
     f_index = index_filter(index) # filtered index
     f_length = length_filter(length, index, sheet.size, width, height, overview_override = True) # filtered length, if 0, length set to entire sheet, length should be a number from 1 to 3
     sheet_length = length_filter(0, '0', sheet.size, width, height, offset = 7)
-    rendered_images = []
+    indexes = [f_index + i * 21 + j * 7 for i in range(sheet_length) for j in range(f_length)]
+    if Parallel.splits(workers, len(indexes)):
+        images, unique = Parallel.render_tiles(sheet, indexes, 6, width, height, workers, clothing_texture, accessory_texture,
+                                               **_settings(upscale, shadow, outline, has_mask, shadow_color, outline_color, shadow_strength, outline_thickness))
+        return Rendered([background(images[0], bg_color) if has_bg else images[0],], len(indexes), unique)
+
+    sprites, masks = load_pairs(sheet, indexes, width, height, clothing_texture, accessory_texture)
 
-    for i in range(sheet_length):
-        for j in range(f_length):
-            sprite, mask = sheet.get_sprite(f_index + i * 21 + j * 7, width, height)
-            sprite, mask = Rendering.Sprite(sprite), Rendering.Mask(mask, clothing_texture, accessory_texture)
-            rendered_images.append(Rendering.render(sprite, mask, upscale, shadow, outline, has_mask, shadow_color, outline_color, shadow_strength, outline_thickness))
+    seen = {}
+    rendered_images = Rendering.render_many(sprites, masks, upscale, shadow, outline, has_mask, shadow_color, outline_color, shadow_strength, outline_thickness, seen)
 
     final = Rendering.stitch(6, rendered_images)
     if has_bg:
         bg = Img.new('RGBA', final.size, bg_color)
-        final = Img.alpha_composite(bg, final)
+        with Timing.stage('background'):
+            final = Img.alpha_composite(bg, final)
 
-    return [final,]
+    return Rendered([final,], len(sprites), len(seen))
 
+SHOWN_ALPHA = [0] + [255] * 255 # alpha to paste mask, 0 alpha pixels keep the base
+
+@Timing.timed('alpha_filter')
 def alpha_filter(image: Img.Image) -> Img.Image:
-    base = Img.new('RGBA', image.size, (0, 0, 0, 1)) # tk has speed issues with 0 alpha
-    base.paste(image, (0, 0), image.getchannel('A').point(lambda v: v > 0, '1')) # this effectively replaces all 0 alpha values with 1
+    '''
+    a copy of image for tk with every 0 alpha pixel replaced by (0, 0, 0, 1), tk has speed issues with 0 alpha.
+    The mask comes from a lookup table in one pass over the alpha channel
+    '''
+    base = Img.new('RGBA', image.size, (0, 0, 0, 1))
+    base.paste(image, (0, 0), image.getchannel('A').point(SHOWN_ALPHA))
     return base
 
+@Timing.timed('encode')
 def save(path: str, mode: str, rendered_images: list[Img.Image], gif_durations: list[int], has_bg: bool):
     '''
     DO NOT USE THIS COLOR IN GIFS
@@ -314,12 +702,12 @@ def save(path: str, mode: str, rendered_images: list[Img.Image], gif_durations:
     if mode == 'Image' or mode == 'Overview':
         rendered_images[0].save(path, 'PNG')
     if mode == 'Entity' or mode == 'Animation':
-        if has_bg:
-            rendered_images[0].save(path, 'GIF', save_all = True, append_images = rendered_images[1:], duration = gif_durations, loop = 0, disposal = 2)
-        else:
-            rendered_images[0].save(path, 'GIF', save_all = True, append_images = rendered_images[1:], transparency = 0, duration = gif_durations, loop = 0, disposal = 2)
+        GIF.save(path, rendered_images, gif_durations, has_bg)
 
 def copy(images: list[Img.Image]) -> None:
+    if not win32clipboard:
+        raise OSError('Clipboard is only available on Windows.')
+
     win32clipboard.OpenClipboard()
     win32clipboard.EmptyClipboard()
 
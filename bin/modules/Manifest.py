@@ -0,0 +1,246 @@
+'''
+renders described by a manifest, rebuilding only the outputs whose inputs changed
+
+a manifest is a JSON (or TOML) file like
+    {
+        "defaults": {"scale": 6, "bg": "#2b2b2b"},
+        "jobs": [
+            {"sheet": "sheets/bows.png", "output": "assets/bows.png", "mode": "Overview"},
+            {"name": "red robe", "sheet": "sheets/robes.png", "output": "assets/robe.gif", "mode": "Entity", "index": "0x10", "clothing": "textiles/red.png"}
+        ]
+    }
+jobs take Batch's render options, with the manifest's defaults for the ones they leave out. Paths are relative to the manifest.
+The build database keeps a hash of every output's inputs (sheet, mask and texture files and the options), a job is rendered again
+once that hash changes or its output is gone
+'''
+
+from . import IO, Batch
+
+import argparse, concurrent.futures, hashlib, json, os, os.path, sys, time
+try:
+    import tomllib
+except ImportError: # before python 3.11, only JSON manifests can be read
+    tomllib = None
+
+HASH_BLOCK = 1024 * 1024 # bytes of a file hashed at a time
+
+class Job:
+    def __init__(self, name: str, sheet: str, mask: str, output: str, args: argparse.Namespace):
+        self.name = name
+        self.sheet = sheet
+        self.mask = mask # empty without a mask
+        self.output = output
+        self.args = args
+
+    def files(self) -> list[str]:
+        '''
+        input files whose contents change the render, textures given as colors aren't files
+        '''
+        textures = [texture for texture in (self.args.clothing, self.args.accessory) if os.path.isfile(texture)]
+        return [self.sheet] + ([self.mask] if self.mask else []) + textures
+
+def load_manifest(path: str) -> list[Job]:
+    '''
+    raises ValueError naming the job for jobs that are missing a sheet or output or have bad options
+    '''
+    with open(path, 'rb') as f:
+        if os.path.splitext(path)[1].lower() == '.toml':
+            if tomllib is None:
+                raise ValueError('TOML manifests need Python 3.11 or newer, use JSON instead.')
+            manifest = tomllib.load(f)
+        else:
+            manifest = json.load(f)
+
+    base = os.path.dirname(os.path.abspath(path))
+    defaults = manifest.get('defaults', {})
+    jobs = []
+    outputs = set()
+
+    for number, options in enumerate(manifest.get('jobs', []), 1):
+        options = {**defaults, **options}
+        name = options.pop('name', None) or f'job {number}'
+        sheet, mask, output = options.pop('sheet', None), options.pop('mask', None), options.pop('output', None)
+        if not sheet or not output:
+            raise ValueError(f'{name} needs a sheet and an output.')
+
+        try:
+            args = Batch.parse_options(options)
+        except ValueError as e:
+            raise ValueError(f'{name}: {e}')
+
+        for key in ('clothing', 'accessory'): # texture files are relative to the manifest too
+            texture = os.path.join(base, getattr(args, key))
+            if os.path.isfile(texture):
+                setattr(args, key, texture)
+
+        sheet = os.path.join(base, sheet)
+        if mask is None:
+            mask = '' if args.no_mask else Batch.find_mask(sheet, args.mask_suffix)
+        elif mask:
+            mask = os.path.join(base, mask)
+
+        output = os.path.join(base, output)
+        if output in outputs:
+            raise ValueError(f'{name} renders to {output} like an earlier job.')
+        outputs.add(output)
+
+        jobs.append(Job(name, sheet, mask, output, args))
+
+    return jobs
+
+class BuildDatabase:
+    '''
+    a JSON file of the input hash each output was last rendered from. File hashes are kept by size and mtime so unchanged
+    files aren't read again, and paths are stored relative to base so the project can move
+    '''
+    def __init__(self, path: str, base: str):
+        self.path = path
+        self.base = base
+
+        try:
+            with open(path) as f:
+                data = json.load(f)
+        except (OSError, ValueError): # a missing or broken database renders everything
+            data = {}
+
+        self.outputs = data.get('outputs', {}) # output: input hash
+        self.files = data.get('files', {}) # file: [mtime, size, hash]
+
+    def _key(self, path: str) -> str:
+        try:
+            return os.path.relpath(path, self.base).replace(os.sep, '/')
+        except ValueError: # on another drive
+            return path
+
+    def file_hash(self, path: str) -> str:
+        stat = os.stat(path)
+        entry = self.files.get(self._key(path))
+        if entry and entry[:2] == [stat.st_mtime_ns, stat.st_size]:
+            return entry[2]
+
+        digest = hashlib.blake2b(digest_size = 16)
+        with open(path, 'rb') as f:
+            for block in iter(lambda: f.read(HASH_BLOCK), b''):
+                digest.update(block)
+
+        self.files[self._key(path)] = [stat.st_mtime_ns, stat.st_size, digest.hexdigest()]
+        return digest.hexdigest()
+
+    def job_hash(self, job: Job) -> str:
+        options = {key: value for key, value in vars(job.args).items() if key not in Batch.RUN_OPTIONS}
+        for key in ('clothing', 'accessory'):
+            if os.path.isfile(options[key]):
+                options[key] = self._key(options[key])
+
+        digest = hashlib.blake2b(digest_size = 16)
+        digest.update(json.dumps([self._key(job.sheet), job.mask and self._key(job.mask), self._key(job.output), options], sort_keys = True).encode())
+        for path in job.files():
+            digest.update(self.file_hash(path).encode())
+        return digest.hexdigest()
+
+    def is_current(self, job: Job, key: str) -> bool:
+        return self.outputs.get(self._key(job.output)) == key and os.path.isfile(job.output)
+
+    def rendered(self, job: Job, key: str) -> None:
+        self.outputs[self._key(job.output)] = key
+
+    def keep(self, jobs: list[Job]) -> None:
+        '''
+        forgets outputs that aren't in the manifest anymore
+        '''
+        outputs = {self._key(job.output) for job in jobs}
+        self.outputs = {output: key for output, key in self.outputs.items() if output in outputs}
+
+    def save(self) -> None:
+        '''
+        written to a temporary file first so an interrupted save doesn't lose the database
+        '''
+        temporary = self.path + '.tmp'
+        with open(temporary, 'w') as f:
+            json.dump({'outputs': self.outputs, 'files': self.files}, f, indent = 4)
+        os.replace(temporary, self.path)
+
+_sheets = Batch.SheetCache(4) # in each worker, jobs on the same sheet only decode it once
+
+def render_job(job: Job) -> tuple[int, float]:
+    '''
+    renders and saves a job, returns the sprite count and wall time
+    '''
+    start = time.perf_counter()
+
+    sheet = _sheets.get(job.sheet, job.mask)
+    os.makedirs(os.path.dirname(job.output), exist_ok = True)
+    _, count = Batch.render_to(sheet, bool(job.mask), job.output, job.args.mode, job.args.speed, job.args.clothing, job.args.accessory,
+                               **Batch.render_kwargs(job.args))
+
+    return count, time.perf_counter() - start
+
+def make_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description = 'Renders the jobs in a manifest, skipping jobs whose sheet, mask, textures and options are the same as when they were last rendered.')
+
+    parser.add_argument('manifest', help = 'JSON or TOML manifest of render jobs')
+    parser.add_argument('-j', '--workers', type = int, default = os.cpu_count(), help = 'how many jobs are rendered at once')
+    parser.add_argument('--db', default = '', help = 'build database file, <manifest>.build.json next to the manifest by default')
+    parser.add_argument('--force', action = 'store_true', help = 'render every job')
+    parser.add_argument('--dry-run', action = 'store_true', help = 'list the jobs that would be rendered without rendering them')
+    Batch.add_disk_cache_options(parser)
+
+    return parser
+
+def main(argv: list[str] = None) -> int:
+    args = make_parser().parse_args(argv)
+
+    try:
+        jobs = load_manifest(args.manifest)
+    except (OSError, ValueError) as e:
+        print(f'{args.manifest}: {e}', file = sys.stderr)
+        return 1
+
+    database = BuildDatabase(args.db or os.path.splitext(args.manifest)[0] + '.build.json', os.path.dirname(os.path.abspath(args.manifest)))
+    database.keep(jobs)
+
+    failed = 0
+    stale = []
+    for job in jobs:
+        try:
+            key = database.job_hash(job)
+        except OSError as e: # a missing input
+            failed+= 1
+            print(f'{job.name}: failed, {e}', file = sys.stderr)
+            continue
+
+        if args.force or not database.is_current(job, key):
+            stale.append((job, key))
+
+    current = len(jobs) - len(stale) - failed
+    if args.dry_run:
+        for job, _ in stale:
+            print(f'{job.name} -> {job.output}')
+        print(f'{len(stale)} to render, {current} up to date')
+        return 1 if failed else 0
+
+    rendered = 0
+    start = time.perf_counter()
+
+    if stale:
+        with concurrent.futures.ProcessPoolExecutor(max_workers = args.workers, initializer = IO.use_disk_cache, initargs = Batch.disk_cache_args(args)) as executor:
+            futures = {executor.submit(render_job, job): (job, key) for job, key in stale}
+
+            for future in concurrent.futures.as_completed(futures):
+                job, key = futures[future]
+                try:
+                    count, seconds = future.result()
+                except Exception as e:
+                    failed+= 1
+                    print(f'{job.name}: failed, {e}', file = sys.stderr)
+                    continue
+
+                rendered+= 1
+                database.rendered(job, key)
+                database.save() # after every job so an interrupted build keeps what it finished
+                print(f'{job.name} -> {job.output}: {count} sprites in {seconds:.2f}s')
+
+    database.save()
+    print(f'{rendered} rendered, {current} up to date, {failed} failed in {time.perf_counter() - start:.2f}s')
+
+    return 1 if failed else 0
@@ -0,0 +1,213 @@
+'''
+renders the tiles of one sheet across a pool of processes
+
+the sheet's pixels are put in shared memory once and workers attach to them by name instead of getting them pickled
+with every task. Workers write their renders straight into a shared array laid out like the finished image, so the
+tiles aren't sent back or stitched afterwards
+'''
+
+from . import Rendering, IO, Timing
+import PIL.Image as Img
+import numpy as np
+
+import concurrent.futures, multiprocessing, multiprocessing.util, os, threading, weakref
+from multiprocessing import shared_memory
+
+MIN_TILES = 64 # renders with fewer tiles stay in one process, starting the tasks would cost more than they save
+TASKS_PER_WORKER = 4 # more tasks than workers evens out parts of the sheet that take longer
+ATTACHED_SHEETS = 4 # sheets a worker stays attached to between tasks
+
+class SharedArray:
+    '''
+    a uint8 array in shared memory, made new without a name and attached to by other processes with attach(spec)
+    '''
+    def __init__(self, shape: tuple[int, ...], name: str = None):
+        self.shape = tuple(shape)
+        self._owner = name is None
+        self._memory = shared_memory.SharedMemory(name = name, create = self._owner, size = max(int(np.prod(self.shape)), 1))
+        self.array = np.ndarray(self.shape, np.uint8, self._memory.buf)
+
+    @classmethod
+    def attach(cls, spec: tuple[str, tuple[int, ...]]) -> 'SharedArray':
+        return cls(spec[1], spec[0])
+
+    @property
+    def spec(self) -> tuple[str, tuple[int, ...]]:
+        return (self._memory.name, self.shape)
+
+    def close(self) -> None:
+        '''
+        views of the array have to be gone first, the maker also frees the memory
+        '''
+        self.array = None
+        self._memory.close()
+        if self._owner:
+            self._memory.unlink()
+
+_lock = threading.Lock()
+_shared = weakref.WeakKeyDictionary() # sheet or mask image: SharedArray of its pixels, freed with the image
+_executor = None
+_executor_workers = 0
+
+def _share(image) -> SharedArray:
+    '''
+    the image's RGBA pixels in shared memory, copied there the first time. Images read in strips are copied a strip at a time
+    '''
+    with _lock:
+        shared = _shared.get(image)
+        if shared is None:
+            width, height = image.size
+            shared = SharedArray((height, width, 4))
+            step = getattr(image, 'strip_rows', height)
+            for top in range(0, height, step):
+                shared.array[top:top + step] = image.rows(top, top + step)
+
+            _shared[image] = shared
+            weakref.finalize(image, shared.close)
+        return shared
+
+def _forget() -> None:
+    '''
+    a forked child gets copies of the pool and shared sheets without the pool's threads, it starts its own
+    and leaves freeing the sheets to the parent
+    '''
+    global _lock, _executor
+
+    _lock = threading.Lock()
+    _executor = None
+    for shared in _shared.values():
+        shared._owner = False
+    _shared.clear()
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child = _forget)
+
+def _pool(workers: int) -> concurrent.futures.ProcessPoolExecutor:
+    '''
+    the pool is kept between renders so workers only start once. Workers are spawned rather than forked since renders
+    can start from threads
+    '''
+    global _executor, _executor_workers
+
+    with _lock:
+        if _executor is None or _executor_workers != workers:
+            if _executor is not None:
+                _executor.shutdown(wait = False)
+            _executor = concurrent.futures.ProcessPoolExecutor(max_workers = workers, mp_context = multiprocessing.get_context('spawn'))
+            _executor_workers = workers
+            # processes join their children before exiting, so a pool made inside one of Batch's workers is shut down first,
+            # ahead of the pool's queues which close at priority 10
+            multiprocessing.util.Finalize(_executor, _executor.shutdown, exitpriority = 100)
+        return _executor
+
+def shutdown() -> None:
+    global _executor
+
+    with _lock:
+        if _executor is not None:
+            _executor.shutdown()
+            _executor = None
+
+def splits(workers: int, tiles: int) -> bool:
+    '''
+    if a render of this many tiles is split across processes
+    '''
+    return workers > 1 and tiles >= MIN_TILES
+
+# in the workers
+_attached = {} # (sheet name, mask name): (shared arrays, Sheet)
+
+def _attach(sheet_spec: tuple, mask_spec: tuple) -> Rendering.Sheet:
+    key = (sheet_spec[0], mask_spec and mask_spec[0])
+    if key not in _attached:
+        if len(_attached) >= ATTACHED_SHEETS:
+            shared, sheet = _attached.pop(next(iter(_attached)))
+            del sheet
+            for array in shared:
+                try:
+                    array.close()
+                except BufferError: # a view is still around, the memory goes with the process instead
+                    pass
+
+        shared = [SharedArray.attach(spec) for spec in (sheet_spec, mask_spec) if spec]
+        sheet = Rendering.Sheet(Rendering.ArrayImage(shared[0].array), Rendering.ArrayImage(shared[1].array) if mask_spec else None)
+        _attached[key] = (shared, sheet)
+    return _attached[key][1]
+
+def _render_task(sheet_spec: tuple, mask_spec: tuple, output_spec: tuple, tiles: list[tuple[int, int]], columns: int, width: int, height: int,
+                 clothing_texture: Img.Image, accessory_texture: Img.Image, settings: dict, timings: bool) -> tuple[int, dict]:
+    '''
+    renders (sheet index, slot) tiles into their slots of the output grid, returns how many unique tiles were drawn
+    and the stage timings if timings is set
+    '''
+    if timings:
+        Timing.enable()
+    else:
+        Timing.disable()
+
+    with Timing.record('tiles'):
+        sheet = _attach(sheet_spec, mask_spec)
+        sprites, masks = IO.load_pairs(sheet, [index for index, _ in tiles], width, height, clothing_texture, accessory_texture)
+
+        seen = {}
+        renders = Rendering.render_many(sprites, masks, seen = seen, **settings)
+
+        output = SharedArray.attach(output_spec)
+        tile_width, tile_height = renders[0].size
+        with Timing.stage('paste'):
+            for (_, slot), render in zip(tiles, renders):
+                row, column = divmod(slot, columns)
+                output.array[row * tile_height:(row + 1) * tile_height, column * tile_width:(column + 1) * tile_width] = np.asarray(render)
+        output.close()
+
+    return len(seen), Timing.last()['stages'] if timings else {}
+
+def render_tiles(sheet: Rendering.Sheet, indexes: list[int], columns: int, width: int, height: int, workers: int,
+                 clothing_texture: Img.Image, accessory_texture: Img.Image, frames: bool = False, progress: callable = None, **settings) -> tuple[list[Img.Image], int]:
+    '''
+    renders the tiles at indexes across workers processes, settings are the rest of Rendering.render_many's args.
+    The renders are laid out like Rendering.stitch(columns, renders), or one per image with frames.
+    Identical tiles are only drawn once per task.
+
+    returns the images and how many unique tiles were drawn, progress is called with the grid so far as tasks finish
+    '''
+    upscale = settings['upscale']
+    tile_width, tile_height = (width + 2) * upscale, (height + 2) * upscale
+    columns = 1 if frames else columns
+    rows = -(-len(indexes) // columns)
+
+    sheet_spec = _share(sheet.sheet_image).spec
+    mask_spec = _share(sheet.mask_image).spec if sheet.has_mask and settings['has_mask'] else None
+
+    output = SharedArray((rows * tile_height, columns * tile_width, 4))
+    output.array[:] = (0, 0, 1, 0) # same background as stitch
+
+    tiles = list(zip(indexes, range(len(indexes))))
+    step = -(-len(tiles) // (workers * TASKS_PER_WORKER))
+    executor = _pool(workers)
+    futures = [executor.submit(_render_task, sheet_spec, mask_spec, output.spec, tiles[start:start + step], columns, width, height,
+                               clothing_texture, accessory_texture, settings, Timing.enabled)
+               for start in range(0, len(tiles), step)]
+
+    try:
+        unique = 0
+        for future in concurrent.futures.as_completed(futures):
+            drawn, stages = future.result()
+            unique+= drawn
+            for name, stats in stages.items():
+                Timing.add(name, stats['seconds'], stats['count'])
+
+            if progress:
+                progress(Img.fromarray(output.array).copy())
+
+        # fromarray shares the array's memory, copying once leaves nothing pointing into the shared memory
+        if frames:
+            images = [Img.fromarray(output.array[i * tile_height:(i + 1) * tile_height]).copy() for i in range(rows)]
+        else:
+            images = [Img.fromarray(output.array).copy()]
+    finally:
+        for future in futures:
+            future.cancel()
+        output.close()
+
+    return images, unique
@@ -1,36 +1,263 @@
+from . import Vectorized, Timing, Strips
 import PIL.Image as Img
 import PIL.ImageFilter as ImgF
+import numpy as np
+
+import collections, functools, hashlib, threading
+
+native_compositing = True # sprites are drawn at their own size and upscaled once where that gives the same pixels, off draws everything at full size
+
+class ArrayImage:
+    '''
+    an RGBA image kept in one contiguous (height, width, 4) array, rows, tiles and regions inside it are views that shouldn't be written to
+    '''
+    mode = 'RGBA'
+
+    def __init__(self, pixels: np.ndarray):
+        self.pixels = pixels
+        self.size = (pixels.shape[1], pixels.shape[0])
+
+    @classmethod
+    def from_image(cls, image: Img.Image) -> 'ArrayImage':
+        return cls(np.asarray(image if image.mode == 'RGBA' else image.convert('RGBA')))
+
+    def rows(self, top: int, bottom: int) -> np.ndarray:
+        return self.pixels[max(top, 0):min(bottom, self.size[1])]
+
+    def grid(self, width: int, height: int) -> np.ndarray:
+        '''
+        whole tiles as a (rows, columns, height, width, 4) view, partial tiles on the right and bottom edges are left out
+        '''
+        rows, columns = self.size[1] // height, self.size[0] // width
+        return self.pixels[:rows * height, :columns * width].reshape(rows, height, columns, width, 4).swapaxes(1, 2)
+
+    def region(self, box: tuple[int, int, int, int]) -> np.ndarray:
+        return Strips.region(self, box)
+
+    def crop(self, box: tuple[int, int, int, int]) -> Img.Image:
+        return Img.fromarray(self.region(box))
+
+class NoMask:
+    '''
+    the mask of a sheet without one, crops like a blank (0, 0, 1, 0) mask image without holding one
+    '''
+    mode = 'RGBA'
+    _blank = np.array((0, 0, 1, 0), np.uint8)
+
+    def __init__(self, size: tuple[int, int]):
+        self.size = size
+
+    def grid(self, width: int, height: int) -> np.ndarray:
+        return np.broadcast_to(self._blank, (self.size[1] // height, self.size[0] // width, height, width, 4))
+
+    def region(self, box: tuple[int, int, int, int]) -> np.ndarray:
+        left, top, right, bottom = box
+        x0, y0 = max(left, 0), max(top, 0)
+        x1, y1 = min(right, self.size[0]), min(bottom, self.size[1])
+        if (x0, y0, x1, y1) == tuple(box):
+            return np.broadcast_to(self._blank, (bottom - top, right - left, 4))
+
+        cropped = np.zeros((bottom - top, right - left, 4), np.uint8) # off of the image, like Img.Image.crop
+        if x0 < x1 and y0 < y1:
+            cropped[y0 - top:y1 - top, x0 - left:x1 - left] = self._blank
+        return cropped
+
+    def crop(self, box: tuple[int, int, int, int]) -> Img.Image:
+        return Img.fromarray(self.region(box))
+
+def _image(image: Img.Image) -> ArrayImage:
+    '''
+    images read in strips or already in an array are left as they are
+    '''
+    return image if isinstance(image, (Strips.StripImage, ArrayImage)) else ArrayImage.from_image(image)
 
 class Sheet:
     def __init__(self, sheet_image: Img.Image, mask_image: Img.Image = None):
-        self.sheet_image = sheet_image.convert('RGBA')
+        '''
+        sheet_image and mask_image are kept as ArrayImages, or as Strips.StripImages which are decoded in strips as they're used
+        '''
+        self.sheet_image = _image(sheet_image)
         self.size = sheet_image.size
 
         if mask_image:
             if mask_image.size != self.size: raise ValueError(f'Mask size, {mask_image.size}, does not match sheet size, {self.size}.')
             self.has_mask = True
-            self.mask_image = mask_image.convert('RGBA')
+            self.mask_image = _image(mask_image)
         else:
             self.has_mask = False
-            self.mask_image = Img.new('RGBA', self.size, (0, 0, 1, 0)) # blank area loaded if no mask
-    
-    def get_sprite(self, index: int, width: int, height: int, padding: float = 0) -> tuple[Img.Image, Img.Image]:
+            self.mask_image = NoMask(self.size) # blank area loaded if no mask
+
+        self._tile_indexes = {}
+
+    def tile_index(self, width: int, height: int, mask: bool = False) -> 'TileIndex':
         '''
-        Returns sprite and matching mask area. If no mask was loaded mask area is blank. Padding expands the region cropped by multiple of the width/height.
+        index of the sheet's (or mask's) tiles at a tile size, built the first time the size is used and kept with the sheet
+        '''
+        key = (width, height, mask)
+        if key not in self._tile_indexes:
+            self._tile_indexes[key] = TileIndex(self.mask_image, width, height, Mask.channels) if mask else TileIndex(self.sheet_image, width, height)
+        return self._tile_indexes[key]
+
+    def with_mask(self, mask_image: Img.Image) -> 'Sheet':
+        '''
+        a sheet with the same pixels and a new mask, the sheet's pixels and tile indexes are shared instead of copied
+        '''
+        sheet = Sheet(self.sheet_image, mask_image)
+        sheet._tile_indexes = {key: index for key, index in self._tile_indexes.items() if not key[2]}
+        return sheet
+
+    def grid(self, width: int, height: int, mask: bool = False) -> np.ndarray:
+        '''
+        the sheet's (or mask's) whole tiles as a (rows, columns, height, width, 4) view, None if the pixels aren't in one array
+        '''
+        image = self.mask_image if mask else self.sheet_image
+        return image.grid(width, height) if isinstance(image, (ArrayImage, NoMask)) else None
+
+    @Timing.timed('crop')
+    def tile(self, index: int, width: int, height: int, padding: float = 0) -> tuple[np.ndarray, np.ndarray]:
+        '''
+        get_sprite as (height, width, 4) arrays, views of the sheet's pixels where the area is inside the sheet. They shouldn't be written to
         '''
         column_count = self.size[0] // width
         column = index % column_count
         row = index // column_count
 
-        top_left = (int((column - padding) * width), int((row - padding) * height))
-        bottom_right = (int((column + 1 + padding) * width), int((row + 1 + padding) * height))
+        box = (int((column - padding) * width), int((row - padding) * height), int((column + 1 + padding) * width), int((row + 1 + padding) * height))
+        return self.sheet_image.region(box), self.mask_image.region(box)
+    
+    def get_sprite(self, index: int, width: int, height: int, padding: float = 0) -> tuple[Img.Image, Img.Image]:
+        '''
+        Returns sprite and matching mask area. If no mask was loaded mask area is blank. Padding expands the region cropped by multiple of the width/height.
+        '''
+        sprite, mask = self.tile(index, width, height, padding)
+        return Img.fromarray(sprite), Img.fromarray(mask)
 
-        return self.sheet_image.crop((*top_left, *bottom_right)), self.mask_image.crop((*top_left, *bottom_right))
+class TileIndex:
+    '''
+    info for every tile of an image at one tile size: whether it's empty, the bounding box of its used pixels and how many there are.
+    Pixels are used where any of channels isn't 0, by default where they aren't transparent.
+    Tiles are numbered like Sheet.get_sprite, tiles off of the image count as empty.
+
+    rows of tiles are indexed the first time they're used, a strip at a time for images read in strips and all at once otherwise
+    '''
+    def __init__(self, image: Img.Image, width: int, height: int, channels: tuple[int, ...] = (3,)):
+        self.width = width
+        self.height = height
+        self.channels = list(channels)
+        self.column_count = image.size[0] // width
+        self.row_count = -(-image.size[1] // height) # a partial last row is still cropped by get_sprite
+
+        self.counts = np.zeros((self.row_count, self.column_count), np.int64)
+        self.bboxes = np.zeros((self.row_count, self.column_count, 4), np.int64)
+
+        self._image = image
+        self._indexed = np.full(self.row_count, isinstance(image, NoMask)) # nothing to index without a mask
+        self._block = max(image.strip_rows // height, 1) if isinstance(image, Strips.StripImage) else self.row_count
+
+    def _index(self, row: int) -> None:
+        first = row - row % self._block
+        last = min(first + self._block, self.row_count)
+        width, height = self.width, self.height
+
+        visible = np.zeros(((last - first) * height, self.column_count * width), bool)
+        pixels = self._image.rows(first * height, last * height)[:, :self.column_count * width]
+        visible[:pixels.shape[0]] = (pixels[..., self.channels] > 0).any(axis = 2)
+
+        tiles = visible.reshape(last - first, height, self.column_count, width).swapaxes(1, 2) # (rows, columns, height, width)
+        used_columns = tiles.any(axis = 2)
+        used_rows = tiles.any(axis = 3)
+
+        counts = tiles.sum(axis = (2, 3))
+        bboxes = np.stack((used_columns.argmax(axis = 2), used_rows.argmax(axis = 2),
+                           width - used_columns[..., ::-1].argmax(axis = 2), height - used_rows[..., ::-1].argmax(axis = 2)), axis = 2)
+        bboxes[counts == 0] = 0
+
+        self.counts[first:last] = counts
+        self.bboxes[first:last] = bboxes
+        self._indexed[first:last] = True
+
+    def _locate(self, index: int) -> tuple[int, int]:
+        '''
+        returns None for tiles off of the image
+        '''
+        row, column = index // self.column_count, index % self.column_count
+        if 0 <= row < self.row_count:
+            if not self._indexed[row]:
+                self._index(row)
+            return row, column
+        return None
+
+    def is_empty(self, index: int) -> bool:
+        return self.count(index) == 0
+
+    def count(self, index: int) -> int:
+        location = self._locate(index)
+        return int(self.counts[location]) if location else 0
+
+    def bbox(self, index: int) -> tuple[int, int, int, int]:
+        '''
+        (left, top, right, bottom) inside the tile, (0, 0, 0, 0) if it's empty
+        '''
+        location = self._locate(index)
+        return tuple(int(v) for v in self.bboxes[location]) if location else (0, 0, 0, 0)
+
+def _alpha_bbox(image: Img.Image) -> tuple[int, int, int, int]:
+    return image.getchannel('A').getbbox() or (0, 0, 0, 0)
+
+def _used_bbox(array: np.ndarray, channels: tuple[int, ...]) -> tuple[int, int, int, int]:
+    '''
+    bounding box of the pixels where any of channels isn't 0
+    '''
+    used = (array[..., list(channels)] > 0).any(axis = 2)
+    columns, rows = np.flatnonzero(used.any(axis = 0)), np.flatnonzero(used.any(axis = 1))
+    if not len(columns):
+        return (0, 0, 0, 0)
+    return (int(columns[0]), int(rows[0]), int(columns[-1]) + 1, int(rows[-1]) + 1)
+
+def _is_empty(bbox: tuple[int, int, int, int]) -> bool:
+    return bbox[0] >= bbox[2] or bbox[1] >= bbox[3]
 
 class Sprite:
-    def __init__(self, image: Img.Image):
-        self.image = image
-        self.size = image.size
+    def __init__(self, image: Img.Image, bbox: tuple[int, int, int, int] = None):
+        '''
+        image can also be an RGBA (height, width, 4) array like the views from Sheet.tile, it's only made into an Img.Image if PIL draws it.
+        bbox is the alpha bounding box if it's already known, like from a TileIndex
+        '''
+        if isinstance(image, np.ndarray):
+            self._image, self._array = None, image
+            self.size = (image.shape[1], image.shape[0])
+        else:
+            self._image, self._array = image, None
+            self.size = image.size
+        self._bbox = bbox
+        self._binary_alpha = None
+
+    @property
+    def image(self) -> Img.Image:
+        if self._image is None:
+            self._image = Img.fromarray(self._array)
+        return self._image
+
+    @property
+    def array(self) -> np.ndarray:
+        if self._array is None:
+            self._array = np.asarray(self._image)
+        return self._array
+
+    @property
+    def bbox(self) -> tuple[int, int, int, int]:
+        if self._bbox is None:
+            self._bbox = _alpha_bbox(self.image)
+        return self._bbox
+
+    @property
+    def binary_alpha(self) -> bool:
+        '''
+        if every pixel is either fully opaque or fully transparent, pastes then replace pixels outright instead of blending them
+        '''
+        if self._binary_alpha is None:
+            self._binary_alpha = not any(self.image.getchannel('A').histogram()[1:255])
+        return self._binary_alpha
 
     def _silhouette(self, color: tuple[int, int, int]) -> Img.Image:
         mask = self.image.getchannel('A')
@@ -42,45 +269,167 @@ class Sprite:
     def render(self, upscale: int, shadow: bool, outline: bool, shadow_color: tuple[int, int, int], shadow_strength: float, outline_color: tuple[int, int, int], outline_thickness: int) -> Img.Image:
         '''
         returns a rendered sprite with shadow and outline
+
+        only the area the sprite's shadow and outline can reach is drawn, the rest of the render is left blank
         '''
+        width, height = self.size
+        size = ((width + 2) * upscale, (height + 2) * upscale)
+
+        if _is_empty(self.bbox):
+            return Img.new('RGBA', size, (0, 0, 1, 0))
+
+        reach = 0 # how far past the sprite's pixels anything is drawn, in render pixels
+        if shadow:
+            reach = 2 * (upscale // 2 + 1) + 1 # each blur spreads int(radius) + 1, plus one blank pixel so edge clamping in the blur sees blank
+        if outline:
+            reach = max(reach, self._outline_offset(upscale, outline_thickness))
+        margin = max(-(-reach // upscale), 1)
+
+        # drawn area in sprite pixels, counting the 1 pixel border around the sprite
+        x0, y0, x1, y1 = self.bbox
+        left, top = max(x0 + 1 - margin, 0), max(y0 + 1 - margin, 0)
+        right, bottom = min(x1 + 1 + margin, width + 2), min(y1 + 1 + margin, height + 2)
+
+        if (left, top, right, bottom) == (0, 0, width + 2, height + 2):
+            return self._draw(upscale, shadow, outline, shadow_color, shadow_strength, outline_color, outline_thickness)
+
+        trimmed = Sprite(self.image.crop((left, top, right - 2, bottom - 2))) # its own border lands on the drawn area's edge
+        drawn = trimmed._draw(upscale, shadow, outline, shadow_color, shadow_strength, outline_color, outline_thickness)
+
+        base_image = Img.new('RGBA', size, (0, 0, 1, 0))
+        base_image.paste(drawn, (left * upscale, top * upscale))
+
+        return base_image
+
+    @staticmethod
+    def _outline_offset(upscale: int, outline_thickness: int) -> int:
+        if outline_thickness:
+            return outline_thickness
+        return upscale // 5 + 1 # looks decent when scaling
+
+    def _draw(self, upscale: int, shadow: bool, outline: bool, shadow_color: tuple[int, int, int], shadow_strength: float, outline_color: tuple[int, int, int], outline_thickness: int) -> Img.Image:
+        native_thickness = _native_thickness(upscale, outline, outline_thickness)
+        if native_thickness is not None and self.binary_alpha:
+            return self._draw_native(upscale, shadow, outline, shadow_color, shadow_strength, outline_color, native_thickness)
+
         width, height = self.image.size
 
         base_image = Img.new('RGBA', ((width + 2) * upscale, (height + 2) * upscale), (0, 0, 1, 0))
 
         if shadow:
-            shadow_base_image = Img.new('RGBA', ((width + 2) * upscale, (height + 2) * upscale), (*shadow_color, 0))
-
-            shadow_silhouette = self._silhouette(shadow_color).resize((width * upscale, height * upscale), resample = Img.NEAREST)
-            shadow_base_image.paste(shadow_silhouette, (upscale, upscale))
-            
-            shadow_base_image = shadow_base_image.filter(ImgF.BoxBlur(radius = upscale / 2)).filter(ImgF.BoxBlur(radius = upscale / 2)) # gauss approx that is ~15% faster
-            shadow_strength_mask = shadow_base_image.getchannel('A').point(lambda v: 255 if int(v * shadow_strength) > 255 else int(v * shadow_strength), 'L')
-            base_image.paste(Img.new('RGBA', shadow_base_image.size, (*shadow_color, 255)), mask = shadow_strength_mask)
+            shadow_strength_mask = shadow_mask(self.image.getchannel('A'), upscale, shadow_strength)
+            with Timing.stage('shadow_paste'):
+                base_image.paste(Img.new('RGBA', base_image.size, (*shadow_color, 255)), mask = shadow_strength_mask)
 
         if outline: # outlines thickness shouldn't be more than upscale
-            outline_silhouette = self._silhouette(outline_color).resize((width * upscale, height * upscale), resample = Img.NEAREST)
+            with Timing.stage('silhouette'):
+                outline_silhouette = self._silhouette(outline_color)
+            with Timing.stage('resize'):
+                outline_silhouette = outline_silhouette.resize((width * upscale, height * upscale), resample = Img.NEAREST)
 
-            if outline_thickness:
-                offset = outline_thickness
-            else:
-                offset = upscale // 5 + 1 # looks decent when scaling
-            for i in (-1 * offset, offset):
-                for j in (-1 * offset, offset):
-                    base_image.paste(outline_silhouette, (upscale + i, upscale + j), outline_silhouette)
+            with Timing.stage('outline'):
+                offset = self._outline_offset(upscale, outline_thickness)
+                for i in (-1 * offset, offset):
+                    for j in (-1 * offset, offset):
+                        base_image.paste(outline_silhouette, (upscale + i, upscale + j), outline_silhouette)
 
-        sized_image = self.image.resize((width * upscale, height * upscale), resample = Img.NEAREST)
+        with Timing.stage('resize'):
+            sized_image = self.image.resize((width * upscale, height * upscale), resample = Img.NEAREST)
 
-        base_image.paste(sized_image, (upscale, upscale), sized_image.getchannel('A'))
+        with Timing.stage('paste'):
+            base_image.paste(sized_image, (upscale, upscale), sized_image.getchannel('A'))
 
         return base_image
 
+    def _draw_native(self, upscale: int, shadow: bool, outline: bool, shadow_color: tuple[int, int, int], shadow_strength: float, outline_color: tuple[int, int, int], native_thickness: int) -> Img.Image:
+        '''
+        same pixels as _draw for sprites with binary alpha and outlines a whole number of sprite pixels thick.
+        the outline and sprite are pasted at the sprite's size and upscaled once, every paste only replaces pixels so the
+        result is made of upscale x upscale blocks and is then pasted over the shadow by its own alpha
+        '''
+        width, height = self.image.size
+
+        with Timing.stage('paste'):
+            native_image = Img.new('RGBA', (width + 2, height + 2), (0, 0, 1, 0))
+
+            if outline:
+                outline_silhouette = self._silhouette(outline_color)
+                for i in (-1 * native_thickness, native_thickness):
+                    for j in (-1 * native_thickness, native_thickness):
+                        native_image.paste(outline_silhouette, (1 + i, 1 + j), outline_silhouette)
+
+            native_image.paste(self.image, (1, 1), self.image.getchannel('A'))
+
+        with Timing.stage('resize'):
+            sized_image = native_image.resize(((width + 2) * upscale, (height + 2) * upscale), resample = Img.NEAREST)
+
+        if not shadow:
+            return sized_image
+
+        base_image = Img.new('RGBA', sized_image.size, (0, 0, 1, 0))
+        shadow_strength_mask = shadow_mask(self.image.getchannel('A'), upscale, shadow_strength)
+        with Timing.stage('shadow_paste'):
+            base_image.paste(Img.new('RGBA', base_image.size, (*shadow_color, 255)), mask = shadow_strength_mask)
+        with Timing.stage('paste'):
+            base_image.paste(sized_image, mask = sized_image.getchannel('A'))
+
+        return base_image
+
+def _native_thickness(upscale: int, outline: bool, outline_thickness: int) -> int:
+    '''
+    the outline's thickness in sprite pixels when sprites can be drawn at their own size (0 without an outline), None when they can't.
+    that needs an upscale to save work at and an outline offset that lands on whole sprite pixels
+    '''
+    if not native_compositing or upscale < 2:
+        return None
+    if not outline:
+        return 0
+
+    offset = Sprite._outline_offset(upscale, outline_thickness)
+    if offset % upscale:
+        return None
+    return offset // upscale
+
 class Mask:
-    def __init__(self, mask_image: Img.Image, clothing_texture: Img.Image, accessory_texture: Img.Image):
-        self.mask_image = mask_image
-        self.size = mask_image.size
+    channels = (0, 1, 3) # textures are drawn from red and green whatever the alpha, alpha draws the silhouette
+    _texture_planes = collections.OrderedDict() # (texture digest, texture size, sprite size, upscale): tiled texture
+    _texture_planes_lock = threading.Lock() # renders run on the UI's worker, Service's threads and Batch's threads
+    _max_texture_planes = 64
+
+    def __init__(self, mask_image: Img.Image, clothing_texture: Img.Image, accessory_texture: Img.Image, bbox: tuple[int, int, int, int] = None):
+        '''
+        mask_image can also be an RGBA (height, width, 4) array like the views from Sheet.tile.
+        bbox is the bounding box of the pixels with red, green or alpha if it's already known, like from a TileIndex
+        '''
+        if isinstance(mask_image, np.ndarray):
+            self._mask_image, self._array = None, mask_image
+            self.size = (mask_image.shape[1], mask_image.shape[0])
+        else:
+            self._mask_image, self._array = mask_image, None
+            self.size = mask_image.size
 
         self.clothing_texture = clothing_texture
         self.accessory_texture = accessory_texture
+
+        self._bbox = bbox
+
+    @property
+    def mask_image(self) -> Img.Image:
+        if self._mask_image is None:
+            self._mask_image = Img.fromarray(self._array)
+        return self._mask_image
+
+    @property
+    def array(self) -> np.ndarray:
+        if self._array is None:
+            self._array = np.asarray(self._mask_image)
+        return self._array
+
+    @property
+    def bbox(self) -> tuple[int, int, int, int]:
+        if self._bbox is None:
+            self._bbox = _used_bbox(self.array, self.channels)
+        return self._bbox
        
     def _silhouette(self) -> Img.Image:
         mask = self.mask_image.getchannel('A')
@@ -89,39 +438,69 @@ class Mask:
 
         return silhouette
 
+    @staticmethod
+    @functools.lru_cache(maxsize = 256)
+    def _sampling(sprite_length: int, upscale: int) -> tuple[slice, np.ndarray]:
+        '''
+        for one axis of the render: the part of it inside the 1 pixel border and which pixel of the 5x layout (border left out)
+        each of those shows. the positions come from a NEAREST resize in PIL itself so they always match it
+        '''
+        positions = Img.new('I', ((sprite_length + 2) * 5, 1))
+        positions.putdata(range(-5, (sprite_length + 1) * 5))
+        positions = np.asarray(positions.resize(((sprite_length + 2) * upscale, 1), resample = Img.NEAREST)).reshape(-1)
+
+        inside = np.flatnonzero((positions >= 0) & (positions < sprite_length * 5))
+        return slice(inside[0], inside[-1] + 1), positions[inside]
+
+    def _texture_plane(self, texture: Img.Image, upscale: int) -> Img.Image:
+        '''
+        texture tiled over the inside of the render the way the 5x layout tiles it, built once per (texture, size)
+        '''
+        texture = texture.convert('RGBA')
+        key = (hashlib.blake2b(texture.tobytes(), digest_size = 16).digest(), texture.size, self.size, upscale)
+
+        with Mask._texture_planes_lock:
+            plane = Mask._texture_planes.get(key)
+            if plane is not None:
+                Mask._texture_planes.move_to_end(key)
+                return plane
+
+        # built outside the lock, two threads building the same plane at once just build it twice
+        columns, rows = self._sampling(self.size[0], upscale)[1], self._sampling(self.size[1], upscale)[1]
+        texture_width, texture_height = texture.size
+        plane = Img.fromarray(np.asarray(texture).take(rows % texture_height, axis = 0).take(columns % texture_width, axis = 1))
+
+        with Mask._texture_planes_lock:
+            Mask._texture_planes[key] = plane
+            if len(Mask._texture_planes) > Mask._max_texture_planes:
+                Mask._texture_planes.popitem(last = False)
+
+        return plane
+
+    @Timing.timed('mask')
     def render(self, upscale: int) -> Img.Image:
         '''
         returns a scaled texture to be pasted onto a rendered sprite
+
+        textures are tiled in a 5x layout so they look the same at every upscale. the layout is sampled straight
+        at the final size instead of being drawn at 5x and resized
         '''
         width, height = self.size
-        temp_size = (width * 5, height * 5)
-
-        base_image = Img.new('RGBA', ((width + 2) * 5, (height + 2) * 5), (0, 0, 1, 0))
-        clothing_texture_fill = Img.new('RGBA', temp_size, (0, 0, 0, 0))
-        accessory_texture_fill = clothing_texture_fill.copy()
+        inside_columns, columns = self._sampling(width, upscale)
+        inside_rows, rows = self._sampling(height, upscale)
 
-        upsized_sillhouette = self._silhouette().resize(temp_size, resample = Img.NEAREST)
+        silhouette = Img.fromarray(np.asarray(self._silhouette()).take(rows // 5, axis = 0).take(columns // 5, axis = 1))
+        mask = self.array.take(rows // 5, axis = 0).take(columns // 5, axis = 1)
 
-        self.clothing_mask = self.mask_image.getchannel('R')
-        upsized_clothing_mask = self.clothing_mask.resize(temp_size, resample = Img.NEAREST)
-        for x in range(0, upsized_sillhouette.width, self.clothing_texture.size[0]):
-            for y in range(0, upsized_sillhouette.height, self.clothing_texture.size[1]):
-                clothing_texture_fill.paste(self.clothing_texture, (x, y))
+        silhouette.paste(self._texture_plane(self.clothing_texture, upscale), mask = Img.fromarray(mask[..., 0])) # clothing on red
+        silhouette.paste(self._texture_plane(self.accessory_texture, upscale), mask = Img.fromarray(mask[..., 1])) # accessory on green
 
-        self.accessory_mask = self.mask_image.getchannel('G')
-        upsized_accessory_mask = self.accessory_mask.resize(temp_size, resample = Img.NEAREST)
-        for x in range(0, upsized_sillhouette.width, self.accessory_texture.size[0]):
-            for y in range(0, upsized_sillhouette.height, self.accessory_texture.size[1]):
-                accessory_texture_fill.paste(self.accessory_texture, (x, y))
+        base = Img.new('RGBA', ((width + 2) * upscale, (height + 2) * upscale), (0, 0, 1, 0))
+        base.paste(silhouette, (inside_columns.start, inside_rows.start))
 
-        upsized_sillhouette.paste(clothing_texture_fill, mask = upsized_clothing_mask)
-        upsized_sillhouette.paste(accessory_texture_fill, mask = upsized_accessory_mask)
-        
-        base_image.paste(upsized_sillhouette, (5, 5))
-        base_image = base_image.resize(((width + 2) * upscale, (height + 2) * upscale), resample = Img.NEAREST)
-
-        return base_image
+        return base
 
+@Timing.timed('stitch')
 def stitch(width: int, images: list[Img.Image]) -> Img.Image:
     '''
     Input images should all be the same size. Images are placed in the order given.
@@ -138,6 +517,156 @@ def stitch(width: int, images: list[Img.Image]) -> Img.Image:
 
     return base_image
 
+class RenderCache:
+    '''
+    LRU cache of finished renders keyed on the tile's pixels and the render settings.
+    Evicts least recently used renders once the stored images go over max_bytes, a max_bytes of 0 turns caching off.
+    '''
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+
+        self._entries = collections.OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def key(sprite: Sprite, mask: Mask, has_mask: bool, *settings) -> bytes:
+        '''
+        settings should be everything that changes the look of the render
+        '''
+        digest = hashlib.blake2b(digest_size = 16)
+        digest.update(repr((sprite.size, has_mask, settings)).encode())
+        digest.update(np.ascontiguousarray(sprite.array))
+
+        if has_mask: # textures and mask pixels only matter if the mask is drawn
+            digest.update(np.ascontiguousarray(mask.array))
+            for image in (mask.clothing_texture, mask.accessory_texture):
+                digest.update(repr((image.mode, image.size)).encode())
+                digest.update(image.tobytes())
+
+        return digest.digest()
+
+    def get(self, key: bytes) -> Img.Image:
+        '''
+        returns None on a miss
+        '''
+        with self._lock:
+            image = self._entries.get(key)
+
+            if image is None:
+                self.misses+= 1
+                return None
+
+            self._entries.move_to_end(key)
+            self.hits+= 1
+            return image
+
+    def put(self, key: bytes, image: Img.Image) -> None:
+        size = self._size(image)
+        if size > self.max_bytes:
+            return
+
+        with self._lock:
+            if key in self._entries:
+                self.bytes-= self._size(self._entries.pop(key))
+
+            self._entries[key] = image
+            self.bytes+= size
+
+            while self.bytes > self.max_bytes:
+                _, evicted = self._entries.popitem(last = False)
+                self.bytes-= self._size(evicted)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self.bytes = 0
+            self.hits = 0
+            self.misses = 0
+
+    def stats(self) -> dict:
+        return {'hits': self.hits, 'misses': self.misses, 'entries': len(self._entries), 'bytes': self.bytes, 'max_bytes': self.max_bytes}
+
+    @staticmethod
+    def _size(image: Img.Image) -> int:
+        return image.width * image.height * len(image.getbands())
+
+render_cache = RenderCache(256 * 1024 * 1024)
+shadow_cache = RenderCache(64 * 1024 * 1024) # shadow masks, shared by renders that only differ in colors or outline
+
+def _shadow_key(alpha: bytes, size: tuple[int, int], upscale: int, shadow_strength: float) -> bytes:
+    digest = hashlib.blake2b(digest_size = 16)
+    digest.update(repr((size, upscale, shadow_strength)).encode())
+    digest.update(alpha)
+    return digest.digest()
+
+def shadow_mask(alpha: Img.Image, upscale: int, shadow_strength: float) -> Img.Image:
+    '''
+    alpha is a sprite's alpha channel, returns the 'L' mask the shadow color is pasted through over a whole render.
+    The blur only runs over the area around the alpha's bounding box that the shadow reaches, masks are kept in shadow_cache
+    '''
+    if shadow_cache.max_bytes:
+        key = _shadow_key(alpha.tobytes(), alpha.size, upscale, shadow_strength)
+        cached = shadow_cache.get(key)
+        if cached is not None:
+            return cached
+
+    width, height = alpha.size
+    mask = Img.new('L', ((width + 2) * upscale, (height + 2) * upscale), 0)
+
+    bbox = alpha.getbbox()
+    if bbox:
+        with Timing.stage('shadow_blur'):
+            # reached area in sprite pixels, counting the 1 pixel border around the sprite. Cropping past the sprite fills with 0
+            margin = Vectorized.shadow_margin(upscale)
+            left, top = max(bbox[0] + 1 - margin, 0), max(bbox[1] + 1 - margin, 0)
+            right, bottom = min(bbox[2] + 1 + margin, width + 2), min(bbox[3] + 1 + margin, height + 2)
+
+            region = alpha.crop((left - 1, top - 1, right - 1, bottom - 1)).resize(((right - left) * upscale, (bottom - top) * upscale), resample = Img.NEAREST)
+            region = region.filter(ImgF.BoxBlur(radius = upscale / 2)).filter(ImgF.BoxBlur(radius = upscale / 2)) # gauss approx that is ~15% faster
+            mask.paste(region.point(Vectorized.strength_table(shadow_strength).tolist()), (left * upscale, top * upscale))
+
+    if shadow_cache.max_bytes:
+        shadow_cache.put(key, mask)
+
+    return mask
+
+def _shadow_masks(stack: np.ndarray, upscale: int, shadow_strength: float) -> np.ndarray:
+    '''
+    shadow masks for a (n_tiles, height, width, 4) stack of sprites, from shadow_cache where possible and blurred together otherwise
+    '''
+    count, height, width, _ = stack.shape
+    if not shadow_cache.max_bytes:
+        return Vectorized.blur_shadows(stack[..., 3], upscale, shadow_strength)
+
+    masks = np.empty((count, (height + 2) * upscale, (width + 2) * upscale), np.uint8)
+    keys = [_shadow_key(stack[i, ..., 3].tobytes(), (width, height), upscale, shadow_strength) for i in range(count)]
+    missing = []
+
+    for i, key in enumerate(keys):
+        cached = shadow_cache.get(key)
+        if cached is None:
+            missing.append(i)
+        else:
+            masks[i] = np.asarray(cached)
+
+    if missing:
+        with Timing.stage('shadow_blur'):
+            blurred = Vectorized.blur_shadows(stack[missing, ..., 3], upscale, shadow_strength)
+        for i, mask in zip(missing, blurred):
+            masks[i] = mask
+            shadow_cache.put(keys[i], Img.fromarray(mask))
+
+    return masks
+
+def _render_key(sprite: Sprite, mask: Mask, upscale: int, shadow: bool, outline: bool, has_mask: bool,
+                shadow_color: tuple[int, int, int], outline_color: tuple[int, int, int], shadow_strength: int, outline_thickness: int) -> bytes:
+    return RenderCache.key(sprite, mask, has_mask, upscale,
+                           shadow and (tuple(shadow_color), shadow_strength), # shadow settings don't matter without a shadow
+                           outline and (tuple(outline_color), outline_thickness))
+
 def render(sprite: Sprite, mask: Mask, 
            upscale: int, 
            shadow: bool, outline: bool, 
@@ -146,12 +675,103 @@ def render(sprite: Sprite, mask: Mask,
            shadow_strength: int, outline_thickness: int) -> Img.Image:
     '''
     produces a final render with all features possible including and mask
+
+    renders are shared through render_cache so the returned image shouldn't be drawn on
     '''
+    if render_cache.max_bytes:
+        key = _render_key(sprite, mask, upscale, shadow, outline, has_mask, shadow_color, outline_color, shadow_strength, outline_thickness)
+        cached = render_cache.get(key)
+        if cached is not None:
+            return cached
     
     rendered_sprite = sprite.render(upscale, shadow, outline, shadow_color, shadow_strength, outline_color, outline_thickness)
 
-    if has_mask:
+    if has_mask and not _is_empty(mask.bbox): # an empty mask pastes nothing
         rendered_mask = mask.render(upscale)
-        rendered_sprite.paste(rendered_mask, mask = rendered_mask.getchannel('A'))
+        with Timing.stage('mask_paste'):
+            rendered_sprite.paste(rendered_mask, mask = rendered_mask.getchannel('A'))
+
+    if render_cache.max_bytes:
+        render_cache.put(key, rendered_sprite)
 
     return rendered_sprite
+
+def tile_key(sprite: Sprite, mask: Mask, has_mask: bool) -> bytes:
+    '''
+    the tile's pixels hashed, with the mask's if it's drawn. Blank tiles all render the same and share one key per size
+    '''
+    if _is_empty(sprite.bbox) and (not has_mask or _is_empty(mask.bbox)):
+        return repr(('blank', sprite.size)).encode()
+
+    digest = hashlib.blake2b(repr((sprite.size, has_mask)).encode(), digest_size = 16)
+    digest.update(np.ascontiguousarray(sprite.array))
+    if has_mask:
+        digest.update(np.ascontiguousarray(mask.array))
+    return digest.digest()
+
+def render_many(sprites: list[Sprite], masks: list[Mask], 
+                upscale: int, 
+                shadow: bool, outline: bool, 
+                has_mask: bool,  
+                shadow_color: tuple[int, int, int], outline_color: tuple[int, int, int],
+                shadow_strength: int, outline_thickness: int,
+                seen: dict = None) -> list[Img.Image]:
+    '''
+    same as calling render on each sprite and mask pair, but sprites missing from the cache are drawn together
+    by the vectorized engine instead of one at a time
+
+    identical tiles are only drawn once and share their render, the masks should all have the same textures.
+    seen maps tile_key to renders made so far, passing the same dict to several calls shares renders between them
+    '''
+    seen = {} if seen is None else seen
+    with Timing.stage('dedupe'):
+        tile_keys = [tile_key(sprite, mask, has_mask) for sprite, mask in zip(sprites, masks)]
+
+    keys = {} # tile key: cache key, for tiles that still need drawing
+    groups = {} # sprite size: positions of the first of each tile that still needs drawing, only same sized sprites can be stacked
+
+    for i, (sprite, mask) in enumerate(zip(sprites, masks)):
+        if tile_keys[i] in seen or tile_keys[i] in keys:
+            continue
+
+        if _is_empty(sprite.bbox) and (not has_mask or _is_empty(mask.bbox)): # blank tiles don't need drawing
+            width, height = sprite.size
+            seen[tile_keys[i]] = Img.new('RGBA', ((width + 2) * upscale, (height + 2) * upscale), (0, 0, 1, 0))
+            continue
+
+        keys[tile_keys[i]] = None
+        if render_cache.max_bytes:
+            with Timing.stage('cache'):
+                keys[tile_keys[i]] = _render_key(sprite, mask, upscale, shadow, outline, has_mask, shadow_color, outline_color, shadow_strength, outline_thickness)
+                cached = render_cache.get(keys[tile_keys[i]])
+            if cached is not None:
+                seen[tile_keys[i]] = cached
+                del keys[tile_keys[i]]
+                continue
+
+        groups.setdefault(sprite.size, []).append(i)
+
+    for positions in groups.values():
+        stack = np.stack([sprites[i].array for i in positions])
+        shadow_masks = _shadow_masks(stack, upscale, shadow_strength) if shadow else None
+
+        with Timing.stage('vectorized'):
+            drawn = Vectorized.render_sprites(stack, upscale, shadow, outline, shadow_color, shadow_strength, outline_color, outline_thickness, shadow_masks,
+                                              _native_thickness(upscale, outline, outline_thickness))
+        Timing.add('vectorized_sprites', 0, len(positions))
+
+        for i, array in zip(positions, drawn):
+            rendered_sprite = Img.fromarray(array)
+
+            if has_mask and not _is_empty(masks[i].bbox):
+                rendered_mask = masks[i].render(upscale)
+                with Timing.stage('mask_paste'):
+                    rendered_sprite.paste(rendered_mask, mask = rendered_mask.getchannel('A'))
+
+            key = keys.pop(tile_keys[i])
+            if key is not None:
+                with Timing.stage('cache'):
+                    render_cache.put(key, rendered_sprite)
+            seen[tile_keys[i]] = rendered_sprite
+
+    return [seen[key] for key in tile_keys]
@@ -0,0 +1,218 @@
+'''
+a local render server for build pipelines, so a render doesn't pay for starting python and decoding its sheet every time
+
+POST /render takes a JSON object of Batch's render options and renders and saves one sheet, GET /metrics reports queue
+depth, latencies and cache stats. Decoded sheets are kept between requests, and a request identical to one that's still
+rendering waits for that render instead of starting its own
+'''
+
+from . import Rendering, IO, Batch, Timing
+
+import argparse, collections, concurrent.futures, http.server, json, os, os.path, threading, time
+
+def _summary(latencies: collections.deque) -> dict:
+    if not latencies:
+        return {'count': 0}
+    values = list(latencies)
+    return {'count': len(values), 'mean': sum(values) / len(values),
+            'p50': Timing.percentile(values, 50), 'p90': Timing.percentile(values, 90), 'p99': Timing.percentile(values, 99)}
+
+class RenderService:
+    '''
+    renders requests on workers threads. Identical requests that arrive while one is queued or rendering share its result
+    '''
+    latency_window = 1000 # most recent requests the latency percentiles are taken over
+
+    def __init__(self, output_dir: str, workers: int, tile_workers: int = 1, max_sheets: int = 32):
+        self.output_dir = output_dir
+        self.tile_workers = tile_workers
+        self.sheets = Batch.SheetCache(max_sheets)
+
+        self.requests = 0
+        self.coalesced = 0
+        self.failed = 0
+
+        self._executor = concurrent.futures.ThreadPoolExecutor(max_workers = workers)
+        self._lock = threading.Lock()
+        self._pending = {} # request key: Future of the render
+        self._queued = 0
+        self._running = 0
+        self._latencies = collections.deque(maxlen = self.latency_window) # whole requests, including waiting
+        self._render_latencies = collections.deque(maxlen = self.latency_window)
+
+    def _parse(self, request: dict) -> tuple[str, str, str, argparse.Namespace]:
+        '''
+        the sheet, mask and output paths and the render options of a request, options left out get Batch's defaults.
+        Without a mask the sheet's mask is picked up like in Batch, an empty mask renders without one. output_path is
+        relative to the output directory and raises ValueError if it leads outside of it
+        '''
+        request = {key.replace('-', '_'): value for key, value in request.items()}
+        if not isinstance(request.get('sheet'), str):
+            raise ValueError('Requests need a sheet path.')
+
+        args = Batch.parse_options({key: value for key, value in request.items() if key not in ('sheet', 'mask', 'output_path')})
+        args.tile_workers = self.tile_workers
+
+        path = os.path.abspath(request['sheet'])
+        if 'mask' in request:
+            mask_path = os.path.abspath(request['mask']) if request['mask'] else ''
+        else:
+            mask_path = '' if args.no_mask else Batch.find_mask(path, args.mask_suffix)
+        output_dir = os.path.realpath(self.output_dir)
+        if request.get('output_path'):
+            if not isinstance(request['output_path'], str):
+                raise ValueError('output_path should be a path.')
+            output_path = os.path.realpath(os.path.join(output_dir, request['output_path']))
+            if os.path.commonpath((output_dir, output_path)) != output_dir or output_path == output_dir:
+                raise ValueError('output_path has to be inside the output directory.')
+        else:
+            output_path = Batch.default_output(path, output_dir, args.mode)
+
+        return path, mask_path, output_path, args
+
+    def render(self, request: dict) -> dict:
+        '''
+        renders and saves a request, returns the output path, sprite count, render seconds, dedupe stats
+        and if the render was shared with an identical request
+        '''
+        start = time.perf_counter()
+        path, mask_path, output_path, args = self._parse(request)
+        key = json.dumps([path, mask_path, output_path, vars(args)], sort_keys = True)
+
+        with self._lock:
+            self.requests+= 1
+            future = self._pending.get(key)
+            coalesced = future is not None
+            if coalesced:
+                self.coalesced+= 1
+            else:
+                self._queued+= 1
+                future = self._executor.submit(self._render, key, path, mask_path, output_path, args)
+                self._pending[key] = future
+
+        try:
+            return dict(future.result(), coalesced = coalesced)
+        except Exception:
+            with self._lock:
+                self.failed+= 1
+            raise
+        finally:
+            with self._lock:
+                self._latencies.append(time.perf_counter() - start)
+
+    def _render(self, key: str, path: str, mask_path: str, output_path: str, args: argparse.Namespace) -> dict:
+        with self._lock:
+            self._queued-= 1
+            self._running+= 1
+        start = time.perf_counter()
+
+        try:
+            sheet = self.sheets.get(path, mask_path)
+            os.makedirs(os.path.dirname(output_path), exist_ok = True)
+            rendered_images, count = Batch.render_to(sheet, bool(mask_path), output_path, args.mode, args.speed, args.clothing, args.accessory,
+                                                     **Batch.render_kwargs(args))
+            return {'output': output_path, 'sprites': count, 'seconds': time.perf_counter() - start, 'dedupe': rendered_images.stats}
+        finally:
+            with self._lock:
+                self._running-= 1
+                self._pending.pop(key, None) # later requests render again, the files might have changed
+                self._render_latencies.append(time.perf_counter() - start)
+
+    def metrics(self) -> dict:
+        with self._lock:
+            metrics = {
+                'queued': self._queued, # waiting for a worker
+                'running': self._running,
+                'requests': self.requests,
+                'coalesced': self.coalesced,
+                'failed': self.failed,
+                'latency': _summary(self._latencies),
+                'render_latency': _summary(self._render_latencies)
+            }
+        metrics['sheets'] = self.sheets.stats()
+        metrics['render_cache'] = {'hits': Rendering.render_cache.hits, 'misses': Rendering.render_cache.misses, 'bytes': Rendering.render_cache.bytes}
+        if IO.disk_cache:
+            metrics['disk_cache'] = IO.disk_cache.stats()
+        return metrics
+
+    def close(self) -> None:
+        self._executor.shutdown()
+
+class _Handler(http.server.BaseHTTPRequestHandler):
+    def do_GET(self) -> None:
+        if self.path == '/metrics':
+            self._reply(200, self.server.service.metrics())
+        else:
+            self._reply(404, {'error': f'Nothing at {self.path}.'})
+
+    def do_POST(self) -> None:
+        if self.path != '/render':
+            self._reply(404, {'error': f'Nothing at {self.path}.'})
+            return
+        if self.headers.get_content_type() != 'application/json': # browsers can't send json from another site without asking first
+            self._reply(415, {'error': 'Requests should be sent as application/json.'})
+            return
+
+        try:
+            request = json.loads(self.rfile.read(int(self.headers.get('Content-Length', 0))))
+            if not isinstance(request, dict):
+                raise ValueError('Requests should be JSON objects.')
+            result = self.server.service.render(request)
+        except (ValueError, LookupError, FileNotFoundError) as e: # bad options, an index past the end of the sheet or a missing file
+            self._reply(400, {'error': str(e)})
+        except Exception as e:
+            self._reply(500, {'error': str(e)})
+        else:
+            self._reply(200, result)
+
+    def _reply(self, status: int, body: dict) -> None:
+        data = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format: str, *args) -> None:
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+class Server(http.server.ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, service: RenderService, host: str = '127.0.0.1', port: int = 8765, verbose: bool = False):
+        self.service = service
+        self.verbose = verbose
+        super().__init__((host, port), _Handler)
+
+def make_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description = 'Serves renders over HTTP. POST a JSON object of Batch\'s render options with a "sheet" path to /render, GET /metrics for queue depth and latencies.')
+
+    parser.add_argument('--host', default = '127.0.0.1', help = 'only this machine can connect by default')
+    parser.add_argument('--port', type = int, default = 8765)
+    parser.add_argument('-j', '--workers', type = int, default = os.cpu_count(), help = 'how many renders run at once')
+    parser.add_argument('--tile-workers', type = int, default = 1, help = 'processes the tiles of one sheet are split across')
+    parser.add_argument('-o', '--output', default = './Renders', help = 'directory renders are saved to when a request has no output_path')
+    parser.add_argument('--max-sheets', type = int, default = 32, help = 'decoded sheets kept between requests')
+    Batch.add_disk_cache_options(parser)
+    parser.add_argument('-v', '--verbose', action = 'store_true', help = 'log every request')
+
+    return parser
+
+def main(argv: list[str] = None) -> int:
+    args = make_parser().parse_args(argv)
+
+    IO.use_disk_cache(*Batch.disk_cache_args(args))
+    service = RenderService(args.output, args.workers, args.tile_workers, args.max_sheets)
+    server = Server(service, args.host, args.port, args.verbose)
+    print(f'Serving renders on http://{args.host}:{server.server_address[1]}')
+
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        service.close()
+
+    return 0
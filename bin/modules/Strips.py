@@ -0,0 +1,204 @@
+'''
+large pngs decoded in strips of rows as they're used instead of all at once
+
+the compressed stream is inflated with zlib here and each strip is handed to PIL as a small png of its own to be unfiltered
+and converted, with the row before it stored unfiltered in front since png filters look at the row above.
+the inflate state is saved at every strip decoded so far, so strips evicted from the cache can be decoded again without
+starting over from the top of the file. the compressed stream is read when the png is opened, so the file can be changed
+or replaced while strips are still being decoded
+'''
+
+import PIL.Image as Img
+import numpy as np
+
+import collections, io, struct, threading, zlib
+
+SIGNATURE = b'\x89PNG\r\n\x1a\n'
+CHANNELS = {0: 1, 2: 3, 3: 1, 4: 2, 6: 4} # png color type: bytes per pixel at 8 bits
+STRIP_BYTES = 4 * 1024 * 1024 # decoded bytes a strip aims for
+READ_SIZE = 64 * 1024 # compressed bytes inflated at a time
+LAZY_BYTES = 64 * 1024 * 1024 # pngs smaller than this once decoded are loaded whole
+
+def _chunk(kind: bytes, data: bytes) -> bytes:
+    return struct.pack('>I', len(data)) + kind + data + struct.pack('>I', zlib.crc32(kind + data))
+
+def large_png(path: str) -> bool:
+    '''
+    if the file is a png large enough to be worth reading in strips
+    '''
+    try:
+        with Img.open(path) as image:
+            return image.format == 'PNG' and image.size[0] * image.size[1] * 4 >= LAZY_BYTES
+    except Exception:
+        return False
+
+def region(image, box: tuple[int, int, int, int]) -> np.ndarray:
+    '''
+    the RGBA pixels of box like Img.Image.crop, from an image with a size and rows(top, bottom).
+    a view of the rows when box is inside the image, area off of it is (0, 0, 0, 0)
+    '''
+    left, top, right, bottom = box
+    x0, y0 = max(left, 0), max(top, 0)
+    x1, y1 = min(right, image.size[0]), min(bottom, image.size[1])
+    if (x0, y0, x1, y1) == tuple(box):
+        return image.rows(top, bottom)[:, left:right]
+
+    cropped = np.zeros((bottom - top, right - left, 4), np.uint8)
+    if x0 < x1 and y0 < y1:
+        cropped[y0 - top:y1 - top, x0 - left:x1 - left] = image.rows(y0, y1)[:, x0:x1]
+    return cropped
+
+class _Checkpoint:
+    __slots__ = ('inflate', 'position', 'tail', 'row')
+
+    def __init__(self, inflate, position: int, tail: bytes, row: bytes):
+        self.inflate = inflate # zlib decompressobj positioned at the start of the strip
+        self.position = position # compressed bytes read so far
+        self.tail = tail # read but not yet inflated
+        self.row = row # the unfiltered row above the strip, None for the first strip
+
+class StripImage:
+    '''
+    an 8 bit, non interlaced png read as RGBA strips kept in an LRU cache of at most max_bytes.
+    has the size and crop of an RGBA Img.Image, crops are decoded from the strips they cover.
+    only the compressed pixel data is kept in memory until strips are decoded
+    '''
+    mode = 'RGBA'
+
+    def __init__(self, path: str, max_bytes: int = 64 * 1024 * 1024):
+        self.path = path
+        self.max_bytes = max_bytes
+
+        with open(path, 'rb') as f:
+            if f.read(8) != SIGNATURE:
+                raise ValueError(f'{path} is not a png')
+
+            self._header_chunks = [] # chunks like PLTE and tRNS that every strip's png needs
+            idat = [] # the compressed data
+            while True:
+                length, kind = struct.unpack('>I4s', f.read(8))
+                if kind == b'IHDR':
+                    width, height, depth, color_type, _, _, interlace = struct.unpack('>IIBBBBB', f.read(length))
+                elif kind == b'IDAT':
+                    idat.append(f.read(length))
+                elif kind == b'IEND':
+                    break
+                elif not idat:
+                    self._header_chunks.append(_chunk(kind, f.read(length)))
+                else:
+                    f.seek(length, 1)
+                f.seek(4, 1) # crc
+
+        if depth != 8 or interlace or color_type not in CHANNELS:
+            raise ValueError(f'{path} can\'t be read in strips, only 8 bit non interlaced pngs can')
+
+        self.size = (width, height)
+        self._data = b''.join(idat)
+        self._depth, self._color_type = depth, color_type
+        self._row_bytes = width * CHANNELS[color_type]
+        self.strip_rows = 1 << max(int(STRIP_BYTES // (width * 4)).bit_length() - 1, 0) # a power of 2 so strips line up with power of 2 tiles
+        self.strip_count = -(-height // self.strip_rows)
+
+        self._lock = threading.RLock()
+        self._strips = collections.OrderedDict() # strip: (rows, width, 4) RGBA array
+        self._checkpoints = {0: _Checkpoint(zlib.decompressobj(), 0, b'', None)}
+
+    @property
+    def cached_bytes(self) -> int:
+        return sum(strip.nbytes for strip in self._strips.values())
+
+    def _read(self, position: int, size: int) -> bytes:
+        '''
+        compressed bytes from position in the stream made by joining the IDAT chunks
+        '''
+        return self._data[position:position + size]
+
+    def _decode(self, strip: int) -> np.ndarray:
+        '''
+        decodes a strip from the checkpoint at its start, which the strip before it left
+        '''
+        checkpoint = self._checkpoints[strip]
+        inflate, position, tail = checkpoint.inflate.copy(), checkpoint.position, checkpoint.tail
+        rows = min(self.strip_rows, self.size[1] - strip * self.strip_rows)
+
+        needed = rows * (self._row_bytes + 1) # every row starts with its filter type
+        filtered = []
+        while needed > 0:
+            if not tail:
+                tail = self._read(position, READ_SIZE)
+                position+= len(tail)
+                if not tail:
+                    raise ValueError(f'{self.path} ends early')
+            data = inflate.decompress(tail, needed)
+            tail = inflate.unconsumed_tail
+            needed-= len(data)
+            filtered.append(data)
+
+        # a png of the strip alone, with the row above unfiltered in front of it
+        above = b'' if checkpoint.row is None else b'\x00' + checkpoint.row
+        header = struct.pack('>IIBBBBB', self.size[0], rows + bool(above), self._depth, self._color_type, 0, 0, 0)
+        png = (SIGNATURE + _chunk(b'IHDR', header) + b''.join(self._header_chunks)
+               + _chunk(b'IDAT', zlib.compress(above + b''.join(filtered), 0)) + _chunk(b'IEND', b''))
+
+        with Img.open(io.BytesIO(png)) as image:
+            image.load()
+            if above:
+                image = image.crop((0, 1, self.size[0], rows + 1))
+            last_row = image.crop((0, rows - 1, self.size[0], rows)).tobytes()
+            pixels = np.asarray(image.convert('RGBA'))
+
+        if strip + 1 < self.strip_count:
+            self._checkpoints[strip + 1] = _Checkpoint(inflate, position, tail, last_row)
+        return pixels
+
+    def strip(self, strip: int) -> np.ndarray:
+        '''
+        the RGBA pixels of a strip, decoding it and any strips above it that haven't been reached yet
+        '''
+        with self._lock:
+            if strip in self._strips:
+                self._strips.move_to_end(strip)
+                return self._strips[strip]
+
+            start = strip if strip in self._checkpoints else max(self._checkpoints) # strips are reached in order the first time
+            for missing in range(start, strip):
+                self._keep(missing, self._decode(missing))
+            pixels = self._decode(strip)
+            self._keep(strip, pixels)
+            return pixels
+
+    def _keep(self, strip: int, pixels: np.ndarray) -> None:
+        self._strips[strip] = pixels
+        self._strips.move_to_end(strip)
+        while len(self._strips) > 1 and self.cached_bytes > self.max_bytes:
+            self._strips.popitem(last = False)
+
+    def rows(self, top: int, bottom: int) -> np.ndarray:
+        '''
+        RGBA pixels of rows top to bottom, a view into one strip if they're inside it
+        '''
+        top, bottom = max(top, 0), min(bottom, self.size[1])
+        if top >= bottom:
+            return np.zeros((0, self.size[0], 4), np.uint8)
+
+        first, last = top // self.strip_rows, (bottom - 1) // self.strip_rows
+        strips = [self.strip(strip) for strip in range(first, last + 1)]
+        pixels = strips[0] if len(strips) == 1 else np.concatenate(strips)
+
+        offset = first * self.strip_rows
+        return pixels[top - offset:bottom - offset]
+
+    def region(self, box: tuple[int, int, int, int]) -> np.ndarray:
+        return region(self, box)
+
+    def crop(self, box: tuple[int, int, int, int]) -> Img.Image:
+        '''
+        same as Img.Image.crop, area off of the image is (0, 0, 0, 0)
+        '''
+        return Img.fromarray(self.region(box))
+
+    def load(self) -> Img.Image:
+        '''
+        the whole image at once, for things that need all of it
+        '''
+        return Img.fromarray(self.rows(0, self.size[1]))
@@ -0,0 +1,153 @@
+'''
+per stage timings for the render pipeline, off by default
+
+stages are timed with `with Timing.stage(name):` or the `@Timing.timed(name)` decorator,
+while disabled both only cost a check of Timing.enabled. IO.render wraps each render in record so
+every call gets its own stats, stages timed outside of a recorded call only go to the totals.
+'''
+
+import collections, contextlib, functools, json, math, threading, time
+
+enabled = False
+
+_lock = threading.Lock()
+_local = threading.local()
+_totals = {}
+_calls = collections.deque(maxlen = 100) # most recent recorded calls
+_null = contextlib.nullcontext()
+
+class _Stage:
+    __slots__ = ('name', 'start')
+
+    def __init__(self, name: str):
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+
+    def __exit__(self, *_):
+        add(self.name, time.perf_counter() - self.start)
+
+def _add_to(stats: dict, name: str, seconds: float, count: int = 1) -> None:
+    stage = stats.setdefault(name, {'count': 0, 'seconds': 0.0})
+    stage['count']+= count
+    stage['seconds']+= seconds
+
+def add(name: str, seconds: float, count: int = 1) -> None:
+    '''
+    adds time to a stage, for work timed some other way
+    '''
+    if not enabled:
+        return
+
+    call = getattr(_local, 'call', None)
+    if call is not None:
+        _add_to(call['stages'], name, seconds, count)
+    else:
+        with _lock:
+            _add_to(_totals, name, seconds, count)
+
+def stage(name: str):
+    '''
+    context manager timing the block as the named stage
+    '''
+    if not enabled:
+        return _null
+    return _Stage(name)
+
+def timed(name: str) -> callable:
+    '''
+    decorator timing every call of a function as the named stage
+    '''
+    def decorator(func: callable) -> callable:
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not enabled:
+                return func(*args, **kwargs)
+
+            start = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                add(name, time.perf_counter() - start)
+        return wrapper
+    return decorator
+
+@contextlib.contextmanager
+def record(label: str):
+    '''
+    collects the stages timed on this thread inside the block as one call, nested records count towards the outer one
+    '''
+    if not enabled or getattr(_local, 'call', None) is not None:
+        yield
+        return
+
+    call = {'label': label, 'seconds': 0.0, 'stages': {}}
+    _local.call = call
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        call['seconds'] = time.perf_counter() - start
+        _local.call = None
+
+        with _lock:
+            for name, stats in call['stages'].items():
+                _add_to(_totals, name, stats['seconds'], stats['count'])
+            _calls.append(call)
+
+def merge(stats: dict) -> None:
+    '''
+    adds {stage: {'count', 'seconds'}} from elsewhere to the totals, like timings sent back from another process
+    '''
+    with _lock:
+        for name, stage_stats in stats.items():
+            _add_to(_totals, name, stage_stats['seconds'], stage_stats['count'])
+
+def enable() -> None:
+    global enabled
+    enabled = True
+
+def disable() -> None:
+    global enabled
+    enabled = False
+
+def reset() -> None:
+    with _lock:
+        _totals.clear()
+        _calls.clear()
+
+def totals() -> dict:
+    '''
+    {stage: {'count', 'seconds'}} over everything timed since the last reset
+    '''
+    with _lock:
+        return {name: dict(stats) for name, stats in _totals.items()}
+
+def calls() -> list[dict]:
+    '''
+    the last 100 recorded calls, oldest first, as {'label', 'seconds', 'stages'}
+    '''
+    with _lock:
+        return [dict(call, stages = {name: dict(stats) for name, stats in call['stages'].items()}) for call in _calls]
+
+def last() -> dict:
+    '''
+    the most recent recorded call, None if there isn't one
+    '''
+    recorded = calls()
+    return recorded[-1] if recorded else None
+
+def percentile(values: list[float], p: float) -> float:
+    '''
+    nearest rank
+    '''
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, max(0, math.ceil(p / 100 * len(ordered)) - 1))]
+
+def report() -> dict:
+    return {'totals': totals(), 'calls': calls()}
+
+def dump(path: str) -> None:
+    with open(path, 'w') as f:
+        json.dump(report(), f, indent = 4)
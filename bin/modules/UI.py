@@ -10,9 +10,9 @@ import PIL.Image as Img
 import PIL.ImageTk as ImgTk
 import PIL.ImageGrab as ImgGr
 
-import os.path, pickle, traceback
+import collections, queue, traceback
 
-from . import Rendering, IO
+from . import Rendering, IO, Watch, DiskCache, Assets
 
 class IndexWidget(ttk.Frame):
     def __init__(self, *args, index: tk.StringVar, sheet: IO.SheetVar, width: tk.StringVar, **kwargs):
@@ -144,7 +144,7 @@ class ScrollableFrame(ttk.Frame):
         self.Canvas.bind('<MouseWheel>', lambda event: self.Canvas.yview_scroll(int(-1 * (event.delta / 120)), 'units'))
 
 class TextilePicker(ttk.Button):
-    def __init__(self, *args, image_var: IO.ImgVar, textiles: dict[int, list[Img.Image]], icon_set: dict[str, Img.Image], config: IO.Config, **kwargs): 
+    def __init__(self, *args, image_var: IO.ImgVar, textiles: Assets.Textiles, icon_set: dict[str, Img.Image], config: IO.Config, **kwargs): 
         ttk.Button.__init__(self, *args, command = self._choose, compound = tk.LEFT, **kwargs)
 
         self._image_var = image_var
@@ -272,9 +272,9 @@ class SelectPreview(ttk.Frame):
         self._height = height
         self._text = text
         self._img_padding = img_padding
-        self._outline_template = outline
         self._mask = mask # bool
         self._last_size = 0
+        self._atlas = IO.PreviewAtlas(img_padding, outline, mask)
 
         self._Limage = ttk.Label(self, style = 'graphic.TLabel')
         self._Limage.place(relx = 0.5, rely = 0.5, anchor = tk.CENTER)
@@ -295,23 +295,50 @@ class SelectPreview(ttk.Frame):
         width = int(self._width.get())
         height = int(self._height.get())
 
-        size = (self.winfo_height() - self._Ltext.winfo_height(),) * 2        
-        image = self._sheet.get().get_sprite(index, width, height, padding = self._img_padding)[self._mask]
+        size = self.winfo_height() - self._Ltext.winfo_height()
+        image = self._atlas.get(self._sheet.get(), index, width, height, size) # built in the background around the current tile
 
-        if size[0] < 5: # for startup
-            image = image.resize((5, 5), resample = Img.BOX)
+        self._preview = ImgTk.PhotoImage(image)
+        self._Limage.configure(image = self._preview)
+
+    def close(self) -> None:
+        self._atlas.close()
+
+class FrameStore:
+    '''
+    tk images of a render's frames, each alpha filtered and converted the first time it's shown and kept while they fit in max_bytes.
+    Animations too long to fit are converted again as they come back around
+    '''
+    max_bytes = 256 * 1024 * 1024
+
+    def __init__(self, frames: list[Img.Image]):
+        self.frames = frames
+        self._images = collections.OrderedDict() # frame: PhotoImage
+        self._frame_bytes = frames[0].size[0] * frames[0].size[1] * 4
+
+    def __len__(self) -> int:
+        return len(self.frames)
+
+    def get(self, frame: int) -> ImgTk.PhotoImage:
+        image = self._images.get(frame)
+        if image is None:
+            image = ImgTk.PhotoImage(IO.alpha_filter(self.frames[frame])) # much faster even for large images, done once per frame instead of every tick
+            self._images[frame] = image
+            while len(self._images) > 2 and len(self._images) * self._frame_bytes > self.max_bytes: # the shown frame and the next one stay
+                self._images.popitem(last = False)
         else:
-            image = image.resize(size, resample = Img.BOX)
-            scale_factor = size[0] // (2 * self._img_padding + 1)
-            outline = self._outline_template.resize((scale_factor,) * 2, resample = Img.BOX)
-            image.alpha_composite(outline, (size[0] // 2 - scale_factor // 2,) * 2) # basing off of factor and padding inconsistent since sprite sizes inconsistent, this works better
+            self._images.move_to_end(frame)
 
-        self._preview = ImgTk.PhotoImage(IO.alpha_filter(image))
-        #self._preview = ImgTk.PhotoImage(image) #slight visual downgrade but better performance
-        self._Limage.configure(image = self._preview)
+        return image
 
 class RenderOutput(ttk.Frame):
+    '''
+    stills are shown as tiles and only the tiles in and around the visible area are converted for tk, so huge renders
+    scroll without holding a tk copy of the whole image. Animations are played from a FrameStore
+    '''
     canvas_style = {}
+    tile_size = 512
+    tile_margin = 1 # tiles kept past each edge of the visible area
 
     def __init__(self, *args, rendered_images: IO.ListVar, speeds: tk.StringVar, mode: tk.StringVar, **kwargs):
         ttk.Frame.__init__(self, *args, style = 'graphic.TFrame', **kwargs)
@@ -322,6 +349,10 @@ class RenderOutput(ttk.Frame):
 
         self._current_frame = 0
         self._last_running = 'hi'
+        self._frames = None
+        self._image_item = None
+        self._tiled = None # still being shown in tiles
+        self._tiles = {} # (column, row): (canvas item, PhotoImage)
 
         self._Cimage = tk.Canvas(self, width = 100, height = 100, **self.canvas_style)
         self._Cimage.grid(row = 0, column = 0, rowspan = 2)
@@ -335,7 +366,8 @@ class RenderOutput(ttk.Frame):
         self._SBh_scrollbar = ttk.Scrollbar(self, orient = tk.HORIZONTAL, command = self._Cimage.xview, style = 'graphic.Horizontal.TScrollbar')
         self._SBh_scrollbar.grid(row = 2, column = 0, columnspan = 2, sticky = 'sew') # no tk var for sew :(
 
-        self._Cimage.configure(xscrollcommand = self._SBh_scrollbar.set, yscrollcommand = self._SBv_scrollbar.set)
+        self._Cimage.configure(xscrollcommand = lambda *args: self._scrolled(self._SBh_scrollbar, *args), 
+                               yscrollcommand = lambda *args: self._scrolled(self._SBv_scrollbar, *args))
 
         self.bind('<Configure>', lambda _: self._Cimage.configure(width = self.winfo_width() - self._SBv_scrollbar.winfo_width(), 
                                                                   height = self.winfo_height() - self._SBh_scrollbar.winfo_height()))# - self._Ltext.winfo_height() - 10))
@@ -350,34 +382,85 @@ class RenderOutput(ttk.Frame):
         self._Cimage.configure(scrollregion = (0, -self._Ltext.winfo_height() - 10, image.width(), image.height()))
 
         self._Cimage.delete('all')
-        self._Cimage.create_image(0, 0, image = image, anchor = tk.NW)
+        self._tiled, self._tiles = None, {}
+        self._image_item = self._Cimage.create_image(0, 0, image = image, anchor = tk.NW)
+
+    def _place_tiles(self, image: Img.Image) -> None:
+        self._Cimage.configure(scrollregion = (0, -self._Ltext.winfo_height() - 10, *image.size))
+
+        self._Cimage.delete('all')
+        self._tiled, self._tiles = image, {}
+        self._image_item = None
+        self._update_tiles()
+
+    def _scrolled(self, scrollbar: ttk.Scrollbar, *args) -> None:
+        scrollbar.set(*args)
+        self._update_tiles()
+
+    def _update_tiles(self) -> None:
+        '''
+        converts the tiles that came into view and drops the ones that left it
+        '''
+        if self._tiled is None:
+            return
+
+        size, margin = self.tile_size, self.tile_margin
+        width, height = self._tiled.size
+        left, top = int(self._Cimage.canvasx(0)), int(self._Cimage.canvasy(0))
+        right, bottom = left + self._Cimage.winfo_width(), top + self._Cimage.winfo_height()
+
+        columns = range(max(left // size - margin, 0), min(right // size + margin, (width - 1) // size) + 1)
+        rows = range(max(top // size - margin, 0), min(bottom // size + margin, (height - 1) // size) + 1)
+        visible = {(column, row) for column in columns for row in rows}
+
+        for key in set(self._tiles) - visible:
+            self._Cimage.delete(self._tiles.pop(key)[0])
+
+        for column, row in visible - set(self._tiles):
+            box = (column * size, row * size, min((column + 1) * size, width), min((row + 1) * size, height))
+            image = ImgTk.PhotoImage(IO.alpha_filter(self._tiled.crop(box)))
+            self._tiles[(column, row)] = (self._Cimage.create_image(box[0], box[1], image = image, anchor = tk.NW), image)
 
     def _update(self) -> None:
         self._Cimage.after_cancel(self._last_running)
         
         self._current_frame = 0
 
-        self._filtered_render = IO.alpha_filter(self._rendered_images.get()[0]) # much faster even for large images
-        self._current_render = ImgTk.PhotoImage(self._filtered_render)
+        rendered_images = self._rendered_images.get()
+        if self._mode.get().strip() not in ('Entity', 'Animation'):
+            self._frames = None
+            self._place_tiles(rendered_images[0])
+            return
+
+        if self._frames is None or self._frames.frames is not rendered_images: # speed changes keep the converted frames
+            self._frames = FrameStore(rendered_images)
 
-        self._place_image(self._current_render)
-        
-        if self._mode.get().strip() in ('Entity', 'Animation'):
-            self._length = len(self._rendered_images.get())
-            self._intervals = IO.speed_filter(self._speeds.get(), self._length)
+        self._place_image(self._frames.get(0))
 
-            self._last_running = self._Cimage.after(self._intervals[0], self._next_frame)
+        self._length = len(self._frames)
+        self._intervals = IO.speed_filter(self._speeds.get(), self._length)
+
+        self._last_running = self._Cimage.after(self._intervals[0], self._next_frame)
+        self._Cimage.after_idle(self._frames.get, 1 % self._length) # converts ahead so the tick only swaps images
+
+    def show_partial(self, image: Img.Image) -> None:
+        '''
+        shows a render that's still being drawn without touching the rendered images, so saving and copying only get finished renders
+        '''
+        self._Cimage.after_cancel(self._last_running)
+        self._frames = None
+        self._place_tiles(image)
     
     def _next_frame(self) -> None:
         self._current_frame+= 1
 
-        if self._current_frame == len(self._rendered_images.get()):
+        if self._current_frame == self._length:
             self._current_frame = 0
 
-        self._current_render = ImgTk.PhotoImage(self._rendered_images.get()[self._current_frame])
-        self._place_image(self._current_render)
+        self._Cimage.itemconfigure(self._image_item, image = self._frames.get(self._current_frame)) # frames are all the same size
 
         self._last_running = self._Cimage.after(self._intervals[self._current_frame], self._next_frame)
+        self._Cimage.after_idle(self._frames.get, (self._current_frame + 1) % self._length)
 
 class InfoBar(ttk.Frame):
     def __init__(self, *args, sheet: IO.SheetVar, sheet_name: tk.StringVar, mask_name: tk.StringVar, config: IO.Config, 
@@ -459,6 +542,8 @@ class Settings(tk.Toplevel):
         self._Vsheets_dir = tk.StringVar(self, self._config.data['sheets_dir'])
         self._Vrenders_dir = tk.StringVar(self, self._config.data['renders_dir'])
         self._Vtextiles_dir = tk.StringVar(self, self._config.data['textiles_dir'])
+        self._Vrender_cache = tk.BooleanVar(self, self._config.data.get('render_cache', False))
+        self._Vrender_cache_mb = tk.IntVar(self, self._config.data.get('render_cache_mb', DiskCache.DEFAULT_MAX_BYTES // (1024 * 1024)))
 
         self._Iblank = ImgTk.PhotoImage(Img.new('RGBA', (27, 27), (0, 0, 0, 1)))
 
@@ -563,6 +648,20 @@ class Settings(tk.Toplevel):
         self._Lrenders_dir = ttk.Label(self._Foptions, textvariable = self._Vtextiles_dir)
         self._Lrenders_dir.grid(row = 7, column = 4, padx = 10, sticky = tk.W)
 
+        self._Crender_cache = ttk.Checkbutton(self._Foptions, text = 'Disk Render Cache', variable = self._Vrender_cache)
+        self._Crender_cache.grid(row = 8, column = 0, columnspan = 2, sticky = tk.W)
+        self._TTrender_cache = tktt.ToolTip(self._Crender_cache,
+                                          'Keeps finished renders on disk so rendering the same sheet with the same settings again is instant, even after a restart. Shared with headless renders run with --disk-cache. Applies after restarting.',
+                                          0.5, False, 100)
+
+        self._SBrender_cache_mb = ttk.Spinbox(self._Foptions, textvariable = self._Vrender_cache_mb, width = 5, font = tkfont.nametofont('TkDefaultFont'),
+                                       validate = 'key', validatecommand = lambda *_: False,
+                                       from_ = 64, to = 16384, increment = 64)
+        self._SBrender_cache_mb.grid(row = 9, column = 0, sticky = tk.NSEW)
+
+        self._Lrender_cache_mb = ttk.Label(self._Foptions, text = ' Render Cache MB')
+        self._Lrender_cache_mb.grid(row = 9, column = 1, sticky = tk.W)
+
         self._Fbuttons = ttk.Frame(self._Fmain)
         self._Fbuttons.grid(row = 1, column = 0, padx = 10, sticky = tk.W)
 
@@ -590,6 +689,8 @@ class Settings(tk.Toplevel):
         self._set(['sheets_dir'], self._Vsheets_dir)
         self._set(['renders_dir'], self._Vrenders_dir)
         self._set(['textiles_dir'], self._Vtextiles_dir)
+        self._set(['render_cache'], self._Vrender_cache)
+        self._set(['render_cache_mb'], self._Vrender_cache_mb)
 
         try:
             self._config.write()
@@ -601,6 +702,10 @@ class Settings(tk.Toplevel):
         Settings.restart_func()
 
 class App:
+    render_delay = 150 # ms without changes before rendering, so typing doesn't render every keystroke
+    render_poll = 15 # ms between checks for a finished render
+    watch_poll = 50 # ms between checks for changes to subscribed files
+
     def __init__(self):
         self.root = tk.Tk()
         self.root.title('RotMG Sprite Renderer')
@@ -620,14 +725,17 @@ class App:
             self._alert(IO.InfobarAlert(True, e, '')) # text is empty so infobar isn't accessed
             tkmb.showerror('Bad Config', f'Error opening config; try reinstalling config.json: {e}')
             raise ValueError      
+
+        if self.config.data.get('render_cache', False): # configs from before the disk cache don't have it
+            IO.use_disk_cache(self.config.data.get('render_cache_dir') or DiskCache.DEFAULT_DIR,
+                              self.config.data.get('render_cache_mb', DiskCache.DEFAULT_MAX_BYTES // (1024 * 1024)) * 1024 * 1024)
           
         try:
-            with open('./bin/images.pickle', 'rb') as f:
-                self._image_set = pickle.load(f)
+            self._assets = Assets.Bundle('./bin/assets.bundle') # only the index, images are decoded as they're used
 
         except Exception as e:
             self._alert(IO.InfobarAlert(True, e, '')) # text is empty so infobar isn't accessed
-            tkmb.showerror('Bad Images File', f'Error opening images; try reinstalling images.pickle: {e}')
+            tkmb.showerror('Bad Assets File', f'Error opening images; try reinstalling assets.bundle: {e}')
             raise ValueError
 
 
@@ -656,7 +764,7 @@ class App:
             self._style.configure('TSpinbox', arrowsize = 3 + self.config.data['fontsize'])
             Settings.font = self._font
 
-            self._icon_set = self._image_set['icons'][self._style_config['icon_set']]
+            self._icon_set = self._assets.icons(self._style_config['icon_set']) # the other sets are never decoded
 
         except KeyError as e:
             self._alert(IO.InfobarAlert(True, e, '')) # text is empty so infobar isn't accessed
@@ -680,18 +788,24 @@ class App:
         self._Isave = ImgTk.PhotoImage(self._icon_set['save'])
         self._Isettings = ImgTk.PhotoImage(self._icon_set['settings'])
 
-        self._Iwarning = ImgTk.PhotoImage(self._image_set['warning'])
-        self._Ierror = ImgTk.PhotoImage(self._image_set['error'])
+        self._Iwarning = ImgTk.PhotoImage(self._assets.image('warning'))
+        self._Ierror = ImgTk.PhotoImage(self._assets.image('error'))
 
         self._Iblank = ImgTk.PhotoImage(Img.new('RGBA', (27, 27), (0, 0, 0, 1)))
         # /ICONS
 
 
         # VARS
-        self._sub_sheet_last = 'none'
-        self._sub_sheet_mtime = 0
-        self._sub_mask_last = 'none'
-        self._sub_mask_mtime = 0
+        self._sub_sheet_path = ''
+        self._sub_mask_path = ''
+        self._watcher = Watch.Watcher()
+        self._watch_events = queue.Queue() # functions to call on the tk thread, put there by the watcher's thread
+        self._watch_poll_last = 'none'
+        self._render_last = 'none'
+        self._render_poll_last = 'none'
+        self._render_pending = False # a change is waiting out the delay
+        self._render_current = False # rendered images match the settings
+        self._render_worker = IO.RenderWorker()
 
         self._Vsheet = IO.SheetVar(Rendering.Sheet(Img.new('RGBA', (8, 8), (0, 0, 1, 0))))
         self._Vsheet_name = tk.StringVar(self.root)
@@ -911,13 +1025,14 @@ class App:
         self._CPoutline_color.grid(row = 2, column = 1)
         self._DDcolor_textile.add(self._CPoutline_color)
 
+        self._textiles = self._assets.textiles() # decoded when a picker is first opened
         self._TPclothing = TextilePicker(self._Fcolor_textile_options, text = ' Clothing Texture', image_var = self._Vclothing_textile,
-                                         textiles = self._image_set['textiles'], icon_set = self._icon_set, config = self.config)
+                                         textiles = self._textiles, icon_set = self._icon_set, config = self.config)
         self._TPclothing.grid(row = 3, column = 0)
         self._DDcolor_textile.add(self._TPclothing)
 
         self._TPaccessory = TextilePicker(self._Fcolor_textile_options, text = ' Accessory Texture', image_var = self._Vaccessory_textile, 
-                                          textiles = self._image_set['textiles'], icon_set = self._icon_set, config = self.config)
+                                          textiles = self._textiles, icon_set = self._icon_set, config = self.config)
         self._TPaccessory.grid(row = 3, column = 1)
         self._DDcolor_textile.add(self._TPaccessory)
         ####### /COLOR AND TEXTILE OPTIONS
@@ -954,12 +1069,12 @@ class App:
 
         self._SPpreview = SelectPreview(self._Fgraphics, 
                                         sheet = self._Vsheet, index = self._Vindex, width = self._Vwidth, height = self._Vheight,
-                                        text = 'Selection', img_padding = self.config.data['padding'], outline = self._image_set['outline'])
+                                        text = 'Selection', img_padding = self.config.data['padding'], outline = self._assets.image('outline'))
         self._SPpreview.place(relx = 0, rely = 0, relwidth = 0.38, relheight = 0.5)
 
         self._SPpreview_mask = SelectPreview(self._Fgraphics, 
                                              sheet = self._Vsheet, index = self._Vindex, width = self._Vwidth, height = self._Vheight,
-                                             text = 'Mask', img_padding = self.config.data['padding'], outline = self._image_set['outline'], mask = True)
+                                             text = 'Mask', img_padding = self.config.data['padding'], outline = self._assets.image('outline'), mask = True)
         self._SPpreview_mask.place(relx = 0, rely = 0.5, relwidth = 0.38, relheight = 0.5)
     
         self._ROoutput = RenderOutput(self._Fgraphics, rendered_images = self._Vrendered_images, speeds = self._Vspeed, mode = self._Vmode)
@@ -1127,12 +1242,53 @@ class App:
 
         self._update()
         self._update_previews()
+        self._poll_watcher()
         self.root.mainloop()
 
     def _update(self) -> None:
+        '''
+        renders after a short delay on the render worker, bursts of changes only render once
+        '''
+        self._render_pending = True
+        self._render_current = False
+        self.root.after_cancel(self._render_last)
+        self._render_last = self.root.after(self.render_delay, self._render_protect, self._render)
+
+    def _poll_render(self) -> None:
+        result = self._render_worker.take()
+        if result:
+            self._render_protect(self._show_render, *result)
+        else:
+            partial = self._render_worker.take_partial()
+            if partial:
+                self._render_protect(self._ROoutput.show_partial, partial)
+
+        if self._render_worker.busy:
+            self._render_poll_last = self.root.after(self.render_poll, self._poll_render)
+
+    def _show_render(self, images: list[Img.Image], exception: Exception) -> None:
+        if exception:
+            raise exception
+
+        self._Vrendered_images.set(images)
+        self._render_current = True
+        self._ROoutput._update()
+
+    def _finish_render(self) -> bool:
+        '''
+        renders a change still waiting out the delay and waits for the worker, returns if the rendered images match the settings
+        '''
+        if self._render_pending:
+            self.root.after_cancel(self._render_last)
+            self._render_protect(self._render)
+
+        self._render_worker.wait()
+        self._poll_render()
+        return self._render_current
+
+    def _render_protect(self, func: callable, *args) -> None:
         try:
-            self._render()
-            self._ROoutput._update()
+            func(*args)
         except ValueError as e: # these will throw a ValueError when a field is cleared to nothing
             pass # handled by validation
         except ZeroDivisionError as e: # edge case where width is wider than sheet
@@ -1151,6 +1307,15 @@ class App:
         except Exception as e: # other cases
             IO.InfobarAlert(True, e, f'Unknown Error: {e}')
 
+    def _poll_watcher(self) -> None:
+        while True:
+            try:
+                self._watch_events.get_nowait()()
+            except queue.Empty:
+                break
+
+        self._watch_poll_last = self.root.after(self.watch_poll, self._poll_watcher)
+
     def _entry_protect(self, func: callable, *args, **kwargs) -> None:
         if 'entry' not in str(self.root.focus_get()):
             func(*args, **kwargs)
@@ -1178,31 +1343,43 @@ class App:
         if path:
             self._Bsub.state(('disabled',))
             self._Bsub_clear.state(('!disabled',))
-            self.root.after(1000, self._refresh_sheet)
+
+            self._sub_sheet_path = path
+            try:
+                self._watcher.subscribe(path, lambda _: self._watch_events.put(self._refresh_sheet), lambda _: self._watch_events.put(self._lose_sheet))
+            except OSError as e: # folder can't be watched
+                self._lose_sheet(e)
+                return
+            self._refresh_sheet() # picks up changes from before subscribing
 
     def _refresh_sheet(self) -> None:
-        path = self._Vsheet_name.get()
+        path = self._sub_sheet_path
+        if not path: # unsubscribed before the change got here
+            return
 
         try:
-            mtime = os.path.getmtime(path)
+            loaded = IO.load_sheet(path)
         except OSError as e: # if file stops being available
-            self._unsub_sheet()
-            IO.InfobarAlert(True, e, f'Subscription to {path} lost.')
+            self._lose_sheet(e)
             return
 
-        if self._sub_sheet_mtime != mtime:
-            self._sub_sheet_mtime = mtime
+        self._Vsheet.set(loaded[0])
+        self._Vsheet_name.set(loaded[1]) # in case of size change
 
-            loaded = IO.load_sheet(path)
-            self._Vsheet.set(loaded[0])
-            self._Vsheet_name.set(loaded[1]) # in case of size change
+    def _lose_sheet(self, exception: Exception = None) -> None:
+        path = self._sub_sheet_path
+        if not path:
+            return
 
-        self._sub_sheet_last = self.root.after(1000, self._refresh_sheet)
+        self._unsub_sheet()
+        IO.InfobarAlert(True, exception, f'Subscription to {path} lost.')
 
     def _unsub_sheet(self) -> None:
         self._Bsub.state(('!disabled',))
         self._Bsub_clear.state(('disabled',))
-        self.root.after_cancel(self._sub_sheet_last)
+
+        self._watcher.unsubscribe(self._sub_sheet_path)
+        self._sub_sheet_path = ''
 
     def _paste_sheet(self) -> None:
         image = ImgGr.grabclipboard()
@@ -1238,35 +1415,47 @@ class App:
         if path:
             self._Bsub_mask.state(('disabled',))
             self._Bsub_mask_clear.state(('!disabled',))
-            self.root.after(1000, self._refresh_mask)
+
+            self._sub_mask_path = path
+            try:
+                self._watcher.subscribe(path, lambda _: self._watch_events.put(self._refresh_mask), lambda _: self._watch_events.put(self._lose_mask))
+            except OSError as e: # folder can't be watched
+                self._lose_mask(e)
+                return
+            self._refresh_mask() # picks up changes from before subscribing
 
     def _refresh_mask(self) -> None:
-        path = self._Vmask_sheet_name.get()
+        path = self._sub_mask_path
+        if not path: # unsubscribed before the change got here
+            return
 
         try:
-            mtime = os.path.getmtime(path)
+            loaded = IO.load_mask(path, self._Vsheet.get())
         except OSError as e: # if file stops being available
-            self._unsub_mask()
-            IO.InfobarAlert(True, e, f'Subscription to {path} lost.')
+            self._lose_mask(e)
             return
 
-        if self._sub_mask_mtime != mtime:
-            self._sub_mask_mtime = mtime
+        self._Vsheet.set(loaded[0])
 
-            loaded = IO.load_mask(path, self._Vsheet.get())
-            self._Vsheet.set(loaded[0])
+    def _lose_mask(self, exception: Exception = None) -> None:
+        path = self._sub_mask_path
+        if not path:
+            return
 
-        self._sub_mask_last = self.root.after(1000, self._refresh_mask)
+        self._unsub_mask()
+        IO.InfobarAlert(True, exception, f'Subscription to {path} lost.')
 
     def _unsub_mask(self) -> None:
         self._Bsub_mask.state(('!disabled',))
         self._Bsub_mask_clear.state(('disabled',))
-        self.root.after_cancel(self._sub_mask_last)
+
+        self._watcher.unsubscribe(self._sub_mask_path)
+        self._sub_mask_path = ''
 
     def _paste_mask(self) -> None:
         image = ImgGr.grabclipboard()
         if image:
-            sheet = Rendering.Sheet(self._Vsheet.get().sheet_image, image)
+            sheet = self._Vsheet.get().with_mask(image)
             self._Vsheet.set(sheet)
             self._Vmask_sheet_name.set('Pasted Mask')
 
@@ -1275,6 +1464,7 @@ class App:
             IO.InfobarAlert(False, None, 'Paste Failed')
 
     def _render(self) -> None:
+        self._render_pending = False
         mode = self._Vmode.get().strip()
         kwargs = {
             'sheet': self._Vsheet.get(),
@@ -1296,10 +1486,16 @@ class App:
             'outline_thickness': int(self._Voutline_thickness.get())
         }
 
-        render = IO.render(mode, **kwargs)
-        self._Vrendered_images.set(render)
+        self._render_worker.submit(mode, **kwargs)
+
+        self.root.after_cancel(self._render_poll_last)
+        self._render_poll_last = self.root.after(self.render_poll, self._poll_render)
 
     def _save(self) -> None:
+        if not self._finish_render():
+            IO.InfobarAlert(False, None, 'Nothing to save, the render failed.')
+            return
+
         mode = self._Vmode.get().strip()
 
         if mode == 'Image' or mode == 'Overview':
@@ -1323,6 +1519,10 @@ class App:
                 IO.InfobarAlert(True, e, f'Couldn\'t save file: {e}')
         
     def _copy(self) -> None:
+        if not self._finish_render():
+            IO.InfobarAlert(False, None, 'Nothing to copy, the render failed.')
+            return
+
         IO.copy(self._Vrendered_images.get())
 
     def _alert(self, alert: IO.InfobarAlert) -> None:
@@ -1335,6 +1535,11 @@ class App:
             self._IBinfo_bar.show_alert(alert)
 
     def _restart(self) -> None:
+        self._render_worker.close()
+        self._SPpreview.close()
+        self._SPpreview_mask.close()
+        self._watcher.close()
+        self.root.after_cancel(self._watch_poll_last)
         self.root.destroy()
         self.__init__()
         self.root.mainloop()
@@ -0,0 +1,196 @@
+import numpy as np
+
+import functools
+
+CHUNK_PIXELS = 1 << 16 # rendered pixels drawn per batch, small batches keep the intermediates in cache
+
+def div255(a: np.ndarray) -> np.ndarray:
+    a = a + 128
+    return ((a >> 8) + a) >> 8
+
+def _paste(base: np.ndarray, image: np.ndarray, mask: np.ndarray, x: int, y: int) -> None:
+    '''
+    pastes image onto base at (x, y) with a mask like Img.paste, parts outside of base are clipped
+
+    base and image are planar (n_tiles, 4, height, width) so the mask broadcasts over whole rows.
+    the blend is done in place on every channel including alpha, uint16 holds the largest intermediate (255 * 255 + 255)
+    '''
+    height, width = mask.shape[1:]
+    base_height, base_width = base.shape[2:]
+
+    x0, y0 = max(x, 0), max(y, 0)
+    x1, y1 = min(x + width, base_width), min(y + height, base_height)
+    if x0 >= x1 or y0 >= y1:
+        return
+
+    rows, columns = slice(y0 - y, y1 - y), slice(x0 - x, x1 - x)
+    region = base[:, :, y0:y1, x0:x1]
+    mask = mask[:, None, rows, columns]
+
+    blended = region * (255 - mask)
+    blended+= image[:, :, rows, columns] * mask
+    blended+= 128 # DIV255 from PIL
+    blended+= blended >> 8
+    blended>>= 8
+    region[...] = blended
+
+def _span(a: np.ndarray, axis: int, start: int, length: int) -> np.ndarray:
+    index = [slice(None)] * a.ndim
+    index[axis] = slice(start, start + length)
+    return a[tuple(index)]
+
+def _box_blur_axis(a: np.ndarray, radius: float, axis: int) -> np.ndarray:
+    '''
+    ImgF.BoxBlur along one axis with the same fixed point math, edges are extended
+    '''
+    whole_radius = int(radius)
+    window_weight = int((1 << 24) / (radius * 2 + 1))
+    edge_weight = ((1 << 24) - (whole_radius * 2 + 1) * window_weight) // 2
+    length = a.shape[axis]
+
+    first = _span(a, axis, 0, 1).repeat(whole_radius + 2, axis = axis) # one extra in front so window sums can subtract from it
+    last = _span(a, axis, length - 1, 1).repeat(whole_radius + 1, axis = axis)
+    padded = np.concatenate((first, a, last), axis = axis)
+    sums = np.cumsum(padded, axis = axis, dtype = np.uint32)
+
+    window = _span(sums, axis, 2 * whole_radius + 2, length) - _span(sums, axis, 1, length)
+    edges = _span(padded, axis, 1, length) + _span(padded, axis, 2 * whole_radius + 3, length)
+
+    window*= window_weight # the sum of all weights is at most 1 << 24 so this fits in uint32 like in PIL
+    edges*= edge_weight
+    window+= edges
+    window+= 1 << 23
+    window>>= 24
+    return window
+
+def box_blur(a: np.ndarray, radius: float) -> np.ndarray:
+    '''
+    a is (..., height, width), matches one ImgF.BoxBlur pass
+    '''
+    return _box_blur_axis(_box_blur_axis(a, radius, -1), radius, -2)
+
+@functools.lru_cache(maxsize = 64)
+def strength_table(shadow_strength: float) -> np.ndarray:
+    '''
+    the shadow alpha mapping from Sprite.render as a lookup table, shared so it shouldn't be changed
+    '''
+    return np.array([255 if int(v * shadow_strength) > 255 else int(v * shadow_strength) for v in range(256)]).clip(0, 255)
+
+def shadow_table(shadow_color: tuple[int, int, int], shadow_strength: float) -> np.ndarray:
+    '''
+    maps a blurred alpha straight to the pixel the shadow paste leaves on the blank (0, 0, 1, 0) background
+    '''
+    mask = strength_table(shadow_strength)[:, None]
+    return div255(np.array((0, 0, 1, 0)) * (255 - mask) + np.array((*shadow_color, 255)) * mask).astype(np.uint16)
+
+def shadow_margin(upscale: int) -> int:
+    '''
+    how many sprite pixels past the alpha's bounding box a shadow reaches, each blur spreads int(radius) + 1 and one more blank pixel
+    keeps the blur's clamped edges blank. Blurring only that area gives the same result as blurring the whole render
+    '''
+    return max(-(-(2 * (upscale // 2 + 1) + 1) // upscale), 1)
+
+def blur_shadows(alphas: np.ndarray, upscale: int, shadow_strength: float) -> np.ndarray:
+    '''
+    alphas is (n_tiles, height, width) sprite alpha, returns the (n_tiles, (height + 2) * upscale, (width + 2) * upscale) uint8 masks the shadow color is
+    pasted through, the same as the blurred alpha with shadow_strength applied in Sprite.render.
+    Only the area the shadows of the whole stack reach is blurred
+    '''
+    count, height, width = alphas.shape
+    masks = np.zeros((count, (height + 2) * upscale, (width + 2) * upscale), np.uint8)
+
+    used_rows, used_columns = alphas.any(axis = (0, 2)), alphas.any(axis = (0, 1))
+    if not used_rows.any():
+        return masks
+
+    # reached area in sprite pixels, counting the 1 pixel border around the sprite
+    margin = shadow_margin(upscale)
+    top, bottom = max(int(used_rows.argmax()) + 1 - margin, 0), min(height + 1 - int(used_rows[::-1].argmax()) + margin, height + 2)
+    left, right = max(int(used_columns.argmax()) + 1 - margin, 0), min(width + 1 - int(used_columns[::-1].argmax()) + margin, width + 2)
+
+    padded = np.zeros((count, height + 2, width + 2), np.uint32)
+    padded[:, 1:-1, 1:-1] = alphas
+    table = strength_table(shadow_strength).astype(np.uint8)
+
+    step = max(1, CHUNK_PIXELS // ((bottom - top) * (right - left) * upscale * upscale))
+    for start in range(0, count, step):
+        # rows only repeat before the first vertical pass, so the first horizontal pass can run on the unscaled rows
+        blurred = _box_blur_axis(padded[start:start + step, top:bottom, left:right].repeat(upscale, axis = 2), upscale / 2, -1).repeat(upscale, axis = 1)
+        blurred = _box_blur_axis(blurred, upscale / 2, -2)
+        blurred = box_blur(blurred, upscale / 2)
+        masks[start:start + step, top * upscale:bottom * upscale, left * upscale:right * upscale] = np.take(table, blurred)
+
+    return masks
+
+def _render_chunk(sprites: np.ndarray, shadow_masks: np.ndarray, upscale: int, shadow: bool, outline: bool, shadow_color: tuple[int, int, int], outline_color: tuple[int, int, int], outline_thickness: int) -> np.ndarray:
+    sized = sprites.transpose(0, 3, 1, 2).repeat(upscale, axis = 2).repeat(upscale, axis = 3).astype(np.uint16) # planar, NEAREST resize by a whole factor
+    alpha = sized[:, 3]
+    count, height, width = alpha.shape
+
+    base = np.empty((count, 4, height + 2 * upscale, width + 2 * upscale), np.uint16) # uint16 is enough for the paste blend
+
+    if shadow:
+        table = shadow_table(shadow_color, 1.0) # the masks already have the strength applied
+        for channel in range(4):
+            base[:, channel] = np.take(table[:, channel], shadow_masks)
+    else:
+        base[:] = np.array((0, 0, 1, 0), np.uint16)[:, None, None] # same background as the PIL path
+
+    if outline:
+        silhouette = np.empty(sized.shape, np.uint16)
+        silhouette[:, :3] = np.array(outline_color, np.uint16)[:, None, None]
+        silhouette[:, 3] = alpha
+
+        if outline_thickness:
+            offset = outline_thickness
+        else:
+            offset = upscale // 5 + 1
+        for i in (-1 * offset, offset):
+            for j in (-1 * offset, offset):
+                _paste(base, silhouette, alpha, upscale + i, upscale + j)
+
+    _paste(base, sized, alpha, upscale, upscale)
+
+    return base.transpose(0, 2, 3, 1).astype(np.uint8)
+
+def _render_native_chunk(sprites: np.ndarray, shadow_masks: np.ndarray, upscale: int, shadow: bool, outline: bool, shadow_color: tuple[int, int, int], outline_color: tuple[int, int, int], native_thickness: int) -> np.ndarray:
+    '''
+    _render_chunk for sprites with binary alpha, drawn at their own size and upscaled once. Pastes only replace pixels
+    so every drawn pixel is opaque and goes straight over the shadow
+    '''
+    drawn = _render_chunk(sprites, None, 1, False, outline, shadow_color, outline_color, native_thickness)
+    sized = drawn.repeat(upscale, axis = 1).repeat(upscale, axis = 2)
+    if not shadow:
+        return sized
+
+    pixels = np.ascontiguousarray(shadow_table(shadow_color, 1.0).astype(np.uint8)).view(np.uint32)[:, 0] # whole rgba pixels so one lookup fills all channels
+    drawn = np.take(pixels, shadow_masks)
+    np.copyto(drawn, sized.view(np.uint32)[..., 0], where = sized[..., 3] != 0)
+    return drawn.view(np.uint8).reshape(sized.shape)
+
+def render_sprites(sprites: np.ndarray, upscale: int, shadow: bool, outline: bool, shadow_color: tuple[int, int, int], shadow_strength: float, outline_color: tuple[int, int, int], outline_thickness: int,
+                   shadow_masks: np.ndarray = None, native_thickness: int = None) -> np.ndarray:
+    '''
+    sprites is a (n_tiles, height, width, 4) RGBA array, returns (n_tiles, (height + 2) * upscale, (width + 2) * upscale, 4)
+    shadow_masks are the sprites' masks from blur_shadows if they're already known. With a native_thickness (the outline's
+    thickness in sprite pixels) chunks where every sprite has binary alpha are drawn at the sprites' size
+
+    pixel identical to Sprite.render, tiles are drawn in chunks to bound memory
+    '''
+    count, height, width, _ = sprites.shape
+    rendered = np.empty((count, (height + 2) * upscale, (width + 2) * upscale, 4), np.uint8)
+
+    if shadow and shadow_masks is None:
+        shadow_masks = blur_shadows(sprites[..., 3], upscale, shadow_strength)
+
+    step = max(1, CHUNK_PIXELS // (rendered.shape[1] * rendered.shape[2]))
+    for start in range(0, count, step):
+        chunk = sprites[start:start + step]
+        chunk_masks = shadow_masks[start:start + step] if shadow else None
+
+        if native_thickness is not None and ((chunk[..., 3] == 0) | (chunk[..., 3] == 255)).all():
+            rendered[start:start + step] = _render_native_chunk(chunk, chunk_masks, upscale, shadow, outline, shadow_color, outline_color, native_thickness)
+        else:
+            rendered[start:start + step] = _render_chunk(chunk, chunk_masks, upscale, shadow, outline, shadow_color, outline_color, outline_thickness)
+
+    return rendered
@@ -0,0 +1,273 @@
+import PIL.Image as Img
+
+import ctypes, ctypes.util, os, os.path, select, struct, sys, threading, time
+
+# inotify flags from <sys/inotify.h>
+IN_MODIFY = 0x2
+IN_CLOSE_WRITE = 0x8
+IN_MOVED_FROM = 0x40
+IN_MOVED_TO = 0x80
+IN_CREATE = 0x100
+IN_DELETE = 0x200
+IN_IGNORED = 0x8000
+IN_NONBLOCK = os.O_NONBLOCK if hasattr(os, 'O_NONBLOCK') else 0
+IN_CLOEXEC = 0o2000000
+WATCH_MASK = IN_MODIFY | IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE # directories are watched so files replaced by a rename are still seen
+EVENT_HEADER = struct.Struct('iIII') # wd, mask, cookie, name length
+
+class _Inotify:
+    '''
+    inotify watches on directories through libc, only made on linux
+    '''
+    def __init__(self):
+        self._libc = ctypes.CDLL(ctypes.util.find_library('c'), use_errno = True)
+        self.fd = self._libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), 'inotify_init1 failed')
+
+        self._directories = {} # watch descriptor: directory
+
+    @staticmethod
+    def available() -> bool:
+        return sys.platform.startswith('linux') and bool(ctypes.util.find_library('c'))
+
+    def add(self, directory: str) -> None:
+        wd = self._libc.inotify_add_watch(self.fd, os.fsencode(directory), WATCH_MASK)
+        if wd < 0:
+            raise OSError(ctypes.get_errno(), f'Couldn\'t watch {directory}')
+        self._directories[wd] = directory
+
+    def remove(self, directory: str) -> None:
+        for wd, watched in list(self._directories.items()):
+            if watched == directory:
+                self._libc.inotify_rm_watch(self.fd, wd)
+                del self._directories[wd]
+
+    def read(self) -> list[str]:
+        '''
+        paths that had events, a directory's path if its watch went away
+        '''
+        try:
+            data = os.read(self.fd, 64 * 1024)
+        except BlockingIOError:
+            return []
+
+        paths = []
+        offset = 0
+        while offset < len(data):
+            wd, mask, _, length = EVENT_HEADER.unpack_from(data, offset)
+            name = data[offset + EVENT_HEADER.size:offset + EVENT_HEADER.size + length].rstrip(b'\0')
+            offset+= EVENT_HEADER.size + length
+
+            directory = self._directories.get(wd)
+            if directory is None:
+                continue
+            if mask & IN_IGNORED:
+                del self._directories[wd]
+                paths.append(directory)
+            elif name:
+                paths.append(os.path.join(directory, os.fsdecode(name)))
+
+        return paths
+
+    def close(self) -> None:
+        os.close(self.fd)
+
+class _Subscription:
+    def __init__(self, on_change: callable, on_lost: callable, stat: tuple[int, int]):
+        self.on_change = on_change
+        self.on_lost = on_lost
+        self.reported = stat # stat the last change was reported at
+        self.checked = stat # stat at the last check, a file is only complete once this stops changing
+        self.due = None # time the file is next checked, None if nothing is pending
+        self.missing_since = None
+
+def _stat(path: str) -> tuple[int, int]:
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return (stat.st_mtime_ns, stat.st_size)
+
+def _complete(path: str) -> bool:
+    '''
+    if the image can be read through, a file that's still being written fails
+    '''
+    try:
+        with Img.open(path) as image:
+            image.verify()
+    except Exception:
+        return False
+    return True
+
+class Watcher:
+    '''
+    watches files for changes on one thread, with inotify on linux and by polling mtimes elsewhere.
+    Bursts of events are debounced and a change is only reported once the file stops changing and reads as a whole image.
+
+    callbacks are called on the watcher's thread
+    '''
+    debounce = 0.2 # seconds without events before a file is checked
+    settle = 0.1 # seconds a file's size and mtime have to stay the same for
+    poll_interval = 1.0 # seconds between mtime checks without inotify
+    lost_after = 2.0 # seconds a file can be missing for before it's lost, saving by replacing the file removes it for a moment
+
+    def __init__(self, use_inotify: bool = True):
+        self._lock = threading.Lock()
+        self._subscriptions = {} # path: _Subscription
+        self._closed = False
+
+        self._inotify = None
+        if use_inotify and _Inotify.available():
+            try:
+                self._inotify = _Inotify()
+            except OSError: # out of instances, falls back to polling
+                self._inotify = None
+
+        if self._inotify:
+            self._wake_read, self._wake_write = os.pipe()
+        else:
+            self._wake = threading.Event()
+
+        self._thread = threading.Thread(target = self._run, daemon = True)
+        self._thread.start()
+
+    @property
+    def uses_inotify(self) -> bool:
+        return self._inotify is not None
+
+    def subscribe(self, path: str, on_change: callable, on_lost: callable = None) -> None:
+        '''
+        on_change(path) is called after the file changes, on_lost(path) once it has been missing for lost_after and the subscription is dropped
+        '''
+        path = os.path.abspath(path)
+        directory = os.path.dirname(path)
+
+        with self._lock:
+            if self._inotify and not any(os.path.dirname(watched) == directory for watched in self._subscriptions):
+                self._inotify.add(directory)
+            self._subscriptions[path] = _Subscription(on_change, on_lost, _stat(path))
+
+        self._wake_up()
+
+    def unsubscribe(self, path: str) -> None:
+        path = os.path.abspath(path)
+
+        with self._lock:
+            self._drop(path)
+
+    def close(self) -> None:
+        with self._lock:
+            self._closed = True
+        self._wake_up()
+
+    def _drop(self, path: str) -> None:
+        if self._subscriptions.pop(path, None) is None:
+            return
+
+        directory = os.path.dirname(path)
+        if self._inotify and not any(os.path.dirname(watched) == directory for watched in self._subscriptions):
+            self._inotify.remove(directory)
+
+    def _wake_up(self) -> None:
+        if self._inotify:
+            os.write(self._wake_write, b'\0')
+        else:
+            self._wake.set()
+
+    def _mark(self, path: str, now: float) -> None:
+        subscription = self._subscriptions.get(path)
+        if subscription:
+            subscription.due = now + self.debounce # restarts on every event so bursts are checked once
+            return
+
+        for watched, subscription in self._subscriptions.items(): # a directory's watch went away
+            if os.path.dirname(watched) == path:
+                subscription.due = now + self.debounce
+
+    def _wait(self, timeout: float) -> None:
+        if self._inotify:
+            readable = select.select([self._inotify.fd, self._wake_read], [], [], timeout)[0]
+            if self._wake_read in readable:
+                os.read(self._wake_read, 1024)
+            if self._inotify.fd in readable:
+                paths = self._inotify.read()
+                now = time.monotonic()
+                with self._lock:
+                    for path in paths:
+                        self._mark(path, now)
+        else:
+            self._wake.wait(timeout)
+            self._wake.clear()
+
+    def _poll(self, now: float) -> None:
+        for path, subscription in self._subscriptions.items():
+            if subscription.due is None and _stat(path) != subscription.reported:
+                subscription.due = now
+
+    def _check(self, path: str, subscription: _Subscription, now: float) -> callable:
+        '''
+        returns the callback to call if there is one
+        '''
+        stat = _stat(path)
+
+        if stat is None:
+            subscription.missing_since = subscription.missing_since or now
+            if now - subscription.missing_since >= self.lost_after:
+                self._drop(path)
+                return subscription.on_lost
+            subscription.due = now + self.debounce
+            return None
+        subscription.missing_since = None
+
+        if stat != subscription.checked: # still being written
+            subscription.checked = stat
+            subscription.due = now + self.settle
+            return None
+
+        if stat == subscription.reported: # events that didn't change anything
+            subscription.due = None
+            return None
+
+        if not _complete(path):
+            subscription.due = now + self.debounce
+            return None
+
+        subscription.reported = stat
+        subscription.due = None
+        return subscription.on_change
+
+    def _run(self) -> None:
+        next_poll = time.monotonic() + self.poll_interval
+
+        while True:
+            now = time.monotonic()
+            with self._lock:
+                if self._closed:
+                    break
+
+                if not self._inotify and now >= next_poll:
+                    self._poll(now)
+                    next_poll = now + self.poll_interval
+
+                callbacks = []
+                for path, subscription in list(self._subscriptions.items()):
+                    if subscription.due is not None and subscription.due <= now:
+                        callback = self._check(path, subscription, now)
+                        if callback:
+                            callbacks.append((callback, path))
+
+                dues = [subscription.due for subscription in self._subscriptions.values() if subscription.due is not None]
+
+            for callback, path in callbacks: # outside the lock so callbacks can subscribe
+                callback(path)
+
+            timeout = min(dues) - time.monotonic() if dues else None
+            if not self._inotify:
+                timeout = min(timeout, next_poll - time.monotonic()) if timeout is not None else next_poll - time.monotonic()
+            self._wait(max(timeout, 0) if timeout is not None else None)
+
+        if self._inotify:
+            self._inotify.close()
+            os.close(self._wake_read)
+            os.close(self._wake_write)
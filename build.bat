@@ -23,7 +23,7 @@ md "%cd%\dist\bin"
 copy "%cd%\bin\config.json" "%cd%\dist\bin\config.json"
 copy "%cd%\bin\error.log" "%cd%\dist\bin\error.log"
 copy "%cd%\bin\favicon.ico" "%cd%\dist\bin\favicon.ico"
-copy "%cd%\bin\images.pickle" "%cd%\dist\bin\images.pickle"
+copy "%cd%\bin\assets.bundle" "%cd%\dist\bin\assets.bundle"
 copy "%cd%\README.md" "%cd%\dist\README.md"
 
 rem Adding default dirs...
@@ -0,0 +1,17 @@
+import os, sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pytest
+
+from bin.modules import Rendering
+
+@pytest.fixture(autouse = True)
+def no_caches():
+    '''
+    cached renders and shadows would hide differences between the paths being compared
+    '''
+    render_bytes, shadow_bytes = Rendering.render_cache.max_bytes, Rendering.shadow_cache.max_bytes
+    Rendering.render_cache.max_bytes = Rendering.shadow_cache.max_bytes = 0
+    yield
+    Rendering.render_cache.max_bytes, Rendering.shadow_cache.max_bytes = render_bytes, shadow_bytes
@@ -0,0 +1,145 @@
+'''
+the render pipeline as it was before it was optimized, kept as the reference the faster paths have to match pixel for pixel
+'''
+
+import PIL.Image as Img
+import PIL.ImageFilter as ImgF
+import numpy as np
+
+class Sprite:
+    def __init__(self, image: Img.Image):
+        self.image = image
+        self.size = image.size
+
+    def _silhouette(self, color: tuple[int, int, int]) -> Img.Image:
+        mask = self.image.getchannel('A')
+        silhouette = Img.new('RGBA', self.image.size, (*color, 0))
+        silhouette.paste(Img.new('RGBA', self.image.size, (*color, 255)), mask = mask)
+
+        return silhouette
+
+    def render(self, upscale: int, shadow: bool, outline: bool, shadow_color: tuple[int, int, int], shadow_strength: float, outline_color: tuple[int, int, int], outline_thickness: int) -> Img.Image:
+        width, height = self.image.size
+
+        base_image = Img.new('RGBA', ((width + 2) * upscale, (height + 2) * upscale), (0, 0, 1, 0))
+
+        if shadow:
+            shadow_base_image = Img.new('RGBA', ((width + 2) * upscale, (height + 2) * upscale), (*shadow_color, 0))
+
+            shadow_silhouette = self._silhouette(shadow_color).resize((width * upscale, height * upscale), resample = Img.NEAREST)
+            shadow_base_image.paste(shadow_silhouette, (upscale, upscale))
+
+            shadow_base_image = shadow_base_image.filter(ImgF.BoxBlur(radius = upscale / 2)).filter(ImgF.BoxBlur(radius = upscale / 2))
+            shadow_strength_mask = shadow_base_image.getchannel('A').point(lambda v: 255 if int(v * shadow_strength) > 255 else int(v * shadow_strength), 'L')
+            base_image.paste(Img.new('RGBA', shadow_base_image.size, (*shadow_color, 255)), mask = shadow_strength_mask)
+
+        if outline:
+            outline_silhouette = self._silhouette(outline_color).resize((width * upscale, height * upscale), resample = Img.NEAREST)
+
+            if outline_thickness:
+                offset = outline_thickness
+            else:
+                offset = upscale // 5 + 1
+            for i in (-1 * offset, offset):
+                for j in (-1 * offset, offset):
+                    base_image.paste(outline_silhouette, (upscale + i, upscale + j), outline_silhouette)
+
+        sized_image = self.image.resize((width * upscale, height * upscale), resample = Img.NEAREST)
+
+        base_image.paste(sized_image, (upscale, upscale), sized_image.getchannel('A'))
+
+        return base_image
+
+class Mask:
+    def __init__(self, mask_image: Img.Image, clothing_texture: Img.Image, accessory_texture: Img.Image):
+        self.mask_image = mask_image
+        self.size = mask_image.size
+
+        self.clothing_texture = clothing_texture
+        self.accessory_texture = accessory_texture
+
+    def _silhouette(self) -> Img.Image:
+        mask = self.mask_image.getchannel('A')
+        silhouette = self.mask_image.copy()
+        silhouette.paste(Img.new('RGBA', self.mask_image.size, (0, 0, 0, 255)), mask = mask)
+
+        return silhouette
+
+    def render(self, upscale: int) -> Img.Image:
+        width, height = self.size
+        temp_size = (width * 5, height * 5)
+
+        base_image = Img.new('RGBA', ((width + 2) * 5, (height + 2) * 5), (0, 0, 1, 0))
+        clothing_texture_fill = Img.new('RGBA', temp_size, (0, 0, 0, 0))
+        accessory_texture_fill = clothing_texture_fill.copy()
+
+        upsized_sillhouette = self._silhouette().resize(temp_size, resample = Img.NEAREST)
+
+        upsized_clothing_mask = self.mask_image.getchannel('R').resize(temp_size, resample = Img.NEAREST)
+        for x in range(0, upsized_sillhouette.width, self.clothing_texture.size[0]):
+            for y in range(0, upsized_sillhouette.height, self.clothing_texture.size[1]):
+                clothing_texture_fill.paste(self.clothing_texture, (x, y))
+
+        upsized_accessory_mask = self.mask_image.getchannel('G').resize(temp_size, resample = Img.NEAREST)
+        for x in range(0, upsized_sillhouette.width, self.accessory_texture.size[0]):
+            for y in range(0, upsized_sillhouette.height, self.accessory_texture.size[1]):
+                accessory_texture_fill.paste(self.accessory_texture, (x, y))
+
+        upsized_sillhouette.paste(clothing_texture_fill, mask = upsized_clothing_mask)
+        upsized_sillhouette.paste(accessory_texture_fill, mask = upsized_accessory_mask)
+
+        base_image.paste(upsized_sillhouette, (5, 5))
+        base_image = base_image.resize(((width + 2) * upscale, (height + 2) * upscale), resample = Img.NEAREST)
+
+        return base_image
+
+def render(sprite: Sprite, mask: Mask, upscale: int, shadow: bool, outline: bool, has_mask: bool,
+           shadow_color: tuple[int, int, int], outline_color: tuple[int, int, int], shadow_strength: float, outline_thickness: int) -> Img.Image:
+    rendered_sprite = sprite.render(upscale, shadow, outline, shadow_color, shadow_strength, outline_color, outline_thickness)
+
+    if has_mask:
+        rendered_mask = mask.render(upscale)
+        rendered_sprite.paste(rendered_mask, mask = rendered_mask.getchannel('A'))
+
+    return rendered_sprite
+
+def tiles(size: int = 8, seed: int = 0) -> dict[str, tuple[np.ndarray, np.ndarray]]:
+    '''
+    (sprite, mask) RGBA arrays covering the cases the fast paths special case: binary and blended alpha, sprites touching
+    the tile's edges, a lone pixel, a blank tile and a mask with color but no alpha
+    '''
+    rng = np.random.default_rng(seed)
+    y, x = np.mgrid[0:size, 0:size]
+
+    def sprite(inside: np.ndarray, alpha: np.ndarray = None) -> np.ndarray:
+        pixels = rng.integers(0, 256, (size, size, 4), np.uint8)
+        pixels[..., 3] = np.where(inside, 255 if alpha is None else alpha, 0)
+        return pixels
+
+    def mask(inside: np.ndarray, alpha: bool = True) -> np.ndarray:
+        pixels = np.zeros((size, size, 4), np.uint8)
+        pixels[..., 0] = np.where(inside & (y < size // 2), rng.integers(1, 256, (size, size)), 0)
+        pixels[..., 1] = np.where(inside & (y >= size // 2), 255, 0)
+        if alpha:
+            pixels[..., 3] = np.where(inside & (x % 3 == 0), 255, 0)
+        return pixels
+
+    blob = (x - size / 2 + 0.5) ** 2 + (y - size / 2 + 0.5) ** 2 <= (size / 3) ** 2
+    full = np.ones((size, size), bool)
+    corner = (x < 2) & (y < 2)
+    pixel = (x == size - 1) & (y == 0)
+    blank = np.zeros((size, size), bool)
+
+    return {
+        'blob': (sprite(blob), mask(blob)),
+        'full': (sprite(full), mask(full)),
+        'corner': (sprite(corner), mask(corner)),
+        'pixel': (sprite(pixel), mask(pixel)),
+        'blended': (sprite(blob, rng.integers(1, 256, (size, size))), mask(blob)),
+        'blank': (sprite(blank), mask(blank)),
+        'mask without alpha': (sprite(blob), mask(blob, alpha = False)),
+    }
+
+def textures(seed: int = 0) -> tuple[Img.Image, Img.Image]:
+    rng = np.random.default_rng(seed)
+    return Img.fromarray(rng.integers(0, 256, (10, 10, 4), np.uint8)), Img.fromarray(rng.integers(0, 256, (7, 13, 4), np.uint8))
@@ -0,0 +1,27 @@
+'''
+the app's bundle has to unpack to PNGs and pack back to the same images
+'''
+
+import os
+
+from bin.modules import Assets
+
+BUNDLE = os.path.join(os.path.dirname(__file__), '..', 'bin', 'assets.bundle')
+
+def test_round_trip(tmp_path):
+    Assets.unpack(BUNDLE, tmp_path / 'images')
+    assert Assets.main(['pack', str(tmp_path / 'images'), '-b', str(tmp_path / 'assets.bundle')]) == 0
+
+    original, packed = Assets.Bundle(BUNDLE), Assets.Bundle(tmp_path / 'assets.bundle')
+    assert sorted(packed.groups()) == sorted(original.groups())
+    for group in original.groups():
+        images = packed.group(group)
+        assert list(images) == list(original.group(group)) if group.startswith('textiles/') else sorted(images) == sorted(original.group(group))
+        for name, image in original.group(group).items():
+            assert images[name].size == image.size and images[name].tobytes() == image.tobytes(), (group, name)
+
+    assert list(packed.textiles()) == list(original.textiles())
+
+def test_empty_directory(tmp_path):
+    assert Assets.main(['pack', str(tmp_path), '-b', str(tmp_path / 'assets.bundle')]) == 1
+    assert not (tmp_path / 'assets.bundle').exists()
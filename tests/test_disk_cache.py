@@ -0,0 +1,42 @@
+'''
+equivalent render calls have to share disk cache entries, and different renders can't
+'''
+
+import PIL.Image as Img
+import numpy as np
+
+from bin.modules import IO, Rendering, DiskCache
+
+SHEET = Rendering.Sheet(Img.fromarray(np.random.default_rng(0).integers(0, 256, (32, 32, 4), np.uint8)))
+TEXTURES = (Img.new('RGBA', (10, 10), (255, 0, 0, 255)), Img.new('RGBA', (10, 10), (0, 255, 0, 255)))
+
+def key(*args, mode: str = 'Image', **kwargs) -> str:
+    return DiskCache.key(mode, IO._arguments(args, kwargs))
+
+def ui(mode: str = 'Image', **changes) -> str:
+    '''
+    a render passed the way the app passes it
+    '''
+    kwargs = {'sheet': SHEET, 'index': '0', 'length': 0, 'width': 8, 'height': 8, 'upscale': 5, 'shadow': True, 'shadow_color': (0, 0, 0),
+              'outline': True, 'outline_color': (0, 0, 0), 'has_bg': False, 'bg_color': '#000000', 'has_mask': False,
+              'clothing_texture': TEXTURES[0], 'accessory_texture': TEXTURES[1], 'shadow_strength': 1.0, 'outline_thickness': 0}
+    kwargs.update(changes)
+    return key(mode = mode, **kwargs)
+
+def test_equivalent_settings():
+    assert ui() == key(SHEET, '0', 0, 8, 8, 5, True, True, [0, 0, 0], [0, 0, 0], clothing_texture = TEXTURES[0], accessory_texture = TEXTURES[1])
+    assert ui() == ui(shadow_color = '#000000', outline_color = 'black', shadow_strength = 1, outline_thickness = None)
+    assert ui() == ui(index = '0x0', width = 8.0, shadow = np.bool_(True))
+    assert ui(index = '0x10') == ui(index = '16')
+    assert ui(has_bg = True, bg_color = '#102030') == ui(has_bg = True, bg_color = (16, 32, 48, 255))
+
+def test_unused_settings():
+    assert ui() == ui(bg_color = '#ffffff', clothing_texture = Img.new('RGBA', (3, 3)))
+    assert ui(shadow = False) == ui(shadow = False, shadow_color = (9, 9, 9), shadow_strength = 0.3)
+    assert ui(outline = False) == ui(outline = False, outline_color = (9, 9, 9), outline_thickness = 3)
+
+def test_different_renders():
+    keys = [ui(), ui(index = '1'), ui(upscale = 6), ui(shadow_color = (0, 0, 1)), ui(shadow_strength = 0.7), ui(outline_thickness = 2),
+            ui(has_bg = True), ui(has_mask = True), ui(has_mask = True, clothing_texture = Img.new('RGBA', (10, 10)))]
+    assert len(set(keys)) == len(keys)
+    assert ui() != ui('Entity')
@@ -0,0 +1,66 @@
+'''
+Rendering.render with native compositing has to give the same pixels as drawing at full size and as the original pipeline
+'''
+
+import itertools
+
+import PIL.Image as Img
+import pytest
+
+from bin.modules import Rendering
+
+import reference
+
+UPSCALES = (1, 2, 3, 4, 5, 6, 10)
+COLORS = (((0, 0, 0), (0, 0, 0)), ((10, 200, 30), (250, 5, 120)))
+TILES = reference.tiles()
+TEXTURES = reference.textures()
+
+def thicknesses(upscale: int) -> tuple[int, ...]:
+    '''
+    0 (the default offset, which only lands on whole sprite pixels at upscale 1), whole sprite pixels and in between
+    '''
+    return tuple(sorted({0, 1, upscale - 1, upscale, upscale + 1, upscale * 2} - {-1}))
+
+def render(native: bool, sprite, mask, *args) -> Img.Image:
+    Rendering.native_compositing = native
+    try:
+        return Rendering.render(Rendering.Sprite(sprite), Rendering.Mask(mask, *TEXTURES), *args)
+    finally:
+        Rendering.native_compositing = True
+
+@pytest.mark.parametrize('upscale', UPSCALES)
+@pytest.mark.parametrize('tile', sorted(TILES))
+def test_native_matches_full_size(tile: str, upscale: int):
+    sprite, mask = TILES[tile]
+
+    for outline_thickness, shadow, outline, has_mask, (shadow_color, outline_color) in itertools.product(
+            thicknesses(upscale), (True, False), (True, False), (True, False), COLORS):
+        args = (upscale, shadow, outline, has_mask, shadow_color, outline_color, 0.7, outline_thickness)
+
+        expected = render(False, sprite, mask, *args)
+        rendered = render(True, sprite, mask, *args)
+        assert rendered.size == expected.size
+        assert rendered.tobytes() == expected.tobytes(), args
+
+        original = reference.render(reference.Sprite(Img.fromarray(sprite)), reference.Mask(Img.fromarray(mask), *TEXTURES), *args)
+        assert rendered.tobytes() == original.tobytes(), args
+
+@pytest.mark.parametrize('upscale', UPSCALES)
+def test_native_thickness_gate(upscale: int):
+    '''
+    the native path is only taken where the outline offset is a whole number of sprite pixels
+    '''
+    Rendering.native_compositing = True
+    assert Rendering._native_thickness(upscale, False, 3) == (0 if upscale > 1 else None)
+
+    for outline_thickness in thicknesses(upscale):
+        offset = outline_thickness or upscale // 5 + 1
+        expected = offset // upscale if upscale > 1 and offset % upscale == 0 else None
+        assert Rendering._native_thickness(upscale, True, outline_thickness) == expected
+
+    Rendering.native_compositing = False
+    try:
+        assert Rendering._native_thickness(upscale, True, upscale) is None
+    finally:
+        Rendering.native_compositing = True
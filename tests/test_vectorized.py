@@ -0,0 +1,104 @@
+'''
+the vectorized engine has to give the same pixels as the PIL path and the original pipeline
+'''
+
+import itertools
+
+import PIL.Image as Img
+import PIL.ImageFilter as ImgF
+import numpy as np
+import pytest
+
+from bin.modules import Rendering, Vectorized, IO
+
+import reference
+
+UPSCALES = (1, 2, 3, 5, 6, 10)
+STRENGTHS = (0.0, 0.35, 0.7, 1.0, 2.5)
+TILES = reference.tiles()
+TEXTURES = reference.textures()
+
+def pil_render(sprite: np.ndarray, *args) -> Img.Image:
+    Rendering.native_compositing = False
+    try:
+        return Rendering.Sprite(sprite).render(*args)
+    finally:
+        Rendering.native_compositing = True
+
+def test_div255():
+    values = np.arange(255 * 255 + 1)
+    assert (Vectorized.div255(values) == (values + 128 + ((values + 128) >> 8)) >> 8).all() # PIL's DIV255
+    assert (Vectorized.div255(values) == np.round(values / 255)).all()
+
+@pytest.mark.parametrize('radius', (0.5, 1, 1.5, 2.5, 3, 5))
+def test_box_blur(radius: float):
+    rng = np.random.default_rng(0)
+    alpha = rng.integers(0, 256, (23, 17), np.uint8)
+    alpha[:, :5] = 0
+
+    expected = np.asarray(Img.fromarray(alpha).filter(ImgF.BoxBlur(radius)))
+    assert (Vectorized.box_blur(alpha.astype(np.uint32), radius) == expected).all()
+
+@pytest.mark.parametrize('upscale', UPSCALES)
+@pytest.mark.parametrize('shadow_strength', STRENGTHS)
+def test_shadows(upscale: int, shadow_strength: float):
+    stack = np.stack([sprite for sprite, _ in TILES.values()])
+    masks = Vectorized.blur_shadows(stack[..., 3], upscale, shadow_strength)
+
+    for i, sprite in enumerate(stack):
+        expected = reference.Sprite(Img.fromarray(sprite)).render(upscale, True, False, (0, 0, 0), shadow_strength, (0, 0, 0), 0)
+        shadow = np.asarray(Rendering.shadow_mask(Img.fromarray(sprite).getchannel('A'), upscale, shadow_strength))
+        assert (masks[i] == shadow).all()
+        assert (Vectorized.render_sprites(stack[i:i + 1], upscale, True, False, (0, 0, 0), shadow_strength, (0, 0, 0), 0)[0]
+                == np.asarray(expected)).all()
+
+@pytest.mark.parametrize('upscale', UPSCALES)
+@pytest.mark.parametrize('native', (False, True))
+def test_render_sprites(upscale: int, native: bool):
+    names = sorted(TILES)
+    stack = np.stack([TILES[name][0] for name in names])
+
+    for outline_thickness, shadow, outline, shadow_strength, colors in itertools.product(
+            sorted({0, 1, upscale, upscale + 1}), (True, False), (True, False), (0.7, 2.5), (((0, 0, 0), (0, 0, 0)), ((10, 200, 30), (250, 5, 120)))):
+        args = (upscale, shadow, outline, colors[0], shadow_strength, colors[1], outline_thickness)
+        native_thickness = Rendering._native_thickness(upscale, outline, outline_thickness) if native else None
+
+        drawn = Vectorized.render_sprites(stack, *args, native_thickness = native_thickness)
+        for name, sprite, rendered in zip(names, stack, drawn):
+            expected = pil_render(sprite, *args)
+            assert rendered.shape == (expected.size[1], expected.size[0], 4)
+            assert rendered.tobytes() == expected.tobytes(), (name, args)
+
+            assert rendered.tobytes() == reference.Sprite(Img.fromarray(sprite)).render(*args).tobytes(), (name, args)
+
+@pytest.mark.parametrize('upscale', (1, 3, 5))
+@pytest.mark.parametrize('has_mask', (False, True))
+def test_render_many_sheet(upscale: int, has_mask: bool):
+    '''
+    every tile of a sheet whose size isn't a whole number of tiles, so the last row and column are partial, plus tiles past its end
+    '''
+    rng = np.random.default_rng(1)
+    pixels = rng.integers(0, 256, (27, 21, 4), np.uint8)
+    pixels[..., 3] = np.where(rng.random((27, 21)) > 0.5, 255, 0)
+    pixels[8:16, 8:16, 3] = 0 # a blank tile
+    mask = np.zeros(pixels.shape, np.uint8)
+    mask[..., :2] = rng.integers(0, 256, (27, 21, 2)) * (rng.random((27, 21, 1)) > 0.6)
+    mask[..., 3] = np.where(rng.random((27, 21)) > 0.7, 255, 0)
+
+    sheet = Rendering.Sheet(Img.fromarray(pixels), Img.fromarray(mask) if has_mask else None)
+    assert sheet.grid(8, 8).shape == (3, 2, 8, 8, 4)
+    pairs = list(zip(*IO.load_pairs(sheet, range(10), 8, 8, *TEXTURES)))
+    for index, (sprite, mask) in enumerate(pairs): # grid views and cropped tiles are the same pixels
+        cropped_sprite, cropped_mask = IO.load_pair(sheet, index, 8, 8, *TEXTURES)
+        assert (sprite.array == cropped_sprite.array).all() and (mask.array == cropped_mask.array).all()
+        assert sprite.bbox == cropped_sprite.bbox and mask.bbox == cropped_mask.bbox
+
+    for outline_thickness, shadow, outline in itertools.product((0, upscale), (True, False), (True, False)):
+        args = (upscale, shadow, outline, has_mask, (10, 20, 30), (200, 100, 50), 0.7, outline_thickness)
+        drawn = Rendering.render_many([sprite for sprite, _ in pairs], [mask for _, mask in pairs], *args)
+
+        for index, ((sprite, mask), rendered) in enumerate(zip(pairs, drawn)):
+            sprite_image, mask_image = sheet.get_sprite(index, 8, 8)
+            expected = reference.render(reference.Sprite(sprite_image), reference.Mask(mask_image, *TEXTURES), *args)
+            assert rendered.tobytes() == expected.tobytes(), (index, args)
+            assert Rendering.render(sprite, mask, *args).tobytes() == expected.tobytes(), (index, args)